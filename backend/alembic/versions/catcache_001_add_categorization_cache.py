@@ -0,0 +1,40 @@
+"""Add categorization cache and per-user category overrides
+
+Revision ID: catcache_001
+Revises: import_001
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'catcache_001'
+down_revision = 'import_001'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('categorization_cache',
+    sa.Column('merchant_key', sa.String(), nullable=False),
+    sa.Column('category', sa.String(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('merchant_key')
+    )
+    op.create_table('category_overrides',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('merchant_key', sa.String(), nullable=False),
+    sa.Column('category', sa.String(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'merchant_key', name='uq_category_overrides_user_merchant')
+    )
+    op.create_index(op.f('ix_category_overrides_id'), 'category_overrides', ['id'], unique=False)
+
+def downgrade():
+    op.drop_index(op.f('ix_category_overrides_id'), table_name='category_overrides')
+    op.drop_table('category_overrides')
+    op.drop_table('categorization_cache')
@@ -0,0 +1,44 @@
+"""Add export jobs and rollup versions
+
+Revision ID: exportjob_001
+Revises: ocrcache_001
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'exportjob_001'
+down_revision = 'ocrcache_001'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Summed per user, rollup versions key cached exports to the data they were rendered from
+    op.add_column('spending_rollups', sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('export_jobs',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('format', sa.String(), nullable=False),
+    sa.Column('filters', sa.JSON(), nullable=False),
+    sa.Column('data_version', sa.Integer(), nullable=False),
+    sa.Column('artifact_key', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.Column('size', sa.Integer(), nullable=True),
+    sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_export_jobs_status_created_at', 'export_jobs', ['status', 'created_at'], unique=False)
+    op.create_index('ix_export_jobs_user_id_artifact_key', 'export_jobs', ['user_id', 'artifact_key'], unique=False)
+
+def downgrade():
+    op.drop_index('ix_export_jobs_user_id_artifact_key', table_name='export_jobs')
+    op.drop_index('ix_export_jobs_status_created_at', table_name='export_jobs')
+    op.drop_table('export_jobs')
+    op.drop_column('spending_rollups', 'version')
@@ -0,0 +1,24 @@
+"""Add import hash to transactions
+
+Revision ID: import_001
+Revises: rollup_001
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'import_001'
+down_revision = 'rollup_001'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Hash of (date, amount, description) for rows loaded by /transactions/import
+    op.add_column('transactions', sa.Column('import_hash', sa.String(), nullable=True))
+    op.create_index('ix_transactions_user_id_import_hash', 'transactions', ['user_id', 'import_hash'], unique=True)
+
+def downgrade():
+    op.drop_index('ix_transactions_user_id_import_hash', table_name='transactions')
+    op.drop_column('transactions', 'import_hash')
@@ -0,0 +1,21 @@
+"""Add composite index for keyset pagination of transactions
+
+Revision ID: keyset_001
+Revises: password_reset_001
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'keyset_001'
+down_revision = 'password_reset_001'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Lets GET /transactions?after=<cursor> seek straight to the next page
+    op.create_index('ix_transactions_user_id_date_id', 'transactions', ['user_id', 'date', 'id'], unique=False)
+
+def downgrade():
+    op.drop_index('ix_transactions_user_id_date_id', table_name='transactions')
@@ -0,0 +1,35 @@
+"""Add receipt OCR cache and receipt image hashes
+
+Revision ID: ocrcache_001
+Revises: receiptjob_001
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'ocrcache_001'
+down_revision = 'receiptjob_001'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('receipt_ocr_cache',
+    sa.Column('image_sha256', sa.String(), nullable=False),
+    sa.Column('image_dhash', sa.Integer(), nullable=False),
+    sa.Column('result', sa.JSON(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('image_sha256')
+    )
+    # SHA-256 finds exact re-uploads; the difference hash finds re-photographed duplicates
+    op.add_column('receipts', sa.Column('image_sha256', sa.String(), nullable=True))
+    op.add_column('receipts', sa.Column('image_dhash', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_receipts_image_sha256'), 'receipts', ['image_sha256'], unique=False)
+
+def downgrade():
+    op.drop_index(op.f('ix_receipts_image_sha256'), table_name='receipts')
+    op.drop_column('receipts', 'image_dhash')
+    op.drop_column('receipts', 'image_sha256')
+    op.drop_table('receipt_ocr_cache')
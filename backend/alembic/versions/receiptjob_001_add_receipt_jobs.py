@@ -0,0 +1,55 @@
+"""Add receipt jobs and receipt owner
+
+Revision ID: receiptjob_001
+Revises: catcache_001
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'receiptjob_001'
+down_revision = 'catcache_001'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Receipts created by jobs may not have a transaction, so they record their owner directly
+    # SQLite cannot ALTER in a foreign key; batch mode rebuilds the table with it
+    with op.batch_alter_table('receipts') as batch:
+        batch.add_column(sa.Column('user_id', sa.Integer(), nullable=True))
+        batch.create_foreign_key('fk_receipts_user_id_users', 'users', ['user_id'], ['id'])
+        batch.create_index(batch.f('ix_receipts_user_id'), ['user_id'], unique=False)
+    op.create_table('receipt_jobs',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('operation', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('stage', sa.String(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.Column('filename', sa.String(), nullable=True),
+    sa.Column('image_url', sa.String(), nullable=True),
+    sa.Column('result', sa.JSON(), nullable=True),
+    sa.Column('receipt_id', sa.Integer(), nullable=True),
+    sa.Column('transaction_id', sa.Integer(), nullable=True),
+    sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['receipt_id'], ['receipts.id'], ),
+    sa.ForeignKeyConstraint(['transaction_id'], ['transactions.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_receipt_jobs_status_created_at', 'receipt_jobs', ['status', 'created_at'], unique=False)
+    op.create_index('ix_receipt_jobs_user_id', 'receipt_jobs', ['user_id'], unique=False)
+
+def downgrade():
+    op.drop_index('ix_receipt_jobs_user_id', table_name='receipt_jobs')
+    op.drop_index('ix_receipt_jobs_status_created_at', table_name='receipt_jobs')
+    op.drop_table('receipt_jobs')
+    with op.batch_alter_table('receipts') as batch:
+        batch.drop_index(batch.f('ix_receipts_user_id'))
+        batch.drop_constraint('fk_receipts_user_id_users', type_='foreignkey')
+        batch.drop_column('user_id')
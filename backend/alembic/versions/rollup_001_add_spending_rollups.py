@@ -0,0 +1,47 @@
+"""Add spending rollups
+
+Revision ID: rollup_001
+Revises: keyset_001
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'rollup_001'
+down_revision = 'keyset_001'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('spending_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.String(), nullable=False),
+    sa.Column('category', sa.String(), nullable=False),
+    sa.Column('total_amount', sa.Float(), nullable=False),
+    sa.Column('transaction_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'period', 'category', name='uq_spending_rollups_user_period_category')
+    )
+    op.create_index(op.f('ix_spending_rollups_id'), 'spending_rollups', ['id'], unique=False)
+    
+    # Backfill from existing transactions; from here on the API keeps the rollups current
+    op.execute("""
+        INSERT INTO spending_rollups (user_id, period, category, total_amount, transaction_count)
+        SELECT t.user_id,
+               strftime('%Y-%m', coalesce(t.date, t.created_at)),
+               coalesce(c.name, 'Uncategorized'),
+               sum(coalesce(t.amount, 0)),
+               count(*)
+        FROM transactions t
+        LEFT JOIN categories c ON c.id = t.category_id
+        WHERE t.user_id IS NOT NULL
+        GROUP BY 1, 2, 3
+    """)
+
+def downgrade():
+    op.drop_index(op.f('ix_spending_rollups_id'), table_name='spending_rollups')
+    op.drop_table('spending_rollups')
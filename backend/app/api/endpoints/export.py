@@ -1,124 +1,266 @@
-from fastapi import APIRouter, Depends, Query
-from fastapi.responses import StreamingResponse
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
-import csv
-import io
-import json
-import pandas as pd
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
 from app.core.security import get_current_user
-from app.models.user import User
-from app.crud.transaction import get_user_transactions
-from app.db.session import get_db
-from sqlalchemy.orm import Session
+from app.crud.rollup import data_version
+from app.db.session import get_async_db
+from app.models.models import User
+from app.schemas.export import ExportJobStatus, ExportJobSubmitted
+from app.services.export_cache import Artifact, ExportTooLarge, export_cache, read_range
+from app.services.export_jobs import get_export_job, submit_export_job
+from app.services.transaction_export import EXPORT_FORMATS, ExportFormat, ExportFormatUnavailable, export_filters, filter_kwargs, require_format
 
 router = APIRouter()
 
+def _require_format(fmt: str) -> ExportFormat:
+    """501 for a format this server was installed without (e.g. Parquet without pyarrow)."""
+    try:
+        return require_format(fmt)
+    except ExportFormatUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+
+def _content_disposition(extension: str) -> str:
+    return f"attachment; filename=transactions_{datetime.now().strftime('%Y%m%d')}.{extension}"
+
+def _byte_range(request: Request, artifact: Artifact) -> Optional[Tuple[int, int]]:
+    """
+    Inclusive (start, end) of a single-range request, or None to send the whole file.
+    Multiple ranges and malformed headers get the whole file; a range past the end is 416.
+    """
+    header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if not header or (if_range and if_range != artifact.etag):
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    start, _, end = spec.strip().partition("-")
+    try:
+        if start == "":
+            # Suffix range: the last N bytes (none at all is unsatisfiable)
+            length = int(end)
+            start = max(artifact.size - length, 0) if length > 0 else artifact.size
+            end = artifact.size - 1
+        else:
+            start = int(start)
+            if end and int(end) < start:
+                return None
+            end = min(int(end), artifact.size - 1) if end else artifact.size - 1
+    except ValueError:
+        return None
+    if start >= artifact.size:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Range not satisfiable",
+            headers={"Content-Range": f"bytes */{artifact.size}"}
+        )
+    return start, end
+
+def _export_headers(etag: str, extension: str) -> Dict[str, str]:
+    return {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        # Revalidate every time: the same URL gives a new file once the data changes
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": _content_disposition(extension)
+    }
+
+def _not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    return bool(if_none_match) and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")])
+
+def _send_artifact(request: Request, artifact: Artifact, fmt: str) -> Response:
+    """A cached export as a file send, honouring If-None-Match and single byte ranges."""
+    export_format = EXPORT_FORMATS[fmt]
+    headers = _export_headers(artifact.etag, export_format.extension)
+    if _not_modified(request, artifact.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    byte_range = _byte_range(request, artifact)
+    if byte_range is None:
+        return FileResponse(artifact.path, media_type=export_format.media_type, headers=headers)
+    start, end = byte_range
+    return StreamingResponse(
+        read_range(artifact.path, start, end),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=export_format.media_type,
+        headers={**headers, "Content-Range": f"bytes {start}-{end}/{artifact.size}", "Content-Length": str(end - start + 1)}
+    )
+
+async def _export_response(
+    request: Request,
+    db: AsyncSession,
+    user_id: int,
+    fmt: str,
+    filters: Dict
+) -> Response:
+    """
+    Send the cached export for the user's current data version. On a miss, formats that
+    only produce bytes once complete are rendered into the cache and sent from there; the
+    others stream while caching for the next request, tagged by their key since they render
+    reproducibly. Either way the first download has an ETag and can be resumed.
+    """
+    export_format = _require_format(fmt)
+    key = export_cache.key(user_id, fmt, filters, await data_version(db, user_id))
+    artifact = await export_cache.open(key, export_format.extension, reproducible=export_format.streams)
+    if artifact is None and not export_format.streams:
+        try:
+            artifact = await export_cache.fill(
+                key, export_format.extension, export_format.render(user_id, **filter_kwargs(filters))
+            )
+        except ExportTooLarge as e:
+            print(f"Streaming {fmt} export uncached: {e}")
+    if artifact is not None:
+        return _send_artifact(request, artifact, fmt)
+    # A miss: reproducible renderings are tagged by their key before the file exists
+    etag = export_cache.etag(key) if export_format.streams else None
+    if etag is not None and _not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=_export_headers(etag, export_format.extension))
+    return StreamingResponse(
+        export_cache.store(key, export_format.extension, export_format.render(user_id, **filter_kwargs(filters))),
+        media_type=export_format.media_type,
+        headers=(
+            _export_headers(etag, export_format.extension) if etag is not None
+            else {"Content-Disposition": _content_disposition(export_format.extension)}
+        )
+    )
+
 @router.get("/transactions/csv")
 async def export_transactions_csv(
+    request: Request,
     start_date: datetime = Query(None),
     end_date: datetime = Query(None),
     categories: List[str] = Query(None),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Export transactions as CSV"""
-    transactions = get_user_transactions(
-        db, current_user.id, start_date, end_date, categories
-    )
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow(['Date', 'Description', 'Amount', 'Category'])
-    
-    # Write transactions
-    for transaction in transactions:
-        writer.writerow([
-            transaction.date,
-            transaction.description,
-            transaction.amount,
-            transaction.category
-        ])
-    
-    output.seek(0)
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename=transactions_{datetime.now().strftime('%Y%m%d')}.csv"}
-    )
+    """Export transactions as CSV, streamed in row batches as they are read"""
+    return await _export_response(request, db, current_user.id, "csv", export_filters(start_date, end_date, categories))
 
 @router.get("/transactions/excel")
 async def export_transactions_excel(
+    request: Request,
     start_date: datetime = Query(None),
     end_date: datetime = Query(None),
     categories: List[str] = Query(None),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Export transactions as Excel"""
-    transactions = get_user_transactions(
-        db, current_user.id, start_date, end_date, categories
-    )
-    
-    # Convert to pandas DataFrame
-    df = pd.DataFrame([{
-        'Date': t.date,
-        'Description': t.description,
-        'Amount': t.amount,
-        'Category': t.category
-    } for t in transactions])
-    
-    # Create Excel file in memory
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, sheet_name='Transactions', index=False)
-        
-        # Get workbook and worksheet objects
-        workbook = writer.book
-        worksheet = writer.sheets['Transactions']
-        
-        # Add formats
-        money_fmt = workbook.add_format({'num_format': '$#,##0.00'})
-        date_fmt = workbook.add_format({'num_format': 'yyyy-mm-dd'})
-        
-        # Apply formats to columns
-        worksheet.set_column('A:A', 12, date_fmt)  # Date
-        worksheet.set_column('B:B', 30)  # Description
-        worksheet.set_column('C:C', 12, money_fmt)  # Amount
-        worksheet.set_column('D:D', 15)  # Category
-    
-    output.seek(0)
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=transactions_{datetime.now().strftime('%Y%m%d')}.xlsx"}
-    )
+    """Export transactions as Excel, written off the event loop in constant memory"""
+    return await _export_response(request, db, current_user.id, "excel", export_filters(start_date, end_date, categories))
 
 @router.get("/transactions/json")
 async def export_transactions_json(
+    request: Request,
     start_date: datetime = Query(None),
     end_date: datetime = Query(None),
     categories: List[str] = Query(None),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Export transactions as JSON"""
-    transactions = get_user_transactions(
-        db, current_user.id, start_date, end_date, categories
-    )
+    """Export transactions as a JSON array, streamed in row batches"""
+    return await _export_response(request, db, current_user.id, "json", export_filters(start_date, end_date, categories))
+
+@router.get("/transactions/ndjson")
+async def export_transactions_ndjson(
+    request: Request,
+    start_date: datetime = Query(None),
+    end_date: datetime = Query(None),
+    categories: List[str] = Query(None),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Export transactions as newline-delimited JSON, one transaction per line"""
+    return await _export_response(request, db, current_user.id, "ndjson", export_filters(start_date, end_date, categories))
+
+@router.get("/transactions/parquet")
+async def export_transactions_parquet(
+    request: Request,
+    start_date: datetime = Query(None),
+    end_date: datetime = Query(None),
+    categories: List[str] = Query(None),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Export transactions as a Parquet file with typed columns, for notebooks and data tools"""
+    return await _export_response(request, db, current_user.id, "parquet", export_filters(start_date, end_date, categories))
+
+@router.get("/transactions/arrow")
+async def export_transactions_arrow(
+    request: Request,
+    start_date: datetime = Query(None),
+    end_date: datetime = Query(None),
+    categories: List[str] = Query(None),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Export transactions as an Arrow IPC stream, sent batch by batch as rows are read"""
+    return await _export_response(request, db, current_user.id, "arrow", export_filters(start_date, end_date, categories))
+
+@router.post("/jobs", response_model=ExportJobSubmitted, status_code=status.HTTP_202_ACCEPTED)
+async def submit_export(
+    format: str = Query(..., description="csv, excel, json, ndjson, parquet or arrow"),
+    start_date: datetime = Query(None),
+    end_date: datetime = Query(None),
+    categories: List[str] = Query(None),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Render an export in the background and return its job id straight away.
+    Poll GET /export/jobs/{job_id}; once succeeded, download_url serves the file with
+    ETag and Range support, so an interrupted download can resume.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    _require_format(format)
     
-    # Convert transactions to dict
-    transactions_data = [{
-        'date': t.date.isoformat() if t.date else None,
-        'description': t.description,
-        'amount': t.amount,
-        'category': t.category
-    } for t in transactions]
+    job = await submit_export_job(db, current_user.id, format, export_filters(start_date, end_date, categories))
+    return ExportJobSubmitted(
+        job_id=job.id,
+        status=job.status,
+        status_url=f"{settings.API_V1_STR}/export/jobs/{job.id}"
+    )
+
+@router.get("/jobs/{job_id}", response_model=ExportJobStatus)
+async def read_export_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Status of an export job, with its download URL once succeeded.
+    """
+    job = await get_export_job(db, current_user.id, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    result = ExportJobStatus.model_validate(job)
+    if job.status == "succeeded":
+        result.download_url = f"{settings.API_V1_STR}/export/jobs/{job.id}/download"
+    return result
+
+@router.get("/jobs/{job_id}/download")
+async def download_export(
+    job_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    The file rendered by an export job. Responds 409 until the job has succeeded and
+    410 once the file has been evicted from the export cache.
+    """
+    job = await get_export_job(db, current_user.id, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Export job is {job.status}")
     
-    return StreamingResponse(
-        iter([json.dumps(transactions_data, indent=2)]),
-        media_type="application/json",
-        headers={"Content-Disposition": f"attachment; filename=transactions_{datetime.now().strftime('%Y%m%d')}.json"}
-    ) 
\ No newline at end of file
+    export_format = EXPORT_FORMATS[job.format]
+    artifact = await export_cache.open(job.artifact_key, export_format.extension, reproducible=export_format.streams)
+    if artifact is None:
+        raise HTTPException(status_code=410, detail="Export has expired; submit it again")
+    return _send_artifact(request, artifact, job.format)
@@ -1,125 +1,145 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session
-from app.db.session import get_db
+import asyncio
+from typing import Dict, List
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, status
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db.session import get_async_db
 from app.core.security import get_current_user
-from app.models.models import User, Transaction
-from app.schemas.receipt import ReceiptResponse, ReceiptAnalysis, ReceiptProcessingResponse, ReceiptError
-from app.services.receipt_processor import ReceiptProcessor
-from app.services.ai_categorization import TransactionCategorizer, categorize_transaction
+from app.crud.transaction import add_transactions, create_transaction as create_user_transaction
+from app.models.models import User, Receipt
+from app.schemas.receipt import (
+    ReceiptResponse, ReceiptAnalysis, ReceiptProcessingResponse, ReceiptError, ReceiptJobSubmitted, ReceiptJobStatus
+)
+from app.services.blob_store import BlobTooLarge, StagedBlob, media_type, receipt_image_store
+from app.services.ocr_pool import ocr_pool, OCRPoolBusy, OCRPoolUnavailable
+from app.services.receipt_batch import process_receipt_batch, spool_upload
+from app.services.receipt_ocr_cache import find_duplicate_receipt, ocr_receipt_file, receipt_ocr_cache, to_signed64
+from app.services.receipt_processor import receipt_processor
+from app.services.ai_categorization import TransactionCategorizer
+from app.services.categorization_queue import categorization_queue
+from app.services.receipt_jobs import OPERATIONS, analyze_receipt_data, get_job, parse_receipt_date, submit_job
+from app.services.similarity_index import similarity_indexes
 
 router = APIRouter()
-receipt_processor = ReceiptProcessor()
 categorizer = TransactionCategorizer()
 
+async def _run_ocr_call(call):
+    """Await OCR pool work, turning backpressure into 429/503."""
+    try:
+        return await call
+    except OCRPoolBusy as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except OCRPoolUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+async def _stage_upload(upload: UploadFile) -> StagedBlob:
+    """Stream an upload to the image store's staging area; 413 when over the size limit."""
+    try:
+        return await receipt_image_store.stage(upload)
+    except BlobTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+async def _ocr_receipt(staged: StagedBlob) -> Dict:
+    """Cached OCR of a staged upload; 400 when unreadable, 429/503 under OCR backpressure."""
+    result = await _run_ocr_call(ocr_receipt_file(staged.path, staged.sha256))
+    if not result["success"]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Receipt processing failed: {result.get('error', 'Unknown error')}"
+        )
+    return result
+
 @router.post("/process", response_model=ReceiptResponse)
 async def process_receipt(
     receipt: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Process a receipt image and extract information
     """
+    staged = await _stage_upload(receipt)
     try:
-        # Read image content
-        image_bytes = await receipt.read()
-        
-        # Enhance image quality
-        enhanced_image = receipt_processor.enhance_image(image_bytes)
+        # Enhance and OCR in the process pool, unless these bytes were seen before
+        result = await _ocr_receipt(staged)
         
-        # Process receipt
-        result = receipt_processor.process_receipt(enhanced_image)
-        
-        if not result["success"]:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Receipt processing failed: {result.get('error', 'Unknown error')}"
-            )
-        
-        return result
+        return ReceiptResponse(
+            success=True,
+            data=result["data"],
+            cached=result["cached"],
+            duplicate=await find_duplicate_receipt(db, current_user.id, result["image_sha256"], result["dhash"], result["data"])
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error processing receipt: {str(e)}"
         )
+    finally:
+        await receipt_image_store.discard(staged)
 
 @router.post("/analyze", response_model=ReceiptAnalysis)
 async def analyze_receipt(
     receipt: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Process receipt and provide AI analysis
     """
+    staged = await _stage_upload(receipt)
     try:
         # First process the receipt
-        image_bytes = await receipt.read()
-        enhanced_image = receipt_processor.enhance_image(image_bytes)
-        result = receipt_processor.process_receipt(enhanced_image)
-        
-        if not result["success"]:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Receipt processing failed: {result.get('error', 'Unknown error')}"
-            )
-        
+        result = await _ocr_receipt(staged)
         receipt_data = result["data"]
         
-        # Get category prediction
-        merchant_desc = receipt_data["merchant"] or ""
-        amount = receipt_data["amount"] or 0.0
-        prediction = categorizer.predict_category(
-            description=merchant_desc,
-            amount=amount
-        )
-        
-        # Get similar transactions
-        similar_transactions = []
-        if prediction["category"] != "Other":
-            transactions = db.query(Transaction).filter(
-                Transaction.user_id == current_user.id,
-                Transaction.category_id == prediction["category"]
-            ).limit(3).all()
-            similar_transactions = [t.description for t in transactions]
+        # Category prediction and similar transactions
+        analysis = await analyze_receipt_data(db, current_user.id, receipt_data)
         
         return ReceiptAnalysis(
             receipt_data=receipt_data,
-            suggested_category=prediction["category"],
-            confidence_score=prediction["confidence"],
-            similar_transactions=similar_transactions,
-            budget_impact=amount
+            cached=result["cached"],
+            duplicate=await find_duplicate_receipt(db, current_user.id, result["image_sha256"], result["dhash"], result["data"]),
+            **analysis
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error analyzing receipt: {str(e)}"
         )
+    finally:
+        await receipt_image_store.discard(staged)
 
 @router.post("/create-transaction")
 async def create_transaction_from_receipt(
     receipt: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    allow_duplicate: bool = False,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Process receipt and create a transaction
+    Process receipt and create a transaction.
+    Responds 409 if the receipt duplicates one that already has a transaction, unless allow_duplicate is set.
     """
+    staged = await _stage_upload(receipt)
     try:
         # First analyze the receipt
-        image_bytes = await receipt.read()
-        enhanced_image = receipt_processor.enhance_image(image_bytes)
-        result = receipt_processor.process_receipt(enhanced_image)
+        result = await _ocr_receipt(staged)
+        receipt_data = result["data"]
         
-        if not result["success"]:
+        duplicate = await find_duplicate_receipt(db, current_user.id, result["image_sha256"], result["dhash"], result["data"])
+        if duplicate and duplicate["transaction_id"] and not allow_duplicate:
             raise HTTPException(
-                status_code=400,
-                detail=f"Receipt processing failed: {result.get('error', 'Unknown error')}"
+                status_code=409,
+                detail={"message": "Receipt already recorded", "duplicate": duplicate}
             )
         
-        receipt_data = result["data"]
-        
         # Get category prediction
         merchant_desc = receipt_data["merchant"] or ""
         amount = receipt_data["amount"] or 0.0
@@ -128,51 +148,66 @@ async def create_transaction_from_receipt(
             amount=amount
         )
         
-        # Create transaction
-        transaction = Transaction(
+        # Create transaction; staged so it commits together with the receipt below
+        [transaction] = await add_transactions(db, current_user.id, [{
+            "amount": amount,
+            "description": merchant_desc,
+            "date": parse_receipt_date(receipt_data["date"]),
+            "category": prediction["category"]
+        }])
+        
+        # Record the receipt so later uploads of the same image are recognized
+        db_receipt = Receipt(
             user_id=current_user.id,
-            amount=amount,
-            description=merchant_desc,
-            date=receipt_data["date"],
-            category_id=prediction["category"],
-            receipt_url=None  # TODO: Implement receipt storage
+            transaction_id=transaction.id,
+            merchant_name=receipt_data["merchant"],
+            total_amount=receipt_data["amount"],
+            receipt_date=transaction.date,
+            ocr_text=receipt_data["raw_text"],
+            image_url=await receipt_image_store.commit(staged),
+            image_sha256=result["image_sha256"],
+            image_dhash=to_signed64(result["dhash"])
         )
-        
-        db.add(transaction)
-        db.commit()
-        db.refresh(transaction)
+        db.add(db_receipt)
+        await db.commit()
+        similarity_indexes.record(transaction)
         
         return {
             "message": "Transaction created successfully",
-            "transaction_id": transaction.id
+            "transaction_id": transaction.id,
+            "receipt_id": db_receipt.id
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error creating transaction: {str(e)}"
         )
+    finally:
+        await receipt_image_store.discard(staged)
 
 @router.post("/upload", response_model=ReceiptProcessingResponse)
 async def upload_receipt(
     file: UploadFile = File(...),
     create_transaction: bool = True,
+    include_items: bool = False,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Upload and process a receipt image.
     Optionally create a transaction from the receipt data.
+    Line items are only read when include_items is set, which OCRs the whole receipt.
     """
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="File must be an image")
     
+    staged = await _stage_upload(file)
     try:
-        # Read image file
-        contents = await file.read()
-        
-        # Process receipt
-        result = await receipt_processor.process_image(contents)
+        # Process receipt; the worker reads the staged file
+        result = await _run_ocr_call(ocr_pool.run(receipt_processor.extract, staged.path, ocr_pool.timeout, include_items))
         
         if "error" in result:
             raise HTTPException(status_code=400, detail=result["error"])
@@ -181,24 +216,146 @@ async def upload_receipt(
         if create_transaction and result["total_amount"]:
             description = f"Receipt from {result['merchant'] or 'Unknown Merchant'}"
             
-            # Use AI to categorize the transaction
-            category = await categorize_transaction(description, result["total_amount"])
-            
-            # Create transaction
-            transaction = Transaction(
+            # Create transaction; the background queue fills in the AI category
+            transaction = await create_user_transaction(
+                db,
+                user_id=current_user.id,
                 amount=result["total_amount"],
                 description=description,
-                category=category,
-                user_id=current_user.id,
-                date=result["date"]
+                date=parse_receipt_date(result["date"]),
+                category=categorization_queue.initial_category(description, result["total_amount"])
             )
-            db.add(transaction)
-            db.commit()
+            categorization_queue.submit(transaction)
         
         return ReceiptProcessingResponse(**result)
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=str(e)
-        ) 
\ No newline at end of file
+        )
+    finally:
+        await receipt_image_store.discard(staged)
+
+@router.get("/ocr/stats")
+def read_ocr_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Occupancy and counters of the OCR process pool and its result cache.
+    """
+    return {**ocr_pool.stats(), "cache": receipt_ocr_cache.stats()}
+
+@router.post("/batch")
+async def upload_receipt_batch(
+    files: List[UploadFile] = File(...),
+    create_transaction: bool = True,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Upload many receipt images and/or ZIP archives of them in one request.
+    Receipts are OCR'd in parallel and streamed back as NDJSON, one line per receipt as it
+    finishes, then a summary line. Transactions are created in one commit at the end.
+    """
+    # The stream owns copies of the uploads and closes them when it finishes
+    sources = []
+    try:
+        for upload in files:
+            sources.append((upload.filename or "", await asyncio.to_thread(spool_upload, upload.file)))
+    except BaseException:
+        for _, file in sources:
+            file.close()
+        raise
+    
+    return StreamingResponse(
+        process_receipt_batch(current_user.id, sources, create_transaction),
+        media_type="application/x-ndjson"
+    )
+
+@router.post("/jobs", response_model=ReceiptJobSubmitted, status_code=status.HTTP_202_ACCEPTED)
+async def submit_receipt_job(
+    receipt: UploadFile = File(...),
+    operation: str = Query("process", description="process, analyze or create_transaction"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Queue a receipt for processing and return its job id straight away.
+    Poll GET /receipts/jobs/{job_id} for progress; the result is stored on a Receipt.
+    """
+    if operation not in OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"operation must be one of {', '.join(OPERATIONS)}")
+    
+    # Stored up front, so the job row carries only the blob's URI and workers read it from the store
+    staged = await _stage_upload(receipt)
+    try:
+        image_url = await receipt_image_store.commit(staged)
+    finally:
+        await receipt_image_store.discard(staged)
+    
+    job = await submit_job(db, current_user.id, operation, image_url, receipt.filename)
+    return ReceiptJobSubmitted(
+        job_id=job.id,
+        status=job.status,
+        status_url=f"{settings.API_V1_STR}/receipts/jobs/{job.id}"
+    )
+
+@router.get("/jobs/{job_id}", response_model=ReceiptJobStatus)
+async def read_receipt_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Status, progress stage and (once succeeded) result of a receipt job.
+    """
+    job = await get_job(db, current_user.id, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Receipt job not found")
+    return job
+
+async def _stored_image_key(db: AsyncSession, user_id: int, receipt_id: int) -> str:
+    """Blob key of the user's receipt image; 404 when there is none."""
+    image_url = (await db.execute(
+        select(Receipt.image_url).where(Receipt.id == receipt_id, Receipt.user_id == user_id)
+    )).scalar()
+    key = receipt_image_store.key(image_url)
+    if key is None:
+        raise HTTPException(status_code=404, detail="Receipt image not found")
+    return key
+
+async def _image_response(path) -> FileResponse:
+    if path is None:
+        raise HTTPException(status_code=404, detail="Receipt image not found")
+    return FileResponse(
+        path,
+        media_type=await asyncio.to_thread(media_type, path),
+        # Blobs are content-addressed, so a URL's bytes never change
+        headers={"Cache-Control": "private, max-age=31536000, immutable"}
+    )
+
+@router.get("/{receipt_id}/image")
+async def read_receipt_image(
+    receipt_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    The stored receipt image.
+    """
+    key = await _stored_image_key(db, current_user.id, receipt_id)
+    return await _image_response(await receipt_image_store.local_path(key))
+
+@router.get("/{receipt_id}/thumbnail")
+async def read_receipt_thumbnail(
+    receipt_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    A JPEG thumbnail of the stored receipt image, generated on first request.
+    """
+    key = await _stored_image_key(db, current_user.id, receipt_id)
+    return await _image_response(await receipt_image_store.thumbnail_path(key))
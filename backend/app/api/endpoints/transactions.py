@@ -1,17 +1,31 @@
 from typing import Any, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, UploadFile, File
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.core.security import get_current_user
-from app.db.session import get_db
+from app.db.session import get_db, get_async_db
+from app.crud import transaction as crud_transaction
+from app.crud.transaction import get_user_transactions, encode_cursor, decode_cursor
+from app.crud.category import get_or_create_category, category_name
+from app.crud.rollup import transaction_rollup_delta, get_spending_summary
 from app.models.models import User, Transaction, Category
 from app.schemas.transaction import (
     Transaction as TransactionSchema,
     TransactionCreate,
     TransactionUpdate,
     TransactionWithCategory,
-    TransactionResponse
+    TransactionResponse,
+    SpendingSummary,
+    StatementImportResult,
+    CategorizerTrainingResult
 )
-from app.services.ai_categorization import categorize_transaction, suggest_budget_improvements
+from app.services.ai_categorization import TransactionCategorizer, suggest_budget_improvements
+from app.services.local_model import user_model_path
+from app.core.config import settings
+from app.services.categorization_cache import categorization_cache
+from app.services.categorization_queue import categorization_queue, PENDING
+from app.services.similarity_index import similarity_indexes
+from app.services.statement_import import iter_statement_rows, import_statement, StatementParseError
 from app.schemas.ai import AIResponse
 
 router = APIRouter()
@@ -20,34 +34,125 @@ router = APIRouter()
 async def create_transaction(
     transaction: TransactionCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    # Use AI to categorize the transaction
-    category = await categorize_transaction(transaction.description, transaction.amount)
-    
-    db_transaction = Transaction(
+    # Inserted as Pending; the AI category is filled in by the background queue
+    db_transaction = await crud_transaction.create_transaction(
+        db,
+        user_id=current_user.id,
         amount=transaction.amount,
         description=transaction.description,
-        category=category,
-        user_id=current_user.id
+        date=transaction.date,
+        category=categorization_queue.initial_category(transaction.description, transaction.amount)
     )
-    db.add(db_transaction)
-    db.commit()
-    db.refresh(db_transaction)
+    categorization_queue.submit(db_transaction)
     return db_transaction
 
+@router.post("/import", response_model=StatementImportResult)
+def import_transactions(
+    *,
+    db: Session = Depends(get_db),
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Import a bank statement (CSV or OFX/QFX).
+    The upload is parsed as a stream and inserted in batches; rows seen in earlier imports are skipped.
+    """
+    try:
+        rows = iter_statement_rows(file.file, file.filename or "")
+        return import_statement(db, current_user.id, rows)
+    except StatementParseError as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
 @router.get("/", response_model=List[TransactionResponse])
 async def get_transactions(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
+    after: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    transactions = db.query(Transaction).filter(
-        Transaction.user_id == current_user.id
-    ).offset(skip).limit(limit).all()
+    """
+    List transactions ordered by (date, id).
+    Pass `after` to page by cursor; every page then costs the same regardless of depth.
+    """
+    cursor = None
+    if after is not None:
+        try:
+            cursor = decode_cursor(after)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid pagination cursor"
+            )
+    
+    transactions = await get_user_transactions(db, current_user.id, skip=skip, limit=limit, after=cursor)
+    if len(transactions) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(transactions[-1])
     return transactions
 
+@router.get("/categorization/stats")
+def read_categorization_stats(
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Hit/miss counters of the categorization cache, and depth/latency of the background queue.
+    """
+    return {"cache": categorization_cache.stats(), "queue": categorization_queue.stats()}
+
+@router.post("/categorization/train", response_model=CategorizerTrainingResult)
+def train_categorizer(
+    *,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Train the user's local categorization model on their categorized transactions.
+    Once trained, confident predictions are served locally without an LLM call.
+    """
+    rows = db.query(Transaction.description, Transaction.amount, Category.name).join(
+        Category, Transaction.category_id == Category.id
+    ).filter(
+        Transaction.user_id == current_user.id,
+        Category.name != PENDING
+    ).all()
+    training_data = [
+        {"description": description or "", "amount": amount or 0.0, "category": name}
+        for description, amount, name in rows
+    ]
+    classes = sorted({t["category"] for t in training_data})
+    if len(training_data) < settings.LOCAL_MODEL_MIN_SAMPLES or len(classes) < 2:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Need at least {settings.LOCAL_MODEL_MIN_SAMPLES} categorized transactions in 2 or more categories"
+        )
+    
+    categorizer = TransactionCategorizer()
+    accuracy = categorizer.train_model(training_data)
+    categorizer.save_model(user_model_path(current_user.id))
+    return CategorizerTrainingResult(
+        samples=len(training_data),
+        classes=classes,
+        training_accuracy=accuracy
+    )
+
+@router.get("/summary", response_model=SpendingSummary)
+def read_spending_summary(
+    *,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Spending totals, monthly average and category breakdown served from the rollup table.
+    """
+    return get_spending_summary(db, current_user.id)
+
 @router.get("/{transaction_id}", response_model=TransactionWithCategory)
 def read_transaction(
     *,
@@ -90,12 +195,26 @@ def update_transaction(
             detail="Transaction not found"
         )
     
+    # Move the transaction's old values out of the rollups before applying the update
+    db.execute(transaction_rollup_delta(transaction, sign=-1))
+    
+    override = None
     for field, value in transaction_in.model_dump(exclude_unset=True).items():
+        if field == "category" and value is not None:
+            # A manual re-categorization teaches the cache for this user's future charges
+            override = (transaction_in.description or transaction.description, value)
+            categorization_cache.set_override(db, current_user.id, *override)
+            value = get_or_create_category(db, current_user.id, value)
         setattr(transaction, field, value)
     
     db.add(transaction)
+    db.flush()
+    db.execute(transaction_rollup_delta(transaction))
     db.commit()
+    if override:
+        categorization_cache.remember_override(current_user.id, *override)
     db.refresh(transaction)
+    similarity_indexes.record(transaction)
     return transaction
 
 @router.delete("/{transaction_id}")
@@ -118,18 +237,18 @@ def delete_transaction(
             detail="Transaction not found"
         )
     
+    db.execute(transaction_rollup_delta(transaction, sign=-1))
     db.delete(transaction)
     db.commit()
+    similarity_indexes.forget(transaction)
     return {"status": "success"}
 
 @router.get("/analysis", response_model=AIResponse)
 async def get_budget_analysis(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    transactions = db.query(Transaction).filter(
-        Transaction.user_id == current_user.id
-    ).all()
+    transactions = await get_user_transactions(db, current_user.id, limit=None)
     
     if not transactions:
         return AIResponse(
@@ -140,7 +259,7 @@ async def get_budget_analysis(
     
     # Convert transactions to list of dicts for AI analysis
     transaction_data = [
-        {"amount": t.amount, "category": t.category, "description": t.description}
+        {"amount": t.amount, "category": category_name(t.category), "description": t.description}
         for t in transactions
     ]
     
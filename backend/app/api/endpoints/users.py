@@ -54,6 +54,8 @@ def update_user_me(
     """
     Update current user.
     """
+    # current_user belongs to the auth dependency's session; bring it into this one
+    current_user = db.merge(current_user)
     if user_in.password is not None:
         current_user.hashed_password = get_password_hash(user_in.password)
     if user_in.full_name is not None:
@@ -13,6 +13,10 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+    ASYNC_DATABASE_URL: str = os.getenv(
+        "ASYNC_DATABASE_URL",
+        DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    )
     
     # JWT
     SECRET_KEY: str = os.getenv("SECRET_KEY", secrets.token_urlsafe(32))
@@ -27,6 +31,16 @@ class Settings(BaseSettings):
     
     # OCR
     TESSERACT_PATH: str = os.getenv("TESSERACT_PATH", "/usr/local/bin/tesseract")
+    # "tesserocr" keeps one loaded engine per OCR worker (falls back to pytesseract when tesserocr
+    # is not installed); "pytesseract" runs the tesseract binary for every image
+    OCR_ENGINE: str = os.getenv("OCR_ENGINE", "tesserocr")
+    OCR_LANGUAGE: str = os.getenv("OCR_LANGUAGE", "eng")
+    
+    # Receipt image storage (content-addressed; "local" stores under RECEIPT_STORAGE_DIR)
+    RECEIPT_STORAGE_BACKEND: str = os.getenv("RECEIPT_STORAGE_BACKEND", "local")
+    RECEIPT_STORAGE_DIR: str = os.getenv("RECEIPT_STORAGE_DIR", "./data/receipts")
+    RECEIPT_MAX_IMAGE_BYTES: int = int(os.getenv("RECEIPT_MAX_IMAGE_BYTES", str(20 * 1024 * 1024)))
+    RECEIPT_THUMBNAIL_SIZE: int = int(os.getenv("RECEIPT_THUMBNAIL_SIZE", "320"))
     
     # Frontend URL
     FRONTEND_URL: str = os.getenv("FRONTEND_URL", "http://localhost:5175")
@@ -42,6 +56,76 @@ class Settings(BaseSettings):
     
     # OpenAI
     OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY")
+    OPENAI_BASE_URL: Optional[str] = os.getenv("OPENAI_BASE_URL")  # e.g. a local fake server for tests
+    OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo-instruct")
+    OPENAI_MAX_CONCURRENCY: int = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+    OPENAI_CATEGORIZE_TIMEOUT: float = float(os.getenv("OPENAI_CATEGORIZE_TIMEOUT", "2.0"))
+    OPENAI_ANALYSIS_TIMEOUT: float = float(os.getenv("OPENAI_ANALYSIS_TIMEOUT", "20.0"))
+    CATEGORIZE_BATCH_MAX_SIZE: int = int(os.getenv("CATEGORIZE_BATCH_MAX_SIZE", "25"))
+    CATEGORIZE_BATCH_WINDOW_MS: float = float(os.getenv("CATEGORIZE_BATCH_WINDOW_MS", "10"))
+    
+    # Background categorization of newly written transactions
+    CATEGORIZE_QUEUE_WORKERS: int = int(os.getenv("CATEGORIZE_QUEUE_WORKERS", "16"))
+    CATEGORIZE_QUEUE_MAX_SIZE: int = int(os.getenv("CATEGORIZE_QUEUE_MAX_SIZE", "10000"))
+    CATEGORIZE_MAX_ATTEMPTS: int = int(os.getenv("CATEGORIZE_MAX_ATTEMPTS", "4"))
+    CATEGORIZE_RETRY_BACKOFF_SECONDS: float = float(os.getenv("CATEGORIZE_RETRY_BACKOFF_SECONDS", "0.5"))
+    
+    # Local categorization model
+    LOCAL_MODEL_DIR: str = os.getenv("LOCAL_MODEL_DIR", "./data/categorizer")
+    LOCAL_MODEL_FEATURES: int = int(os.getenv("LOCAL_MODEL_FEATURES", str(2 ** 14)))
+    LOCAL_MODEL_MIN_SAMPLES: int = int(os.getenv("LOCAL_MODEL_MIN_SAMPLES", "20"))
+    LOCAL_MODEL_CONFIDENCE_THRESHOLD: float = float(os.getenv("LOCAL_MODEL_CONFIDENCE_THRESHOLD", "0.8"))
+    LOCAL_MODEL_MAX_USERS: int = int(os.getenv("LOCAL_MODEL_MAX_USERS", "256"))  # trained models kept loaded
+    
+    # Categorization cache
+    CATEGORY_CACHE_MAX_ENTRIES: int = int(os.getenv("CATEGORY_CACHE_MAX_ENTRIES", "10000"))
+    CATEGORY_CACHE_DB_MAX_ENTRIES: int = int(os.getenv("CATEGORY_CACHE_DB_MAX_ENTRIES", "100000"))
+    CATEGORY_CACHE_TTL_SECONDS: int = int(os.getenv("CATEGORY_CACHE_TTL_SECONDS", str(60 * 60 * 24 * 30)))  # 30 days
+    # Overrides change by hand and other processes' caches can't see the change, so hold them briefly
+    CATEGORY_OVERRIDE_TTL_SECONDS: int = int(os.getenv("CATEGORY_OVERRIDE_TTL_SECONDS", "60"))
+    
+    # Receipt OCR process pool
+    OCR_WORKERS: int = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+    OCR_MAX_PENDING: int = int(os.getenv("OCR_MAX_PENDING", "32"))  # running + queued jobs before 429
+    OCR_TIMEOUT_SECONDS: float = float(os.getenv("OCR_TIMEOUT_SECONDS", "30"))
+    OCR_TARGET_DPI: int = int(os.getenv("OCR_TARGET_DPI", "300"))  # larger uploads are downscaled before OCR
+    # Recognize only the header and totals bands of long receipts; raw_text then holds just those lines
+    OCR_REGIONS_ONLY: bool = os.getenv("OCR_REGIONS_ONLY", "true").lower() == "true"
+    
+    # Receipt jobs (submit/poll); set RECEIPT_JOB_WORKERS=0 when a separate worker fleet drains them
+    RECEIPT_JOB_WORKERS: int = int(os.getenv("RECEIPT_JOB_WORKERS", "2"))
+    RECEIPT_JOB_POLL_SECONDS: float = float(os.getenv("RECEIPT_JOB_POLL_SECONDS", "1.0"))
+    RECEIPT_JOB_LEASE_SECONDS: int = int(os.getenv("RECEIPT_JOB_LEASE_SECONDS", "120"))
+    RECEIPT_JOB_MAX_ATTEMPTS: int = int(os.getenv("RECEIPT_JOB_MAX_ATTEMPTS", "3"))
+    
+    # Receipt OCR cache and duplicate detection
+    RECEIPT_OCR_CACHE_MAX_ENTRIES: int = int(os.getenv("RECEIPT_OCR_CACHE_MAX_ENTRIES", "1000"))
+    RECEIPT_OCR_CACHE_DB_MAX_ENTRIES: int = int(os.getenv("RECEIPT_OCR_CACHE_DB_MAX_ENTRIES", "50000"))
+    RECEIPT_OCR_CACHE_TTL_SECONDS: int = int(os.getenv("RECEIPT_OCR_CACHE_TTL_SECONDS", str(60 * 60 * 24 * 90)))  # 90 days
+    RECEIPT_DUPLICATE_MAX_DISTANCE: int = int(os.getenv("RECEIPT_DUPLICATE_MAX_DISTANCE", "6"))  # dHash bits out of 64; total and date must match too
+    
+    # Batch receipt upload
+    RECEIPT_BATCH_MAX_FILES: int = int(os.getenv("RECEIPT_BATCH_MAX_FILES", "500"))
+    RECEIPT_BATCH_CONCURRENCY: int = int(os.getenv("RECEIPT_BATCH_CONCURRENCY", str(os.cpu_count() or 1)))
+    
+    # Similar-transaction index
+    SIMILARITY_INDEX_FEATURES: int = int(os.getenv("SIMILARITY_INDEX_FEATURES", "1024"))
+    SIMILARITY_INDEX_MAX_USERS: int = int(os.getenv("SIMILARITY_INDEX_MAX_USERS", "256"))
+    
+    # Statement import
+    IMPORT_BATCH_SIZE: int = int(os.getenv("IMPORT_BATCH_SIZE", "2000"))
+    
+    # Transaction export
+    EXPORT_BATCH_ROWS: int = int(os.getenv("EXPORT_BATCH_ROWS", "2000"))  # rows fetched and encoded per chunk
+    EXPORT_COLUMNAR_BATCH_ROWS: int = int(os.getenv("EXPORT_COLUMNAR_BATCH_ROWS", "65536"))  # Parquet row group / Arrow batch
+    EXPORT_SPOOL_MAX_BYTES: int = int(os.getenv("EXPORT_SPOOL_MAX_BYTES", str(8 * 1024 * 1024)))  # larger files spill to disk
+    # Rendered exports are cached on local disk, so export jobs run in the API processes
+    EXPORT_CACHE_DIR: str = os.getenv("EXPORT_CACHE_DIR", "./data/exports")
+    EXPORT_CACHE_MAX_BYTES: int = int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))  # LRU-evicted beyond this
+    EXPORT_JOB_WORKERS: int = int(os.getenv("EXPORT_JOB_WORKERS", "1"))
+    EXPORT_JOB_POLL_SECONDS: float = float(os.getenv("EXPORT_JOB_POLL_SECONDS", "1.0"))
+    EXPORT_JOB_LEASE_SECONDS: int = int(os.getenv("EXPORT_JOB_LEASE_SECONDS", "600"))
+    EXPORT_JOB_MAX_ATTEMPTS: int = int(os.getenv("EXPORT_JOB_MAX_ATTEMPTS", "2"))
     
     # CORS
     BACKEND_CORS_ORIGINS: list = [
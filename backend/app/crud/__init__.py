@@ -1,7 +1,10 @@
-from .transaction import get_user_transactions, get_transaction, create_transaction
+from .transaction import get_user_transactions, get_transaction, create_transaction, add_transactions, encode_cursor, decode_cursor
 
 __all__ = [
     "get_user_transactions",
     "get_transaction",
-    "create_transaction"
-] 
\ No newline at end of file
+    "create_transaction",
+    "add_transactions",
+    "encode_cursor",
+    "decode_cursor"
+]
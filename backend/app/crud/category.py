@@ -0,0 +1,39 @@
+from typing import Optional
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.models.models import Category
+
+UNCATEGORIZED = "Uncategorized"
+
+def category_name(category: Optional[Category]) -> str:
+    """Name used for a transaction's category in rollups and API responses."""
+    return category.name if category is not None else UNCATEGORIZED
+
+def category_lookup(user_id: int, name: str):
+    """Select a category visible to the user (their own or a default one) by name."""
+    return select(Category).where(
+        Category.name == name,
+        or_(Category.user_id == user_id, Category.user_id.is_(None))
+    ).limit(1)
+
+def get_or_create_category(db: Session, user_id: int, name: str) -> Category:
+    """
+    Resolve a category name to a Category row, creating a user-owned one if needed.
+    The new row is flushed but not committed so it joins the caller's transaction.
+    """
+    category = db.execute(category_lookup(user_id, name)).scalars().first()
+    if category is None:
+        category = Category(name=name, user_id=user_id)
+        db.add(category)
+        db.flush()
+    return category
+
+async def get_or_create_category_async(db: AsyncSession, user_id: int, name: str) -> Category:
+    """AsyncSession counterpart of get_or_create_category."""
+    category = (await db.execute(category_lookup(user_id, name))).scalars().first()
+    if category is None:
+        category = Category(name=name, user_id=user_id)
+        db.add(category)
+        await db.flush()
+    return category
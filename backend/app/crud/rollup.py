@@ -0,0 +1,92 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.crud.category import category_name
+from app.models.models import SpendingRollup, Transaction
+
+def rollup_period(date: Optional[datetime], created_at: datetime) -> str:
+    """
+    Rollup bucket (YYYY-MM) for a transaction: its date, or when it was recorded if it has none.
+    Matches the backfill's coalesce(date, created_at), so every write path buckets a row alike.
+    """
+    return (date or created_at).strftime("%Y-%m")
+
+def rollup_delta(user_id: int, period: str, category: str, amount: float, count: int):
+    """
+    Build an upsert that adds `amount` and `count` to one (user_id, period, category) rollup row.
+    Execute it on the same session as the transaction write so both commit together.
+    """
+    stmt = insert(SpendingRollup).values(
+        user_id=user_id,
+        period=period,
+        category=category,
+        total_amount=amount,
+        transaction_count=count,
+        version=1
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id", "period", "category"],
+        set_={
+            "total_amount": SpendingRollup.total_amount + stmt.excluded.total_amount,
+            "transaction_count": SpendingRollup.transaction_count + stmt.excluded.transaction_count,
+            "version": SpendingRollup.version + 1
+        }
+    )
+
+def transaction_rollup_delta(transaction: Transaction, sign: int = 1):
+    """Upsert adding (sign=1) or removing (sign=-1) a transaction from its rollup row."""
+    return rollup_delta(
+        transaction.user_id,
+        rollup_period(transaction.date, transaction.created_at),
+        category_name(transaction.category),
+        sign * (transaction.amount or 0.0),
+        sign
+    )
+
+async def data_version(db: AsyncSession, user_id: int) -> int:
+    """
+    Version of a user's transaction data. Every write to a transaction goes with a rollup
+    delta, and rollup rows are never deleted, so this grows with each change.
+    """
+    version = (await db.execute(
+        select(func.coalesce(func.sum(SpendingRollup.version), 0)).where(SpendingRollup.user_id == user_id)
+    )).scalar()
+    return int(version)
+
+def get_spending_summary(db: Session, user_id: int) -> Dict:
+    """
+    Totals, monthly average and category breakdown for a user, read from the rollups only.
+    Cost is O(periods x categories) regardless of how many transactions the user has.
+    """
+    rollups = db.execute(
+        select(SpendingRollup).where(
+            SpendingRollup.user_id == user_id,
+            SpendingRollup.transaction_count > 0
+        )
+    ).scalars().all()
+    
+    months = defaultdict(lambda: {"amount": 0.0, "transaction_count": 0})
+    categories = defaultdict(lambda: {"amount": 0.0, "transaction_count": 0})
+    for rollup in rollups:
+        for bucket in (months[rollup.period], categories[rollup.category]):
+            bucket["amount"] += rollup.total_amount
+            bucket["transaction_count"] += rollup.transaction_count
+    
+    total_spent = sum(m["amount"] for m in months.values())
+    return {
+        "total_spent": total_spent,
+        "transaction_count": sum(m["transaction_count"] for m in months.values()),
+        "monthly_average": total_spent / len(months) if months else 0.0,
+        "months": [
+            {"period": period, **values} for period, values in sorted(months.items())
+        ],
+        "categories": sorted(
+            ({"category": name, **values} for name, values in categories.items()),
+            key=lambda c: c["amount"],
+            reverse=True
+        )
+    }
@@ -1,22 +1,162 @@
-from sqlalchemy.orm import Session
-from app.models.transaction import Transaction
-from typing import List, Optional
+import base64
+import json
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.crud.category import category_name, get_or_create_category_async
+from app.crud.rollup import rollup_delta, rollup_period, transaction_rollup_delta
+from app.models.models import Category, Transaction
+from app.services.similarity_index import similarity_indexes
+from typing import Dict, List, Optional, Tuple
 
-def get_user_transactions(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Transaction]:
-    return db.query(Transaction).filter(Transaction.user_id == user_id).offset(skip).limit(limit).all()
+Cursor = Tuple[Optional[datetime], int]
 
-def get_transaction(db: Session, transaction_id: int) -> Optional[Transaction]:
-    return db.query(Transaction).filter(Transaction.id == transaction_id).first()
+def encode_cursor(transaction: Transaction) -> str:
+    """Build an opaque keyset cursor pointing just after the given transaction."""
+    payload = [transaction.date.isoformat() if transaction.date else None, transaction.id]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
 
-def create_transaction(db: Session, user_id: int, amount: float, description: str, date: str, category_id: Optional[int] = None) -> Transaction:
+def decode_cursor(cursor: str) -> Cursor:
+    """Decode a cursor produced by encode_cursor. Raises ValueError if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        date_str, transaction_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        date = datetime.fromisoformat(date_str) if date_str is not None else None
+        return date, int(transaction_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def _after_cursor(cursor: Cursor):
+    # Rows sort as (date, id) with NULL dates first, matching SQLite's ordering
+    date, transaction_id = cursor
+    if date is None:
+        return or_(
+            Transaction.date.isnot(None),
+            and_(Transaction.date.is_(None), Transaction.id > transaction_id)
+        )
+    return or_(
+        Transaction.date > date,
+        and_(Transaction.date == date, Transaction.id > transaction_id)
+    )
+
+def user_transactions_query(
+    user_id: int,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    categories: Optional[List[str]] = None
+):
+    """Select a user's transactions ordered by (date, id), with optional export-style filters."""
+    query = select(Transaction).where(Transaction.user_id == user_id)
+    if start_date is not None:
+        query = query.where(Transaction.date >= start_date)
+    if end_date is not None:
+        query = query.where(Transaction.date <= end_date)
+    if categories:
+        query = query.where(Transaction.category.has(Category.name.in_(categories)))
+    return query.order_by(Transaction.date, Transaction.id)
+
+def user_transaction_rows_query(
+    user_id: int,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    categories: Optional[List[str]] = None
+):
+    """
+    user_transactions_query as plain (date, description, amount, category) rows, for exports.
+    Skips building Transaction objects; category is None for uncategorized rows.
+    """
+    return user_transactions_query(user_id, start_date, end_date, categories).with_only_columns(
+        Transaction.date, Transaction.description, Transaction.amount, Category.name.label("category")
+    ).outerjoin(Transaction.category)
+
+async def get_user_transactions(
+    db: AsyncSession,
+    user_id: int,
+    skip: int = 0,
+    limit: Optional[int] = 100,
+    after: Optional[Cursor] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    categories: Optional[List[str]] = None
+) -> List[Transaction]:
+    """
+    Page through a user's transactions ordered by (date, id).
+    When `after` is given, seek past it on the (user_id, date, id) index instead of using OFFSET.
+    """
+    query = user_transactions_query(user_id, start_date, end_date, categories)
+    if after is not None:
+        query = query.where(_after_cursor(after))
+    else:
+        query = query.offset(skip)
+    if limit is not None:
+        query = query.limit(limit)
+    # Load categories up front; lazy loading is not available on an AsyncSession
+    result = await db.execute(query.options(selectinload(Transaction.category)))
+    return list(result.scalars().all())
+
+async def get_transaction(db: AsyncSession, transaction_id: int) -> Optional[Transaction]:
+    result = await db.execute(
+        select(Transaction)
+        .where(Transaction.id == transaction_id)
+        .options(selectinload(Transaction.category))
+    )
+    return result.scalars().first()
+
+async def create_transaction(
+    db: AsyncSession,
+    user_id: int,
+    amount: float,
+    description: str,
+    date: Optional[datetime],
+    category: Optional[str] = None
+) -> Transaction:
+    """Insert a transaction and its rollup delta in one commit. `category` is a category name."""
     db_transaction = Transaction(
         user_id=user_id,
         amount=amount,
         description=description,
         date=date,
-        category_id=category_id
+        category=await get_or_create_category_async(db, user_id, category) if category else None,
+        # Set here rather than by the server default: an undated row's rollup period needs it
+        created_at=datetime.utcnow()
     )
     db.add(db_transaction)
-    db.commit()
-    db.refresh(db_transaction)
-    return db_transaction 
\ No newline at end of file
+    await db.flush()
+    await db.execute(transaction_rollup_delta(db_transaction))
+    await db.commit()
+    similarity_indexes.record(db_transaction)
+    return db_transaction
+
+async def add_transactions(db: AsyncSession, user_id: int, items: List[Dict]) -> List[Transaction]:
+    """
+    Stage many transactions and their rollup deltas for a single commit by the caller.
+    Each item has amount, description, date and an optional category name.
+    """
+    categories = {}
+    transactions = []
+    now = datetime.utcnow()
+    for item in items:
+        name = item.get("category")
+        if name and name not in categories:
+            categories[name] = await get_or_create_category_async(db, user_id, name)
+        transactions.append(Transaction(
+            user_id=user_id,
+            amount=item["amount"],
+            description=item["description"],
+            date=item["date"],
+            category=categories.get(name),
+            created_at=now
+        ))
+    db.add_all(transactions)
+    await db.flush()
+
+    deltas = defaultdict(lambda: [0.0, 0])
+    for transaction in transactions:
+        delta = deltas[(rollup_period(transaction.date, transaction.created_at), category_name(transaction.category))]
+        delta[0] += transaction.amount or 0.0
+        delta[1] += 1
+    for (period, category), (amount, count) in deltas.items():
+        await db.execute(rollup_delta(user_id, period, category, amount, count))
+    return transactions
@@ -3,6 +3,12 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.api import api_router
 from app.core.config import settings
 from app.db.init_db import init_db
+from app.db.session import async_engine
+from app.services.categorization_queue import categorization_queue
+from app.services.export_jobs import export_job_runner
+from app.services.llm_client import llm_client
+from app.services.ocr_pool import ocr_pool
+from app.services.receipt_jobs import receipt_job_runner
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -18,6 +24,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include API router
@@ -27,6 +34,19 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 @app.on_event("startup")
 async def startup_event():
     init_db()
+    await categorization_queue.start()
+    ocr_pool.start()
+    await receipt_job_runner.start()
+    await export_job_runner.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await export_job_runner.stop()
+    await receipt_job_runner.stop()
+    await categorization_queue.stop()
+    ocr_pool.shutdown()
+    await llm_client.close()
+    await async_engine.dispose()
 
 # Health check endpoint
 @app.get("/health")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Index, UniqueConstraint, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base_class import Base
@@ -41,6 +41,7 @@ class Transaction(Base):
     date = Column(DateTime(timezone=True))
     user_id = Column(Integer, ForeignKey("users.id"))
     category_id = Column(Integer, ForeignKey("categories.id"))
+    import_hash = Column(String, nullable=True)  # sha256 of (date, amount, description) for statement imports
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
@@ -48,17 +49,120 @@ class Transaction(Base):
     category = relationship("Category", back_populates="transactions")
     receipt = relationship("Receipt", back_populates="transaction", uselist=False)
 
+    __table_args__ = (
+        # Serves keyset pagination: WHERE user_id = ? AND (date, id) > (?, ?) ORDER BY date, id
+        Index("ix_transactions_user_id_date_id", "user_id", "date", "id"),
+        # Makes re-importing an overlapping statement idempotent
+        Index("ix_transactions_user_id_import_hash", "user_id", "import_hash", unique=True),
+    )
+
 class Receipt(Base):
     __tablename__ = "receipts"
 
     id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
     transaction_id = Column(Integer, ForeignKey("transactions.id"))
     image_url = Column(String)
     merchant_name = Column(String)
     total_amount = Column(Float)
     receipt_date = Column(DateTime(timezone=True))
     ocr_text = Column(String)
+    image_sha256 = Column(String, nullable=True, index=True)
+    image_dhash = Column(Integer, nullable=True)  # 64-bit difference hash, stored signed
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
-    transaction = relationship("Transaction", back_populates="receipt") 
\ No newline at end of file
+    transaction = relationship("Transaction", back_populates="receipt") 
+
+class ReceiptOCRCacheEntry(Base):
+    __tablename__ = "receipt_ocr_cache"
+
+    image_sha256 = Column(String, primary_key=True)
+    image_dhash = Column(Integer, nullable=False)
+    result = Column(JSON, nullable=False)  # ReceiptProcessor.process_receipt "data"
+    expires_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+class ReceiptJob(Base):
+    __tablename__ = "receipt_jobs"
+
+    id = Column(String, primary_key=True)  # uuid4 hex, handed to the client for polling
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    operation = Column(String, nullable=False)  # process | analyze | create_transaction
+    status = Column(String, nullable=False, default="queued")  # queued | running | succeeded | failed
+    stage = Column(String, nullable=False, default="queued")  # progress within a running job
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+    filename = Column(String, nullable=True)
+    image_url = Column(String, nullable=True)  # blob store URI of the upload, as on Receipt
+    result = Column(JSON, nullable=True)
+    receipt_id = Column(Integer, ForeignKey("receipts.id"), nullable=True)
+    transaction_id = Column(Integer, ForeignKey("transactions.id"), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)  # a running job whose lease lapsed is picked up again
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # Serves the worker's claim query: oldest queued (or lease-expired) job first
+        Index("ix_receipt_jobs_status_created_at", "status", "created_at"),
+        Index("ix_receipt_jobs_user_id", "user_id"),
+    )
+
+class ExportJob(Base):
+    __tablename__ = "export_jobs"
+
+    id = Column(String, primary_key=True)  # uuid4 hex, handed to the client for polling
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    format = Column(String, nullable=False)  # csv | json | ndjson | excel | parquet | arrow
+    filters = Column(JSON, nullable=False)  # start_date, end_date, categories
+    data_version = Column(Integer, nullable=False)  # the user's data version, re-read when the job runs
+    artifact_key = Column(String, nullable=False)  # export cache key of the rendered file
+    status = Column(String, nullable=False, default="queued")  # queued | running | succeeded | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+    size = Column(Integer, nullable=True)  # bytes, once rendered
+    lease_expires_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_export_jobs_status_created_at", "status", "created_at"),
+        Index("ix_export_jobs_user_id_artifact_key", "user_id", "artifact_key"),
+    )
+
+class SpendingRollup(Base):
+    __tablename__ = "spending_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    period = Column(String, nullable=False)  # YYYY-MM
+    category = Column(String, nullable=False)
+    total_amount = Column(Float, nullable=False, default=0.0)
+    transaction_count = Column(Integer, nullable=False, default=0)
+    # Bumped by every delta; the sum over a user's rows versions their transaction data
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "period", "category", name="uq_spending_rollups_user_period_category"),
+    )
+
+class CategorizationCacheEntry(Base):
+    __tablename__ = "categorization_cache"
+
+    merchant_key = Column(String, primary_key=True)  # normalized description
+    category = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+class CategoryOverride(Base):
+    __tablename__ = "category_overrides"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    merchant_key = Column(String, nullable=False)
+    category = Column(String, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "merchant_key", name="uq_category_overrides_user_merchant"),
+    )
@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+class ExportJobSubmitted(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+
+class ExportJobStatus(BaseModel):
+    id: str
+    format: str
+    status: str
+    attempts: int
+    error: Optional[str] = None
+    size: Optional[int] = None
+    data_version: int
+    download_url: Optional[str] = None  # set once succeeded
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 class ReceiptItem(BaseModel):
@@ -9,7 +9,7 @@ class ReceiptItem(BaseModel):
 class ReceiptProcessingResponse(BaseModel):
     date: Optional[str]
     total_amount: Optional[float]
-    items: List[ReceiptItem]
+    items: Optional[List[ReceiptItem]] = None  # only when requested (include_items)
     merchant: Optional[str]
     raw_text: str
 
@@ -23,14 +23,44 @@ class ReceiptData(BaseModel):
     merchant: Optional[str]
     raw_text: str
 
+class ReceiptDuplicate(BaseModel):
+    receipt_id: int
+    transaction_id: Optional[int] = None
+    distance: int  # differing perceptual-hash bits; 0 for the same image bytes
+
 class ReceiptResponse(BaseModel):
     success: bool
     data: Optional[ReceiptData] = None
     error: Optional[str] = None
+    cached: bool = False
+    duplicate: Optional[ReceiptDuplicate] = None
 
 class ReceiptAnalysis(BaseModel):
     receipt_data: ReceiptData
     suggested_category: str
     confidence_score: float
     similar_transactions: list[str] = []
-    budget_impact: Optional[float] = None 
\ No newline at end of file
+    budget_impact: Optional[float] = None
+    cached: bool = False
+    duplicate: Optional[ReceiptDuplicate] = None
+
+class ReceiptJobSubmitted(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+
+class ReceiptJobStatus(BaseModel):
+    id: str
+    operation: str
+    status: str
+    stage: str
+    attempts: int
+    error: Optional[str] = None
+    receipt_id: Optional[int] = None
+    transaction_id: Optional[int] = None
+    result: Optional[Dict[str, Any]] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, field_validator
+from typing import List, Optional
 from datetime import datetime
 
 class TransactionBase(BaseModel):
@@ -8,6 +8,12 @@ class TransactionBase(BaseModel):
     category: str
     date: datetime
 
+    @field_validator("category", mode="before")
+    @classmethod
+    def category_to_name(cls, value):
+        # ORM rows carry a Category relationship; the API exposes its name
+        return getattr(value, "name", value)
+
 class TransactionCreate(TransactionBase):
     pass
 
@@ -37,4 +43,31 @@ class TransactionResponse(TransactionBase):
     created_at: datetime
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class MonthlySpending(BaseModel):
+    period: str
+    amount: float
+    transaction_count: int
+
+class CategorySpending(BaseModel):
+    category: str
+    amount: float
+    transaction_count: int
+
+class SpendingSummary(BaseModel):
+    total_spent: float
+    transaction_count: int
+    monthly_average: float
+    months: List[MonthlySpending]
+    categories: List[CategorySpending]
+
+class StatementImportResult(BaseModel):
+    imported: int
+    duplicates: int
+    skipped: int
+
+class CategorizerTrainingResult(BaseModel):
+    samples: int
+    classes: List[str]
+    training_accuracy: float
@@ -1,6 +1,11 @@
-from typing import List, Dict
-import openai
+import asyncio
+from typing import List, Dict, Optional, Tuple
 from app.core.config import settings
+from app.services.categorization_batcher import CategorizationBatcher
+from app.services.categorization_cache import categorization_cache
+from app.services.llm_client import llm_client
+from app.services.local_model import HashedNgramClassifier, load_user_model
+from app.services.similarity_index import SimilarityIndex
 import re
 
 CATEGORY_DESCRIPTIONS = {
@@ -16,6 +21,18 @@ CATEGORY_DESCRIPTIONS = {
     "other": "Miscellaneous expenses"
 }
 
+# Maps TransactionCategorizer names onto the CATEGORY_DESCRIPTIONS vocabulary used by the AI
+LOCAL_CATEGORY_KEYS = {
+    "Food & Dining": "food",
+    "Shopping": "shopping",
+    "Transportation": "transportation",
+    "Bills & Utilities": "utilities",
+    "Entertainment": "entertainment",
+    "Health & Fitness": "healthcare",
+    "Travel": "travel",
+    "Education": "education"
+}
+
 class TransactionCategorizer:
     def __init__(self):
         self.categories = {
@@ -59,95 +76,181 @@ class TransactionCategorizer:
             for category, info in self.categories.items()
         }
         
-        # Initialize TF model (placeholder for now)
-        self.model = None
+        # All keywords in one alternation (longest first) so a description is scanned once.
+        # Each keyword maps to the per-category hit counts the individual patterns would give it,
+        # which keeps nested keywords ("uber eats" also counting as "uber") scoring the same.
+        self._category_keys = list(self.categories.keys())
+        keywords = {k.lower() for info in self.categories.values() for k in info['keywords']}
+        self._keyword_scores = {
+            keyword: [
+                (index, len(self.patterns[category].findall(keyword)))
+                for index, category in enumerate(self._category_keys)
+                if self.patterns[category].search(keyword)
+            ]
+            for keyword in keywords
+        }
+        # Matched against lowercased text; case-sensitive matching is markedly faster
+        self._keyword_pattern = re.compile(
+            r'\b(?:{})\b'.format('|'.join(re.escape(k) for k in sorted(keywords, key=len, reverse=True)))
+        )
+        
+        # Trained local classifier; keyword matching is used until one is trained or loaded
+        self.model: Optional[HashedNgramClassifier] = None
         
     def predict_category(self, description: str, amount: float) -> Dict:
         """
         Predict category for a transaction based on description and amount
         """
-        if not description:
-            return {"category": "other", "confidence": 0.0}
-        
-        # Initialize scores
-        scores = {category: 0 for category in self.categories.keys()}
-        
-        # Check for keyword matches
-        for category, pattern in self.patterns.items():
-            matches = pattern.findall(description.lower())
-            if matches:
-                scores[category] = len(matches)
-        
-        # Get category with highest score
-        max_score = max(scores.values())
-        if max_score == 0:
-            return {"category": "other", "confidence": 0.0}
-        
-        # Get category with highest score
-        best_category = max(scores.items(), key=lambda x: x[1])[0]
-        confidence = min(max_score / 3, 1.0)  # Normalize confidence
-        
-        return {
-            "category": self.categories[best_category]["name"],
-            "confidence": confidence
-        }
+        return self.predict_many([description], [amount])[0]
 
-    def get_similar_transactions(self, transactions: List[Dict], target: Dict) -> List[Dict]:
+    def predict_many(self, descriptions: List[str], amounts: List[float]) -> List[Dict]:
         """
-        Find similar transactions based on description and amount
+        Keyword-based prediction for many transactions, one regex scan per description.
         """
-        similar = []
-        target_category = self.predict_category(target["description"], target["amount"])["category"]
+        other = {"category": "other", "confidence": 0.0}
+        findall = self._keyword_pattern.findall
+        keyword_scores = self._keyword_scores
+        names = [self.categories[key]["name"] for key in self._category_keys]
+        empty_scores = [0] * len(names)
         
-        for transaction in transactions:
-            if transaction["id"] == target["id"]:
+        results = []
+        for description in descriptions:
+            if not description:
+                results.append(dict(other))
                 continue
             
-            category = self.predict_category(transaction["description"], transaction["amount"])["category"]
-            if category == target_category:
-                similar.append(transaction)
-        
-        return similar[:3]  # Return top 3 similar transactions
+            scores = empty_scores.copy()
+            for keyword in findall(description.lower()):
+                for index, count in keyword_scores[keyword]:
+                    scores[index] += count
+            
+            # Get category with highest score (first category wins ties)
+            max_score = max(scores)
+            if max_score == 0:
+                results.append(dict(other))
+                continue
+            results.append({
+                "category": names[scores.index(max_score)],
+                "confidence": min(max_score / 3, 1.0)  # Normalize confidence
+            })
+        return results
+
+    def get_similar_transactions(self, transactions: List[Dict], target: Dict) -> List[Dict]:
+        """
+        Find similar transactions based on description and amount
+        """
+        index = SimilarityIndex()
+        index.add_many([(t["id"], t["description"], t["amount"]) for t in transactions])
+        by_id = {t["id"]: t for t in transactions}
+        matches = index.query(target["description"], target["amount"], k=3, exclude_id=target["id"])
+        return [by_id[match["id"]] for match in matches]  # Return top 3 similar transactions
     
-    def train_model(self, training_data: List[Dict]):
+    def train_model(self, training_data: List[Dict]) -> float:
         """
-        Train the ML model with historical transaction data.
-        To be implemented in the future.
+        Train the local classifier on already-categorized transactions.
+        Each item needs "description", "amount" and "category". Returns training accuracy.
         """
-        pass 
+        model = HashedNgramClassifier(n_features=settings.LOCAL_MODEL_FEATURES)
+        accuracy = model.fit(
+            [t["description"] for t in training_data],
+            [t["amount"] for t in training_data],
+            [t["category"] for t in training_data]
+        )
+        self.model = model
+        return accuracy
+
+    def save_model(self, path: str):
+        self.model.save(path)
 
-async def categorize_transaction(description: str, amount: float) -> str:
+    def load_model(self, path: str):
+        self.model = HashedNgramClassifier.load(path)
+
+    def predict_batch(self, descriptions: List[str], amounts: List[float]) -> List[Dict]:
+        """
+        Vectorized prediction with the trained model, falling back to keyword matching.
+        """
+        if self.model is not None:
+            return self.model.predict_batch(descriptions, amounts)
+        return self.predict_many(descriptions, amounts)
+
+    def categorize_batch(self, descriptions: List[str], amounts: List[float]) -> List[str]:
+        """
+        Categorize many transactions locally, returning CATEGORY_DESCRIPTIONS keys.
+        Used for bulk paths (statement imports) where one LLM call per row is too slow.
+        """
+        return [
+            LOCAL_CATEGORY_KEYS.get(prediction["category"], "other")
+            for prediction in self.predict_many(descriptions, amounts)
+        ]
+
+local_categorizer = TransactionCategorizer()
+
+# "3. food", "3) food", "3: food"
+_REPLY_LINE_PATTERN = re.compile(r'^\s*(\d+)\s*[\.\):\-]\s*([a-z]+)', re.IGNORECASE | re.MULTILINE)
+
+def build_batch_prompt(items: List[Tuple[str, float]]) -> str:
+    lines = "\n".join(
+        f"{i}. Description: {' '.join(description.split())} | Amount: ${amount}"
+        for i, (description, amount) in enumerate(items, start=1)
+    )
+    return f"""
+Categorize each of the following transactions into one of these categories:
+{', '.join(CATEGORY_DESCRIPTIONS.keys())}
+
+Category descriptions:
+{chr(10).join([f'- {k}: {v}' for k, v in CATEGORY_DESCRIPTIONS.items()])}
+
+Transactions:
+{lines}
+
+Reply with exactly one line per transaction in the form "<number>. <category>", nothing else.
+"""
+
+def parse_batch_reply(text: str, count: int) -> Dict[int, str]:
+    """Map 1-based item numbers to categories; unknown categories become "other"."""
+    results = {}
+    for number, category in _REPLY_LINE_PATTERN.findall(text):
+        index = int(number)
+        if 1 <= index <= count and index not in results:
+            category = category.lower()
+            results[index] = category if category in CATEGORY_DESCRIPTIONS else "other"
+    return results
+
+categorization_batcher = CategorizationBatcher(build_batch_prompt, parse_batch_reply)
+
+async def categorize_with_ai(description: str, amount: float, user_id: Optional[int] = None) -> str:
+    """
+    Categorize from the cache, the user's trained model or the LLM, in that order.
+    Raises LLMUnavailable when the LLM is needed but cannot answer; the caller picks the fallback.
+    """
+    cached = await categorization_cache.get(description, user_id)
+    if cached is not None:
+        return cached
+    
+    # The user's own trained model answers offline when it is confident enough
+    model = await asyncio.to_thread(load_user_model, user_id) if user_id is not None else None
+    if model is not None:
+        prediction = model.predict_batch([description], [amount])[0]
+        if prediction["confidence"] >= settings.LOCAL_MODEL_CONFIDENCE_THRESHOLD:
+            return prediction["category"]
+    
+    # Concurrent callers share one numbered prompt
+    category = await categorization_batcher.categorize(description, amount)
+    await categorization_cache.set(description, category)
+    return category
+
+async def categorize_transaction(description: str, amount: float, user_id: Optional[int] = None) -> str:
     """
     Use AI to categorize a transaction based on its description and amount.
+    Repeat merchants (and the user's own overrides) are answered from the categorization cache.
     """
     try:
-        prompt = f"""
-        Given the following transaction:
-        Description: {description}
-        Amount: ${amount}
-        
-        Categorize this transaction into one of these categories:
-        {', '.join(CATEGORY_DESCRIPTIONS.keys())}
-        
-        Category descriptions:
-        {chr(10).join([f'- {k}: {v}' for k, v in CATEGORY_DESCRIPTIONS.items()])}
-        
-        Return only the category name, nothing else.
-        """
-        
-        response = openai.Completion.create(
-            engine="gpt-3.5-turbo-instruct",
-            prompt=prompt,
-            max_tokens=10,
-            temperature=0.3
-        )
-        
-        category = response.choices[0].text.strip().lower()
-        return category if category in CATEGORY_DESCRIPTIONS else "other"
+        return await categorize_with_ai(description, amount, user_id)
         
     except Exception as e:
-        print(f"Error in AI categorization: {e}")
-        return "other"
+        # Slow or failing LLM: answer from the keyword categorizer instead of waiting
+        print(f"Error in AI categorization, using local categorizer: {e}")
+        return local_categorizer.categorize_batch([description], [amount])[0]
 
 async def suggest_budget_improvements(transactions: List[Dict]) -> str:
     """
@@ -177,14 +280,14 @@ async def suggest_budget_improvements(transactions: List[Dict]) -> str:
         Keep the response concise and actionable.
         """
         
-        response = openai.Completion.create(
-            engine="gpt-3.5-turbo-instruct",
-            prompt=prompt,
+        text = await llm_client.complete(
+            prompt,
             max_tokens=200,
-            temperature=0.7
+            temperature=0.7,
+            timeout=settings.OPENAI_ANALYSIS_TIMEOUT
         )
         
-        return response.choices[0].text.strip()
+        return text.strip()
         
     except Exception as e:
         print(f"Error in budget analysis: {e}")
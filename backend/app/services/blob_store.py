@@ -0,0 +1,177 @@
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+import os
+import uuid
+from typing import Optional
+import aiofiles
+import aiofiles.os
+from fastapi import UploadFile
+from PIL import Image, ImageOps
+from app.core.config import settings
+
+CHUNK_SIZE = 1 << 20
+
+class BlobTooLarge(Exception):
+    """Raised when an upload exceeds the store's size limit."""
+    pass
+
+class StagedBlob:
+    """An upload streamed to local scratch space and hashed, but not stored yet."""
+
+    def __init__(self, path: str, sha256: str, size: int):
+        self.path = path
+        self.sha256 = sha256
+        self.size = size
+        self.committed = False
+
+def make_thumbnail(source: str, destination: str, size: int):
+    """
+    Write a JPEG thumbnail of an image file. JPEGs are decoded at a reduced scale.
+    Blocking; run it in a thread.
+    """
+    with Image.open(source) as image:
+        image.draft("RGB", (size, size))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size))
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        # Write under a temporary name so a concurrent reader never sees a partial file
+        partial = f"{destination}.{uuid.uuid4().hex}.partial"
+        image.save(partial, format="JPEG", quality=80)
+    os.replace(partial, destination)
+
+def media_type(path: str) -> str:
+    """MIME type of a stored image, from its header."""
+    try:
+        with Image.open(path) as image:
+            return Image.MIME.get(image.format, "application/octet-stream")
+    except Exception:
+        return "application/octet-stream"
+
+class BlobStore(ABC):
+    """
+    Content-addressed storage for receipt images: a blob's key is the SHA-256 of its bytes,
+    so the same image uploaded twice is stored once. Uploads are first streamed to local
+    staging (where OCR workers read them) and committed when a receipt is saved or queued.
+    Backends implement the storage half; Receipt.image_url holds uri(key).
+    """
+    scheme = ""
+
+    def __init__(self, staging_dir: str, max_bytes: int = settings.RECEIPT_MAX_IMAGE_BYTES):
+        self.staging_dir = staging_dir
+        self.max_bytes = max_bytes
+
+    def uri(self, key: str) -> str:
+        return f"{self.scheme}://{key}"
+
+    def key(self, uri: str) -> Optional[str]:
+        """Blob key of a Receipt.image_url written by this backend, else None."""
+        prefix = f"{self.scheme}://"
+        return uri[len(prefix):] if uri and uri.startswith(prefix) else None
+
+    async def stage(self, upload: UploadFile) -> StagedBlob:
+        """Stream an upload to staging in chunks, hashing as it goes. Raises BlobTooLarge."""
+        await aiofiles.os.makedirs(self.staging_dir, exist_ok=True)
+        path = os.path.join(self.staging_dir, uuid.uuid4().hex)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            async with aiofiles.open(path, "wb") as out:
+                while chunk := await upload.read(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise BlobTooLarge(f"Receipt image exceeds {self.max_bytes} bytes")
+                    digest.update(chunk)
+                    await out.write(chunk)
+        except BaseException:
+            await self._remove(path)
+            raise
+        return StagedBlob(path, digest.hexdigest(), size)
+
+    async def discard(self, staged: StagedBlob):
+        """Drop a staged upload that was not committed."""
+        if not staged.committed:
+            await self._remove(staged.path)
+
+    async def _remove(self, path: str):
+        try:
+            await aiofiles.os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    @abstractmethod
+    async def commit(self, staged: StagedBlob) -> str:
+        """Store a staged upload under its hash; returns its URI."""
+
+    @abstractmethod
+    async def put_bytes(self, data: bytes) -> str:
+        """Store an in-memory image (batch receipts); returns its URI."""
+
+    @abstractmethod
+    async def local_path(self, key: str) -> Optional[str]:
+        """Path of the stored blob on local disk, or None if missing."""
+
+    @abstractmethod
+    async def thumbnail_path(self, key: str) -> Optional[str]:
+        """Path of the blob's thumbnail, generated on first request, or None if missing."""
+
+class LocalBlobStore(BlobStore):
+    """Blobs under root/ab/<sha256>, thumbnails under root/thumbnails/ab/<sha256>.jpg."""
+    scheme = "local"
+
+    def __init__(self, root: str, thumbnail_size: int = settings.RECEIPT_THUMBNAIL_SIZE):
+        # Absolute, since OCR workers open staged uploads by path
+        root = os.path.abspath(root)
+        super().__init__(os.path.join(root, ".staging"))
+        self.root = root
+        self.thumbnail_size = thumbnail_size
+
+    def _path(self, key: str, *parts: str) -> str:
+        if len(key) != 64 or any(c not in "0123456789abcdef" for c in key):
+            raise ValueError(f"Invalid blob key: {key!r}")
+        return os.path.join(self.root, *parts, key[:2], key)
+
+    async def commit(self, staged: StagedBlob) -> str:
+        path = self._path(staged.sha256)
+        if await aiofiles.os.path.exists(path):
+            await self._remove(staged.path)  # already stored
+        else:
+            await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+            await aiofiles.os.replace(staged.path, path)
+        staged.committed = True
+        return self.uri(staged.sha256)
+
+    async def put_bytes(self, data: bytes) -> str:
+        key = hashlib.sha256(data).hexdigest()
+        path = self._path(key)
+        if not await aiofiles.os.path.exists(path):
+            await aiofiles.os.makedirs(self.staging_dir, exist_ok=True)
+            partial = os.path.join(self.staging_dir, uuid.uuid4().hex)
+            async with aiofiles.open(partial, "wb") as out:
+                await out.write(data)
+            await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+            await aiofiles.os.replace(partial, path)
+        return self.uri(key)
+
+    async def local_path(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        return path if await aiofiles.os.path.exists(path) else None
+
+    async def thumbnail_path(self, key: str) -> Optional[str]:
+        source = await self.local_path(key)
+        if source is None:
+            return None
+        path = self._path(key, "thumbnails") + ".jpg"
+        if not await aiofiles.os.path.exists(path):
+            await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+            await asyncio.to_thread(make_thumbnail, source, path, self.thumbnail_size)
+        return path
+
+def create_blob_store(backend: str) -> BlobStore:
+    # Further backends (e.g. an S3 bucket from the AWS_* settings) plug in here
+    if backend == "local":
+        return LocalBlobStore(settings.RECEIPT_STORAGE_DIR)
+    raise ValueError(f"Unknown receipt storage backend: {backend}")
+
+receipt_image_store = create_blob_store(settings.RECEIPT_STORAGE_BACKEND)
@@ -0,0 +1,84 @@
+import asyncio
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from app.core.config import settings
+from app.services.categorization_cache import normalize_description
+from app.services.llm_client import llm_client, LLMUnavailable
+
+class CategorizationBatcher:
+    """
+    Coalesces concurrent categorization requests into one LLM prompt.
+    A batch is sent when it reaches max_batch_size or window_ms after its first item,
+    whichever comes first. Each caller awaits only its own line of the reply.
+    """
+
+    def __init__(
+        self,
+        build_prompt: Callable[[List[Tuple[str, float]]], str],
+        parse_reply: Callable[[str, int], Dict[int, str]],
+        max_batch_size: int = settings.CATEGORIZE_BATCH_MAX_SIZE,
+        window_ms: float = settings.CATEGORIZE_BATCH_WINDOW_MS
+    ):
+        self.build_prompt = build_prompt
+        self.parse_reply = parse_reply
+        self.max_batch_size = max_batch_size
+        self.window = window_ms / 1000
+        # merchant key -> (description, amount, waiters)
+        self._pending: Dict[str, Tuple[str, float, List[asyncio.Future]]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.counters = {"items": 0, "batches": 0, "failed_batches": 0}
+
+    async def categorize(self, description: str, amount: float) -> str:
+        """Category for one transaction; raises LLMUnavailable if its batch fails."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.counters["items"] += 1
+
+        # Same merchant twice in one window only needs one line in the prompt
+        key = normalize_description(description) or description
+        if key in self._pending:
+            self._pending[key][2].append(future)
+        else:
+            self._pending[key] = (description, amount, [future])
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = list(self._pending.values())
+        self._pending = {}
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, float, List[asyncio.Future]]]):
+        self.counters["batches"] += 1
+        try:
+            text = await llm_client.complete(
+                self.build_prompt([(description, amount) for description, amount, _ in batch]),
+                max_tokens=8 * len(batch) + 10,
+                temperature=0.3,
+                timeout=settings.OPENAI_CATEGORIZE_TIMEOUT
+            )
+            results = self.parse_reply(text, len(batch))
+        except LLMUnavailable as e:
+            self.counters["failed_batches"] += 1
+            results, error = {}, e
+        else:
+            error = LLMUnavailable("Item missing from batched reply")
+
+        for index, (_, _, waiters) in enumerate(batch, start=1):
+            for future in waiters:
+                if future.done():
+                    continue
+                if index in results:
+                    future.set_result(results[index])
+                else:
+                    future.set_exception(error)
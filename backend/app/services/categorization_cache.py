@@ -0,0 +1,191 @@
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.models import CategorizationCacheEntry, CategoryOverride
+
+# Store numbers, card suffixes, reference ids and other noise that varies between charges
+_NOISE_PATTERN = re.compile(r'#\s*\w+|\d+|[^a-z\s]')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# Remembers that a user has no override for a merchant, so we don't ask the database again
+_NO_OVERRIDE = object()
+
+# Prune the database table after this many writes
+_PRUNE_EVERY = 1000
+
+def normalize_description(description: str) -> str:
+    """
+    Reduce a transaction description to a merchant key.
+    "STARBUCKS #1234" and "Starbucks 0042" both become "starbucks"; "UBER *TRIP" becomes "uber trip".
+    """
+    text = _NOISE_PATTERN.sub(' ', description.lower())
+    return _WHITESPACE_PATTERN.sub(' ', text).strip()
+
+class CategorizationCache:
+    """
+    Two-level cache of AI categorizations keyed on normalized merchant text.
+    Level 1 is an in-process LRU, level 2 the categorization_cache table.
+    Per-user overrides (from manual re-categorization) take precedence over shared entries.
+    Overrides, and the absence of one, are only held locally for override_ttl_seconds, since
+    an override set through another process is not seen here until the entry expires.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.CATEGORY_CACHE_MAX_ENTRIES,
+        db_max_entries: int = settings.CATEGORY_CACHE_DB_MAX_ENTRIES,
+        ttl_seconds: int = settings.CATEGORY_CACHE_TTL_SECONDS,
+        override_ttl_seconds: int = settings.CATEGORY_OVERRIDE_TTL_SECONDS
+    ):
+        self.max_entries = max_entries
+        self.db_max_entries = db_max_entries
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.override_ttl = timedelta(seconds=override_ttl_seconds)
+        # (user_id or None, merchant_key) -> (category or _NO_OVERRIDE, expires_at)
+        self._entries: OrderedDict = OrderedDict()
+        # Overrides are written from sync handlers running in the threadpool
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.counters = {"memory_hits": 0, "db_hits": 0, "override_hits": 0, "misses": 0, "evictions": 0}
+
+    def _get_local(self, key: Tuple) -> Optional[object]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < datetime.utcnow():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _put_local(self, key: Tuple, value: object, expires_at: Optional[datetime] = None):
+        with self._lock:
+            self._entries[key] = (value, expires_at or datetime.utcnow() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    async def get(self, description: str, user_id: Optional[int] = None) -> Optional[str]:
+        """Cached category for a description, or None on a miss."""
+        merchant_key = normalize_description(description)
+        if not merchant_key:
+            return None
+
+        if user_id is not None:
+            override = self._get_local((user_id, merchant_key))
+            if override is None:
+                async with AsyncSessionLocal() as db:
+                    result = await db.execute(
+                        select(CategoryOverride.category).where(
+                            CategoryOverride.user_id == user_id,
+                            CategoryOverride.merchant_key == merchant_key
+                        )
+                    )
+                    override = result.scalars().first() or _NO_OVERRIDE
+                self._put_local((user_id, merchant_key), override, datetime.utcnow() + self.override_ttl)
+            if override is not _NO_OVERRIDE:
+                self.counters["override_hits"] += 1
+                return override
+
+        category = self._get_local((None, merchant_key))
+        if category is not None:
+            self.counters["memory_hits"] += 1
+            return category
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(CategorizationCacheEntry).where(
+                    CategorizationCacheEntry.merchant_key == merchant_key,
+                    CategorizationCacheEntry.expires_at > datetime.utcnow()
+                )
+            )
+            entry = result.scalars().first()
+        if entry is not None:
+            self.counters["db_hits"] += 1
+            self._put_local((None, merchant_key), entry.category, entry.expires_at)
+            return entry.category
+
+        self.counters["misses"] += 1
+        return None
+
+    async def set(self, description: str, category: str):
+        """Store an AI categorization in both levels."""
+        merchant_key = normalize_description(description)
+        if not merchant_key:
+            return
+        now = datetime.utcnow()
+        self._put_local((None, merchant_key), category, now + self.ttl)
+
+        stmt = insert(CategorizationCacheEntry).values(
+            merchant_key=merchant_key,
+            category=category,
+            expires_at=now + self.ttl,
+            updated_at=now
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["merchant_key"],
+            set_={"category": stmt.excluded.category, "expires_at": stmt.excluded.expires_at, "updated_at": now}
+        )
+        async with AsyncSessionLocal() as db:
+            await db.execute(stmt)
+            self._writes += 1
+            if self._writes % _PRUNE_EVERY == 0:
+                await db.execute(self._prune_statement(now))
+            await db.commit()
+
+    def _prune_statement(self, now: datetime):
+        # Drop expired rows and everything beyond the newest db_max_entries
+        keep = select(CategorizationCacheEntry.merchant_key).order_by(
+            CategorizationCacheEntry.updated_at.desc()
+        ).limit(self.db_max_entries)
+        return delete(CategorizationCacheEntry).where(
+            (CategorizationCacheEntry.expires_at <= now) |
+            CategorizationCacheEntry.merchant_key.not_in(keep)
+        )
+
+    def set_override(self, db: Session, user_id: int, description: str, category: str):
+        """
+        Record a user's manual categorization for a merchant.
+        Runs on the caller's session so it commits together with the transaction update;
+        call remember_override once that commit succeeds.
+        """
+        merchant_key = normalize_description(description or "")
+        if not merchant_key:
+            return
+        stmt = insert(CategoryOverride).values(
+            user_id=user_id,
+            merchant_key=merchant_key,
+            category=category,
+            updated_at=datetime.utcnow()
+        )
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["user_id", "merchant_key"],
+            set_={"category": stmt.excluded.category, "updated_at": stmt.excluded.updated_at}
+        ))
+
+    def remember_override(self, user_id: int, description: str, category: str):
+        """Put a committed override in the local cache, so this process uses it straight away."""
+        merchant_key = normalize_description(description or "")
+        if merchant_key:
+            self._put_local((user_id, merchant_key), category, datetime.utcnow() + self.override_ttl)
+
+    def stats(self) -> Dict:
+        lookups = sum(self.counters[k] for k in ("memory_hits", "db_hits", "override_hits", "misses"))
+        hits = lookups - self.counters["misses"]
+        return {
+            **self.counters,
+            "entries": len(self._entries),
+            "hit_rate": hits / lookups if lookups else 0.0
+        }
+
+categorization_cache = CategorizationCache()
@@ -0,0 +1,187 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Dict, List, Optional, Set
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from app.core.config import settings
+from app.crud.category import category_name, get_or_create_category_async
+from app.crud.rollup import transaction_rollup_delta
+from app.db.session import AsyncSessionLocal
+from app.models.models import Category, Transaction
+from app.services.ai_categorization import categorize_with_ai, local_categorizer
+from app.services.llm_client import llm_client, LLMUnavailable
+
+PENDING = "Pending"
+
+class CategorizationQueue:
+    """
+    Categorizes newly written transactions in the background.
+    Writes insert the row under the "Pending" category and submit it here; a fixed pool of
+    workers asks the AI categorizer, retries with exponential backoff while the LLM is
+    unavailable, and finally falls back to the keyword categorizer.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.CATEGORIZE_QUEUE_WORKERS,
+        max_size: int = settings.CATEGORIZE_QUEUE_MAX_SIZE,
+        max_attempts: int = settings.CATEGORIZE_MAX_ATTEMPTS,
+        backoff: float = settings.CATEGORIZE_RETRY_BACKOFF_SECONDS
+    ):
+        self.workers = workers
+        self.max_size = max_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._queue: Optional[asyncio.Queue] = None  # created in start() so it binds to the running loop
+        self._tasks: List[asyncio.Task] = []
+        self._retries: Set[asyncio.TimerHandle] = set()
+        self._in_flight = 0
+        self._latencies = deque(maxlen=1000)  # seconds from insert to category, most recent jobs
+        self.counters = {"submitted": 0, "categorized": 0, "retries": 0, "fallbacks": 0, "superseded": 0, "errors": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._queue is not None
+
+    def accepting(self) -> bool:
+        """False when writes should categorize inline instead of queueing."""
+        return self.running and self._queue.qsize() < self.max_size
+
+    def initial_category(self, description: str, amount: float) -> str:
+        """Category to insert a new transaction with: Pending, or a keyword guess if the queue is full."""
+        if self.accepting():
+            return PENDING
+        return local_categorizer.categorize_batch([description], [amount])[0]
+
+    def submit(self, transaction: Transaction):
+        """Queue a freshly committed transaction; a no-op unless it was inserted as Pending."""
+        if category_name(transaction.category) != PENDING:
+            return
+        self.counters["submitted"] += 1
+        self._offer({
+            "transaction_id": transaction.id,
+            "user_id": transaction.user_id,
+            "description": transaction.description,
+            "amount": transaction.amount,
+            "attempts": 0,
+            "submitted_at": time.monotonic()
+        })
+
+    def _offer(self, job: Dict):
+        if not self.running:
+            return  # left Pending in the database; recovered on next startup
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            # Try again after a backoff rather than dropping the job
+            self._retry_later(job)
+
+    def _retry_later(self, job: Dict):
+        delay = self.backoff * 2 ** job["attempts"] * (0.5 + random.random())
+        loop = asyncio.get_running_loop()
+        handle = None
+
+        def fire():
+            self._retries.discard(handle)
+            self._offer(job)
+
+        handle = loop.call_later(delay, fire)
+        self._retries.add(handle)
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        await self._recover()
+
+    async def stop(self):
+        for handle in self._retries:
+            handle.cancel()
+        self._retries.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    async def _recover(self):
+        """Re-queue transactions left Pending by a previous process."""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Transaction)
+                .join(Transaction.category)
+                .where(Category.name == PENDING)
+                .options(selectinload(Transaction.category))
+            )
+            for transaction in result.scalars().all():
+                self.submit(transaction)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            self._in_flight += 1
+            try:
+                await self._process(job)
+            except Exception as e:
+                self.counters["errors"] += 1
+                print(f"Error in background categorization of transaction {job['transaction_id']}: {e}")
+            finally:
+                self._in_flight -= 1
+                self._queue.task_done()
+
+    async def _process(self, job: Dict):
+        job["attempts"] += 1
+        try:
+            category = await categorize_with_ai(job["description"], job["amount"], job["user_id"])
+        except LLMUnavailable:
+            # Without an API key there is nothing to wait for
+            if llm_client.enabled and job["attempts"] < self.max_attempts:
+                self.counters["retries"] += 1
+                self._retry_later(job)
+                return
+            self.counters["fallbacks"] += 1
+            category = local_categorizer.categorize_batch([job["description"]], [job["amount"]])[0]
+
+        if await self._apply(job["transaction_id"], category):
+            self.counters["categorized"] += 1
+        else:
+            self.counters["superseded"] += 1
+        self._latencies.append(time.monotonic() - job["submitted_at"])
+
+    async def _apply(self, transaction_id: int, category: str) -> bool:
+        """Set the category and move the rollup, unless the row was deleted or re-categorized meanwhile."""
+        async with AsyncSessionLocal() as db:
+            transaction = (await db.execute(
+                select(Transaction)
+                .where(Transaction.id == transaction_id)
+                .options(selectinload(Transaction.category))
+            )).scalars().first()
+            if transaction is None or category_name(transaction.category) != PENDING:
+                return False
+            await db.execute(transaction_rollup_delta(transaction, sign=-1))
+            transaction.category = await get_or_create_category_async(db, transaction.user_id, category)
+            await db.flush()
+            await db.execute(transaction_rollup_delta(transaction))
+            await db.commit()
+            return True
+
+    def stats(self) -> Dict:
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(int(p * len(latencies)), len(latencies) - 1)] * 1000, 1)
+
+        return {
+            "running": self.running,
+            "workers": len(self._tasks),
+            "queue_depth": self._queue.qsize() if self.running else 0,
+            "in_flight": self._in_flight,
+            "waiting_retry": len(self._retries),
+            **self.counters,
+            "latency_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "max": percentile(1.0)}
+        }
+
+categorization_queue = CategorizationQueue()
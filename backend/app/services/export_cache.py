@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from typing import AsyncIterator, Dict, NamedTuple, Optional
+import aiofiles
+import aiofiles.os
+from app.core.config import settings
+
+# Bytes per read when sending part of an artifact
+READ_CHUNK_SIZE = 1 << 16
+
+# Partial files older than this were left by a crashed writer
+STALE_PARTIAL_SECONDS = 60 * 60
+
+class ExportTooLarge(Exception):
+    """Raised by fill when the rendered file alone is over the cache's size budget."""
+    pass
+
+class Artifact(NamedTuple):
+    path: str
+    size: int
+    etag: str
+
+class ExportCache:
+    """
+    Rendered export files on local disk, keyed by (user, format, filters, data version).
+    A key's file never changes once written; a change to the user's data makes a new key.
+    Files are evicted least recently used first (access time, set on every hit) when their
+    total size passes max_bytes.
+    """
+
+    def __init__(self, root: str = settings.EXPORT_CACHE_DIR, max_bytes: int = settings.EXPORT_CACHE_MAX_BYTES):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self._evict_lock = threading.Lock()
+
+    def key(self, user_id: int, fmt: str, filters: Dict, version: int) -> str:
+        payload = json.dumps([user_id, fmt, filters, version], sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def path(self, key: str, extension: str) -> str:
+        return os.path.join(self.root, f"{key}.{extension}")
+
+    def etag(self, key: str, mtime_ns: Optional[int] = None) -> str:
+        """
+        Strong ETag of a key's file. Byte-for-byte reproducible renderings are tagged by the key
+        alone, so a streamed first download can carry it before the file exists; the others
+        also carry the cached copy's write time.
+        """
+        return f'"{key}"' if mtime_ns is None else f'"{key}-{mtime_ns:x}"'
+
+    def _open(self, key: str, extension: str, reproducible: bool) -> Optional[Artifact]:
+        path = self.path(key, extension)
+        try:
+            stat = os.stat(path)
+            # Mark as recently used; mtime stays the write time and identifies this copy
+            os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+        except FileNotFoundError:
+            return None
+        return Artifact(path, stat.st_size, self.etag(key, None if reproducible else stat.st_mtime_ns))
+
+    async def open(self, key: str, extension: str, reproducible: bool = False) -> Optional[Artifact]:
+        """The cached file for a key, or None on a miss."""
+        return await asyncio.to_thread(self._open, key, extension, reproducible)
+
+    async def store(self, key: str, extension: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """
+        Pass an export's chunks through while writing them to the cache.
+        The file is only cached if the stream runs to the end.
+        """
+        await aiofiles.os.makedirs(self.root, exist_ok=True)
+        partial = f"{self.path(key, extension)}.{uuid.uuid4().hex}.partial"
+        try:
+            async with aiofiles.open(partial, "wb") as out:
+                async for chunk in chunks:
+                    await out.write(chunk)
+                    yield chunk
+            await aiofiles.os.replace(partial, self.path(key, extension))
+        except BaseException:
+            # Synchronous: a cancelled download cannot await its cleanup
+            try:
+                os.remove(partial)
+            except FileNotFoundError:
+                pass
+            raise
+        await asyncio.to_thread(self.evict)
+
+    async def fill(self, key: str, extension: str, chunks: AsyncIterator[bytes]) -> Artifact:
+        """Render an export straight into the cache."""
+        async for _ in self.store(key, extension, chunks):
+            pass
+        artifact = await self.open(key, extension)
+        if artifact is None:
+            raise ExportTooLarge("Export is larger than the export cache")
+        return artifact
+
+    def evict(self):
+        """Delete least recently used files until the cache fits max_bytes. Blocking."""
+        with self._evict_lock:
+            now = time.time()
+            entries = []
+            total = 0
+            for entry in os.scandir(self.root):
+                try:
+                    stat = entry.stat()
+                    if entry.name.endswith(".partial"):
+                        if now - stat.st_mtime > STALE_PARTIAL_SECONDS:
+                            os.remove(entry.path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_atime, stat.st_size, entry.path))
+                total += stat.st_size
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+async def read_range(path: str, start: int, end: int) -> AsyncIterator[bytes]:
+    """Bytes start..end (inclusive) of a file, in chunks."""
+    async with aiofiles.open(path, "rb") as f:
+        await f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await f.read(min(READ_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+export_cache = ExportCache()
@@ -0,0 +1,110 @@
+import uuid
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.crud.rollup import data_version
+from app.db.session import AsyncSessionLocal
+from app.models.models import ExportJob
+from app.services.export_cache import export_cache
+from app.services.job_runner import JobRunner
+from app.services.transaction_export import EXPORT_FORMATS, filter_kwargs
+
+async def submit_export_job(db: AsyncSession, user_id: int, fmt: str, filters: Dict) -> ExportJob:
+    """
+    Queue an export of the user's current data, or answer from the cache.
+    An identical export that is queued, running or still cached is shared rather than redone.
+    """
+    extension = EXPORT_FORMATS[fmt].extension
+    version = await data_version(db, user_id)
+    key = export_cache.key(user_id, fmt, filters, version)
+
+    existing = (await db.execute(
+        select(ExportJob)
+        .where(ExportJob.user_id == user_id, ExportJob.artifact_key == key, ExportJob.status != "failed")
+        .order_by(ExportJob.created_at.desc())
+        .limit(1)
+    )).scalars().first()
+    if existing is not None and existing.status != "succeeded":
+        return existing
+
+    artifact = await export_cache.open(key, extension)
+    if existing is not None and artifact is not None:
+        return existing
+
+    now = datetime.utcnow()
+    job = ExportJob(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        format=fmt,
+        filters=filters,
+        data_version=version,
+        artifact_key=key,
+        status="succeeded" if artifact else "queued",
+        attempts=0,
+        size=artifact.size if artifact else None,
+        created_at=now,
+        updated_at=now
+    )
+    db.add(job)
+    await db.commit()
+    if artifact is None:
+        export_job_runner.notify()
+    return job
+
+async def get_export_job(db: AsyncSession, user_id: int, job_id: str) -> Optional[ExportJob]:
+    result = await db.execute(
+        select(ExportJob).where(ExportJob.id == job_id, ExportJob.user_id == user_id)
+    )
+    return result.scalars().first()
+
+class ExportJobRunner(JobRunner):
+    """Renders queued exports into the export cache; see JobRunner for claiming and leases."""
+    model = ExportJob
+
+    def __init__(
+        self,
+        workers: int = settings.EXPORT_JOB_WORKERS,
+        poll_seconds: float = settings.EXPORT_JOB_POLL_SECONDS,
+        lease_seconds: int = settings.EXPORT_JOB_LEASE_SECONDS,
+        max_attempts: int = settings.EXPORT_JOB_MAX_ATTEMPTS
+    ):
+        super().__init__(workers, poll_seconds, lease_seconds, max_attempts)
+
+    async def _finish(self, db: AsyncSession, job: ExportJob, status: str, error: Optional[str] = None):
+        job.status = status
+        job.error = error
+        job.lease_expires_at = None
+        job.updated_at = datetime.utcnow()
+        await db.commit()
+
+    async def _run(self, job_id: str):
+        async with AsyncSessionLocal() as db:
+            job = await db.get(ExportJob, job_id)
+            try:
+                if job.attempts > self.max_attempts:
+                    await self._finish(db, job, "failed", f"Gave up after {self.max_attempts} attempts")
+                    return
+                # Key the file by the data as of now, not as of submission: the render reads
+                # current data, and the version read before it is at most that data's version
+                version = await data_version(db, job.user_id)
+                if version != job.data_version:
+                    job.data_version = version
+                    job.artifact_key = export_cache.key(job.user_id, job.format, job.filters, version)
+                export_format = EXPORT_FORMATS[job.format]
+                artifact = await export_cache.open(job.artifact_key, export_format.extension)
+                if artifact is None:
+                    artifact = await export_cache.fill(
+                        job.artifact_key,
+                        export_format.extension,
+                        export_format.render(job.user_id, **filter_kwargs(job.filters))
+                    )
+                job.size = artifact.size
+                await self._finish(db, job, "succeeded")
+            except Exception as e:
+                print(f"Error running export job {job_id}: {e}")
+                await db.rollback()
+                await self._finish(db, job, "failed", str(e))
+
+export_job_runner = ExportJobRunner()
@@ -0,0 +1,168 @@
+import io
+from typing import List, Optional, Tuple, Union
+import numpy as np
+from PIL import Image, ImageOps
+from app.core.config import settings
+
+# Widest common receipt paper (80mm) plus a margin; used to estimate the DPI of photos without one
+RECEIPT_WIDTH_INCHES = 3.5
+
+# EXIF orientations that swap width and height
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+def decode_grayscale(source: Union[bytes, str], target_dpi: int = settings.OCR_TARGET_DPI) -> np.ndarray:
+    """
+    Decode an upload (bytes or a file path) straight into an upright uint8 grayscale array no larger than `target_dpi`.
+    JPEGs are decoded at a reduced DCT scale where possible, so a 12MP phone photo never
+    materializes at full size. Scans carrying a DPI are scaled by it; photos are assumed to
+    span the width of a receipt.
+    """
+    image = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+    width, height = image.size
+    if image.getexif().get(0x0112) in _TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+
+    dpi = image.info.get("dpi", (0, 0))[0]
+    # 72/96 dpi tags are defaults written by cameras and editors, not a scan resolution
+    source_dpi = dpi if dpi >= 150 else width / RECEIPT_WIDTH_INCHES
+    scale = min(1.0, target_dpi / float(source_dpi))
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+
+    if image.format == "JPEG":
+        # draft() takes the stored (pre-rotation) size and picks the smallest scale >= it
+        image.draft("L", size if image.size == (width, height) else size[::-1])
+    image = ImageOps.exif_transpose(image).convert("L")
+    if image.size != size:
+        image = image.resize(size, Image.BOX)
+    return np.asarray(image)
+
+def difference_hash(gray: np.ndarray) -> int:
+    """
+    64-bit difference hash (dHash): compares neighbouring pixels of a 9x8 thumbnail.
+    Re-photographed or re-compressed copies of a receipt land within a few bits of each other.
+    """
+    thumbnail = Image.fromarray(gray).resize((9, 8), Image.LANCZOS)
+    pixels = np.asarray(thumbnail, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+def adaptive_threshold(gray: np.ndarray, window: Optional[int] = None, sensitivity: float = 0.15) -> np.ndarray:
+    """
+    Bradley-Roth local mean thresholding: a pixel is ink when it is `sensitivity` darker than
+    the mean of the window around it. Evens out shadows and uneven lighting that a global
+    contrast boost cannot. Returns 0 (ink) / 255 (paper).
+    """
+    height, width = gray.shape
+    window = window or max(15, width // 16)
+    radius = window // 2
+
+    integral = np.zeros((height + 1, width + 1), dtype=np.int64)
+    np.cumsum(np.cumsum(gray, axis=0, dtype=np.int64), axis=1, out=integral[1:, 1:])
+
+    rows = np.arange(height)
+    cols = np.arange(width)
+    top, bottom = np.clip(rows - radius, 0, height), np.clip(rows + radius + 1, 0, height)
+    left, right = np.clip(cols - radius, 0, width), np.clip(cols + radius + 1, 0, width)
+    window_sums = (
+        integral[np.ix_(bottom, right)] - integral[np.ix_(top, right)]
+        - integral[np.ix_(bottom, left)] + integral[np.ix_(top, left)]
+    )
+    area = np.outer(bottom - top, right - left)
+    ink = gray * area.astype(np.float32) <= window_sums * (1.0 - sensitivity)
+    return np.where(ink, 0, 255).astype(np.uint8)
+
+def estimate_skew(binary: np.ndarray, max_degrees: float = 5.0, step: float = 0.25, samples: int = 50_000) -> float:
+    """
+    Angle (degrees) of the text lines, by projection profile: the angle at which the ink's
+    row histogram is sharpest. Every candidate angle is scored in a single bincount.
+    """
+    ys, xs = np.nonzero(binary == 0)
+    if len(ys) == 0:
+        return 0.0
+    if len(ys) > samples:
+        pick = np.linspace(0, len(ys) - 1, samples).astype(np.intp)
+        ys, xs = ys[pick], xs[pick]
+
+    angles = np.arange(-max_degrees, max_degrees + step / 2, step)
+    slopes = np.tan(np.radians(angles)).astype(np.float32)
+    height, width = binary.shape
+    offset = int(np.ceil(width * np.tan(np.radians(max_degrees)))) + 1
+    bins = height + 2 * offset
+
+    projected = np.rint(ys[None, :] - xs[None, :] * slopes[:, None]).astype(np.intp) + offset
+    projected += (np.arange(len(angles)) * bins)[:, None]
+    profiles = np.bincount(projected.ravel(), minlength=len(angles) * bins).reshape(len(angles), bins)
+    scores = (profiles.astype(np.float64) ** 2).sum(axis=1)
+    return float(angles[scores.argmax()])
+
+def deskew(image: np.ndarray, degrees: float, fill: int = 255) -> np.ndarray:
+    """
+    Straighten lines sloping at `degrees` with a vertical shear: each column moves up or down
+    by its slope offset. For the few degrees receipts are skewed by this matches a rotation
+    to within a pixel, and is one slice copy per distinct offset.
+    """
+    if degrees == 0:
+        return image
+    height, width = image.shape
+    shifts = np.rint((np.arange(width) - width / 2) * np.tan(np.radians(degrees))).astype(np.intp)
+    shifts = np.clip(shifts, 1 - height, height - 1)
+    out = np.full_like(image, fill)
+    # Columns with the same shift are contiguous because shifts are monotonic
+    edges = np.flatnonzero(np.diff(shifts)) + 1
+    for start, end in zip(np.r_[0, edges], np.r_[edges, width]):
+        shift = shifts[start]
+        if shift >= 0:
+            out[:height - shift, start:end] = image[shift:, start:end]
+        else:
+            out[-shift:, start:end] = image[:height + shift, start:end]
+    return out
+
+def find_text_lines(binary: np.ndarray, min_height: int = 4) -> List[Tuple[int, int]]:
+    """
+    [top, bottom) row ranges of the text lines of a binarized, deskewed receipt, from its
+    horizontal ink profile. Each row is compared with the least-inked row within a few line
+    pitches of it, so ink that runs through the gaps between lines (receipt edges, shadows,
+    background speckle) does not join them.
+    """
+    height, width = binary.shape
+    profile = np.count_nonzero(binary == 0, axis=1)
+    radius = max(8, width // 20)
+    padded = np.pad(profile, radius, mode="edge")
+    baseline = np.lib.stride_tricks.sliding_window_view(padded, 2 * radius + 1).min(axis=1)
+    text_rows = profile > baseline + max(2.0, 0.01 * width)
+
+    changes = np.flatnonzero(np.diff(np.r_[0, text_rows.astype(np.int8), 0]))
+    lines = []
+    for top, bottom in zip(changes[::2].tolist(), changes[1::2].tolist()):
+        # Rejoin a line split by a row or two without ink
+        if lines and top - lines[-1][1] <= 2:
+            lines[-1] = (lines[-1][0], bottom)
+        else:
+            lines.append((top, bottom))
+    return [(top, bottom) for top, bottom in lines if bottom - top >= min_height]
+
+def stack_bands(image: np.ndarray, bands: List[Tuple[int, int]], gap: int, fill: int = 255) -> np.ndarray:
+    """The [top, bottom) row bands of `image` stacked into one image, `gap` blank rows apart."""
+    spacer = np.full((gap, image.shape[1]), fill, dtype=image.dtype)
+    parts = []
+    for top, bottom in bands:
+        parts += [image[top:bottom], spacer]
+    return np.concatenate(parts[:-1])
+
+def preprocess_receipt(source: Union[bytes, str], target_dpi: int = settings.OCR_TARGET_DPI) -> Tuple[np.ndarray, int]:
+    """
+    Decode, downscale, binarize and deskew a receipt for OCR, entirely in memory.
+    Returns (binary image, dHash of the grayscale image).
+    """
+    gray = decode_grayscale(source, target_dpi)
+    binary = adaptive_threshold(gray)
+    return deskew(binary, estimate_skew(binary)), difference_hash(gray)
+
+def to_ocr_image(array: np.ndarray) -> Image.Image:
+    """
+    Wrap an array for pytesseract without copying. Tagged as PPM so pytesseract's temp file is
+    written uncompressed rather than PNG-encoded.
+    """
+    image = Image.fromarray(array)
+    image.format = "PPM"  # written as binary PGM for grayscale
+    return image
@@ -0,0 +1,97 @@
+import asyncio
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import and_, or_, select, update
+from app.db.session import AsyncSessionLocal
+
+class JobRunner(ABC):
+    """
+    Drains a job table (rows with id, status, attempts, lease_expires_at, created_at, updated_at).
+    Workers claim the oldest queued job with a conditional UPDATE and hold it under a lease,
+    so any number of processes can share one table. A job whose worker died is picked up
+    again once its lease lapses. Subclasses set `model` and implement _run.
+    """
+    model = None
+    # Extra columns set when a job is claimed
+    claim_values: Dict = {}
+
+    def __init__(self, workers: int, poll_seconds: float, lease_seconds: int, max_attempts: int):
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def notify(self):
+        """Called after a submit so an idle local worker starts without waiting for the next poll."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+
+    async def wait(self):
+        """Block until the workers exit (they only do when cancelled)."""
+        await asyncio.gather(*self._tasks)
+
+    async def _worker(self):
+        while True:
+            try:
+                job_id = await self._claim()
+            except Exception as e:
+                print(f"Error claiming {self.model.__tablename__} job: {e}")
+                job_id = None
+            if job_id is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                # The job stays running and is retried once its lease lapses; keep this worker alive
+                print(f"Error running {self.model.__tablename__} job {job_id}: {e}")
+
+    async def _claim(self) -> Optional[str]:
+        model = self.model
+        now = datetime.utcnow()
+        claimable = or_(
+            model.status == "queued",
+            and_(model.status == "running", model.lease_expires_at < now)
+        )
+        async with AsyncSessionLocal() as db:
+            job_id = (await db.execute(
+                select(model.id).where(claimable).order_by(model.created_at).limit(1)
+            )).scalar()
+            if job_id is None:
+                return None
+            # Another worker may have claimed it since the select; only one UPDATE can match
+            result = await db.execute(
+                update(model)
+                .where(model.id == job_id, claimable)
+                .values(
+                    status="running",
+                    attempts=model.attempts + 1,
+                    lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                    updated_at=now,
+                    **self.claim_values
+                )
+            )
+            await db.commit()
+            return job_id if result.rowcount == 1 else None
+
+    @abstractmethod
+    async def _run(self, job_id: str):
+        """Process one claimed job and record its outcome."""
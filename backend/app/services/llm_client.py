@@ -0,0 +1,80 @@
+import asyncio
+from typing import Optional
+import httpx
+from openai import AsyncOpenAI
+from app.core.config import settings
+
+class LLMUnavailable(Exception):
+    """Raised when no completion can be produced within the caller's deadline."""
+    pass
+
+class LLMClient:
+    """
+    Shared async OpenAI client.
+    One pooled HTTP connection set is reused for every call, a semaphore caps in-flight
+    requests, and each call has a deadline that covers both queueing and the round trip.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = settings.OPENAI_API_KEY,
+        base_url: Optional[str] = settings.OPENAI_BASE_URL,
+        model: str = settings.OPENAI_MODEL,
+        max_concurrency: int = settings.OPENAI_MAX_CONCURRENCY
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: Optional[AsyncOpenAI] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.api_key)
+
+    def _get_client(self) -> AsyncOpenAI:
+        # Created lazily so the HTTP pool binds to the running event loop
+        if self._client is None:
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                max_retries=0,  # the deadline decides; retries would only stretch it
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=self.max_concurrency,
+                        max_keepalive_connections=self.max_concurrency
+                    )
+                )
+            )
+        return self._client
+
+    async def _complete(self, prompt: str, max_tokens: int, temperature: float) -> str:
+        async with self._semaphore:
+            response = await self._get_client().completions.create(
+                model=self.model,
+                prompt=prompt,
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
+        return response.choices[0].text
+
+    async def complete(self, prompt: str, max_tokens: int, temperature: float, timeout: float) -> str:
+        """
+        Run a completion, raising LLMUnavailable if it fails or misses the deadline.
+        """
+        if not self.enabled:
+            raise LLMUnavailable("OpenAI API key is not configured")
+        try:
+            return await asyncio.wait_for(self._complete(prompt, max_tokens, temperature), timeout)
+        except asyncio.TimeoutError:
+            raise LLMUnavailable(f"OpenAI call exceeded {timeout}s deadline")
+        except Exception as e:
+            raise LLMUnavailable(str(e)) from e
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+llm_client = LLMClient()
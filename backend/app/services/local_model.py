@@ -0,0 +1,176 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.core.config import settings
+
+NGRAM_SIZES = (2, 3, 4)
+_HASH_PRIME = np.uint64(1099511628211)  # FNV-1a 64-bit prime
+_NGRAM_SALT = 0x9E3779B97F4A7C15
+_UINT64_MASK = 0xFFFFFFFFFFFFFFFF
+
+def hashed_ngrams(descriptions: Sequence[str], n_features: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Hash the 2-4 character n-grams of each lowercased description into `n_features` buckets.
+    Returns parallel (feature index, row) arrays with one entry per n-gram occurrence.
+    All descriptions are hashed together in a handful of vectorized passes.
+    """
+    encoded = [f" {(d or '').lower()} ".encode() for d in descriptions]
+    lengths = np.fromiter((len(e) for e in encoded), dtype=np.int64, count=len(encoded))
+    buffer = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+    row_of_byte = np.repeat(np.arange(len(encoded)), lengths)
+
+    indices, rows = [], []
+    for n in NGRAM_SIZES:
+        count = len(buffer) - n + 1
+        if count <= 0:
+            continue
+        hashed = np.full(count, (n * _NGRAM_SALT) & _UINT64_MASK, dtype=np.uint64)
+        for offset in range(n):
+            hashed = (hashed ^ buffer[offset:offset + count]) * _HASH_PRIME
+        # Keep n-grams that do not straddle two descriptions
+        same_row = row_of_byte[:count] == row_of_byte[n - 1:n - 1 + count]
+        indices.append((hashed[same_row] % np.uint64(n_features)).astype(np.int64))
+        rows.append(row_of_byte[:count][same_row])
+    if not indices:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(indices), np.concatenate(rows)
+
+class HashedNgramClassifier:
+    """
+    Multinomial logistic regression over hashed character n-grams, in plain NumPy.
+    Features are 2-4 character n-grams of the lowercased description plus a log-scale
+    amount bucket, hashed into `n_features` buckets. Rows are stored sparse (CSR-style)
+    so a batch costs O(total characters) rather than O(rows x n_features).
+    """
+
+    def __init__(self, n_features: int = 2 ** 14):
+        self.n_features = n_features
+        self.classes: List[str] = []
+        self.weights: Optional[np.ndarray] = None
+        self.bias: Optional[np.ndarray] = None
+
+    def _featurize(self, descriptions: Sequence[str], amounts: Sequence[float]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Return (feature index, value, row) per non-zero plus row start offsets, sorted by row."""
+        indices, rows = hashed_ngrams(descriptions, self.n_features)
+        indices, rows = [indices], [rows]
+
+        # One amount-magnitude feature per row
+        buckets = np.floor(np.log2(np.abs(np.asarray(amounts, dtype=np.float64)) + 1)).astype(np.uint64)
+        indices.append(((buckets + np.uint64(1)) * np.uint64(_NGRAM_SALT) * _HASH_PRIME) % np.uint64(self.n_features))
+        rows.append(np.arange(len(descriptions)))
+
+        indices = np.concatenate(indices).astype(np.int64)
+        rows = np.concatenate(rows).astype(np.int64)
+        order = np.argsort(rows, kind="stable")
+        indices, rows = indices[order], rows[order]
+        counts = np.bincount(rows, minlength=len(descriptions))
+        values = 1.0 / np.sqrt(counts[rows])
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        return indices, values, rows, offsets
+
+    def _scores(self, indices, values, offsets) -> np.ndarray:
+        contributions = self.weights[indices] * values[:, None]
+        return np.add.reduceat(contributions, offsets, axis=0) + self.bias
+
+    @staticmethod
+    def _softmax(scores: np.ndarray) -> np.ndarray:
+        scores = scores - scores.max(axis=1, keepdims=True)
+        exp = np.exp(scores)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def fit(
+        self,
+        descriptions: Sequence[str],
+        amounts: Sequence[float],
+        labels: Sequence[str],
+        epochs: int = 200,
+        learning_rate: float = 2.0,
+        l2: float = 1e-4
+    ) -> float:
+        """Train with full-batch gradient descent. Returns training accuracy."""
+        self.classes = sorted(set(labels))
+        class_index = {c: i for i, c in enumerate(self.classes)}
+        y = np.fromiter((class_index[label] for label in labels), dtype=np.int64, count=len(labels))
+        targets = np.zeros((len(y), len(self.classes)))
+        targets[np.arange(len(y)), y] = 1.0
+
+        indices, values, rows, offsets = self._featurize(descriptions, amounts)
+        self.weights = np.zeros((self.n_features, len(self.classes)))
+        self.bias = np.zeros(len(self.classes))
+
+        for _ in range(epochs):
+            gradient = (self._softmax(self._scores(indices, values, offsets)) - targets) / len(y)
+            per_nonzero = gradient[rows] * values[:, None]
+            for c in range(len(self.classes)):
+                self.weights[:, c] -= learning_rate * (
+                    np.bincount(indices, weights=per_nonzero[:, c], minlength=self.n_features)
+                    + l2 * self.weights[:, c]
+                )
+            self.bias -= learning_rate * gradient.sum(axis=0)
+
+        predictions = self._scores(indices, values, offsets).argmax(axis=1)
+        return float((predictions == y).mean())
+
+    def predict_proba(self, descriptions: Sequence[str], amounts: Sequence[float]) -> np.ndarray:
+        indices, values, _, offsets = self._featurize(descriptions, amounts)
+        return self._softmax(self._scores(indices, values, offsets))
+
+    def predict_batch(self, descriptions: Sequence[str], amounts: Sequence[float]) -> List[Dict]:
+        if not len(descriptions):
+            return []
+        probabilities = self.predict_proba(descriptions, amounts)
+        best = probabilities.argmax(axis=1)
+        return [
+            {"category": self.classes[i], "confidence": float(p)}
+            for i, p in zip(best, probabilities[np.arange(len(best)), best])
+        ]
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Write-then-rename so a concurrent load never sees a partial file
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(tmp_path, weights=self.weights, bias=self.bias, classes=np.array(self.classes))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "HashedNgramClassifier":
+        with np.load(path) as artifact:
+            model = cls(n_features=artifact["weights"].shape[0])
+            model.weights = artifact["weights"]
+            model.bias = artifact["bias"]
+            model.classes = [str(c) for c in artifact["classes"]]
+        return model
+
+def user_model_path(user_id: int) -> str:
+    return os.path.join(settings.LOCAL_MODEL_DIR, f"user_{user_id}.npz")
+
+# user_id -> (file mtime, model), least recently used first; reloaded when the artifact on disk changes
+_loaded_models: OrderedDict = OrderedDict()
+_loaded_models_lock = threading.Lock()
+
+def load_user_model(user_id: int) -> Optional[HashedNgramClassifier]:
+    """
+    The user's trained model, or None if they have not trained one. At most
+    LOCAL_MODEL_MAX_USERS models stay loaded. Reads the disk; call it off the event loop.
+    """
+    path = user_model_path(user_id)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        with _loaded_models_lock:
+            _loaded_models.pop(user_id, None)
+        return None
+    with _loaded_models_lock:
+        cached = _loaded_models.get(user_id)
+        if cached is not None and cached[0] == mtime:
+            _loaded_models.move_to_end(user_id)
+            return cached[1]
+    model = HashedNgramClassifier.load(path)
+    with _loaded_models_lock:
+        _loaded_models[user_id] = (mtime, model)
+        _loaded_models.move_to_end(user_id)
+        while len(_loaded_models) > settings.LOCAL_MODEL_MAX_USERS:
+            _loaded_models.popitem(last=False)
+    return model
@@ -0,0 +1,118 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+from app.core.config import settings
+
+class OCRPoolBusy(Exception):
+    """Raised when the pool already holds its maximum of running and queued jobs."""
+    pass
+
+class OCRPoolUnavailable(Exception):
+    """Raised when a job cannot run (pool shut down or broken) or misses its deadline."""
+    pass
+
+def _start_worker():
+    # Load the OCR engine when the worker starts rather than on its first receipt
+    from app.services.receipt_processor import get_ocr_engine
+    get_ocr_engine()
+
+class OCRPool:
+    """
+    Process pool for CPU-bound receipt work (Pillow, tesseract).
+    Workers are long-lived and each keeps its own loaded OCR engine.
+    At most `max_pending` jobs may be running or queued; further submissions are
+    rejected immediately instead of growing an unbounded backlog. A slot is released
+    when the job actually finishes in its worker, so a timed-out job keeps counting
+    against the limit until tesseract's own timeout stops it.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.OCR_WORKERS,
+        max_pending: int = settings.OCR_MAX_PENDING,
+        timeout: float = settings.OCR_TIMEOUT_SECONDS
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self.counters = {"submitted": 0, "completed": 0, "rejected": 0, "timeouts": 0, "failed": 0}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: workers must not inherit the event loop, DB connections or HTTP pools
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_start_worker
+            )
+        return self._executor
+
+    def start(self):
+        """
+        Spawn the workers now so their start-up (imports, OCR engine load) is not charged
+        against the first receipts' deadlines. Does not wait for them.
+        """
+        executor = self._get_executor()
+        for _ in range(self.workers):
+            executor.submit(_start_worker)
+
+    def _release(self):
+        self._pending -= 1
+
+    def _release_from_worker_thread(self, loop: asyncio.AbstractEventLoop):
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            pass  # loop already closed (shutdown); nothing left to account for
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """
+        Run `fn(*args)` in a worker process. `fn` and its arguments must be picklable.
+        Raises OCRPoolBusy when full and OCRPoolUnavailable on timeout or a broken pool.
+        """
+        if self._pending >= self.max_pending:
+            self.counters["rejected"] += 1
+            raise OCRPoolBusy(f"{self._pending} receipt jobs already pending")
+
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except (BrokenProcessPool, RuntimeError) as e:
+            # A worker died or the pool is shutting down; the next call builds a fresh pool
+            self._executor = None
+            raise OCRPoolUnavailable(f"OCR pool unavailable: {e}") from e
+
+        self._pending += 1
+        self.counters["submitted"] += 1
+        future.add_done_callback(lambda _: self._release_from_worker_thread(loop))
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            future.cancel()  # only takes effect if the job has not started yet
+            raise OCRPoolUnavailable(f"OCR job exceeded {self.timeout}s deadline")
+        except BrokenProcessPool as e:
+            self.counters["failed"] += 1
+            self._executor = None
+            raise OCRPoolUnavailable(f"OCR worker crashed: {e}") from e
+        self.counters["completed"] += 1
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            **self.counters
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+ocr_pool = OCRPool()
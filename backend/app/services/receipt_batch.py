@@ -0,0 +1,244 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+import zlib
+from functools import partial
+from typing import AsyncIterator, BinaryIO, Callable, Dict, Iterator, List, Tuple
+from app.core.config import settings
+from app.crud.transaction import add_transactions
+from app.db.session import AsyncSessionLocal
+from app.models.models import Receipt
+from app.services.categorization_queue import categorization_queue
+from app.services.ocr_pool import OCRPoolBusy, OCRPoolUnavailable
+from app.services.receipt_jobs import parse_receipt_date
+from app.services.blob_store import BlobTooLarge, receipt_image_store
+from app.services.receipt_ocr_cache import dhash_distance, find_duplicate_receipt, ocr_receipt, same_receipt_fields, to_signed64
+from app.services.similarity_index import similarity_indexes
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tif", ".tiff", ".webp"}
+
+# What reading a bad archive entry can raise: RuntimeError for encrypted entries,
+# NotImplementedError for unsupported compression, zlib.error/EOFError for corrupt data
+ENTRY_READ_ERRORS = (
+    BlobTooLarge, zipfile.BadZipFile, RuntimeError, NotImplementedError, ValueError, EOFError, zlib.error, OSError
+)
+
+def _read_entry(archive: zipfile.ZipFile, info: zipfile.ZipInfo, max_bytes: int) -> bytes:
+    """Inflate one archive entry, refusing any larger than max_bytes before and while reading."""
+    if info.file_size > max_bytes:
+        raise BlobTooLarge(f"Receipt image exceeds {max_bytes} bytes")
+    with archive.open(info) as entry:
+        data = entry.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise BlobTooLarge(f"Receipt image exceeds {max_bytes} bytes")
+    return data
+
+def _read_file(file: BinaryIO, max_bytes: int) -> bytes:
+    """Read a plain (non-ZIP) upload, refusing one larger than max_bytes."""
+    data = file.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise BlobTooLarge(f"Receipt image exceeds {max_bytes} bytes")
+    return data
+
+def spool_upload(file: BinaryIO) -> BinaryIO:
+    """
+    Copy an upload into a temporary file owned by the caller. The request's form closes its
+    own files once the endpoint returns, before a streamed batch has read them.
+    """
+    spooled = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    try:
+        file.seek(0)
+        shutil.copyfileobj(file, spooled)
+    except BaseException:
+        spooled.close()
+        raise
+    return spooled
+
+def iter_batch_entries(sources: List[Tuple[str, BinaryIO]]) -> Iterator[Tuple[str, Callable[[], bytes]]]:
+    """
+    Yield (name, read) for every receipt image in the uploads.
+    ZIP archives are expanded lazily and read one entry at a time, so only the
+    receipts currently being OCR'd are held in memory. Entries that inflate past
+    RECEIPT_MAX_IMAGE_BYTES (or plain uploads larger than it) raise BlobTooLarge when read.
+    """
+    for filename, file in sources:
+        file.seek(0)
+        if not zipfile.is_zipfile(file):
+            file.seek(0)
+            yield filename, partial(_read_file, file, settings.RECEIPT_MAX_IMAGE_BYTES)
+            continue
+        archive = zipfile.ZipFile(file)
+        for info in archive.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or name.startswith(".") or info.filename.startswith("__MACOSX/"):
+                continue
+            if os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            yield info.filename, partial(_read_entry, archive, info, settings.RECEIPT_MAX_IMAGE_BYTES)
+
+async def _ocr_image(image: bytes) -> Dict:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.OCR_TIMEOUT_SECONDS
+    try:
+        while True:
+            try:
+                return await ocr_receipt(image)
+            except OCRPoolBusy:
+                # Other requests have the pool full; wait a while for a slot instead of failing the batch
+                if loop.time() >= deadline:
+                    raise OCRPoolUnavailable(f"OCR pool stayed busy for {settings.OCR_TIMEOUT_SECONDS}s")
+                await asyncio.sleep(0.5)
+    except (OCRPoolUnavailable, OSError) as e:
+        return {"success": False, "error": str(e)}
+
+async def _ocr_entry(user_id: int, index: int, name: str, read: Callable[[], bytes]) -> Tuple[Dict, Dict]:
+    """(NDJSON outcome, OCR result) for one receipt, flagged if the user already has it."""
+    try:
+        image = await asyncio.to_thread(read)
+    except ENTRY_READ_ERRORS as e:
+        # One unreadable entry is that receipt's error, not the batch's
+        result = {"success": False, "error": f"Could not read {name}: {e}"}
+    else:
+        result = await _ocr_image(image)
+    if not result["success"]:
+        return {"type": "result", "index": index, "filename": name, "status": "error", "error": result.get("error")}, result
+    result["image_url"] = await receipt_image_store.put_bytes(image)
+
+    async with AsyncSessionLocal() as db:
+        duplicate = await find_duplicate_receipt(db, user_id, result["image_sha256"], result["dhash"], result["data"])
+    return {
+        "type": "result",
+        "index": index,
+        "filename": name,
+        "status": "ok",
+        "cached": result["cached"],
+        "duplicate": duplicate,
+        "data": result["data"]
+    }, result
+
+def _mark_batch_duplicate(outcome: Dict, result: Dict, seen: List[Tuple[int, str, int, Dict]]):
+    """Flag a receipt that repeats an earlier one in the same batch (same bytes, or same photo and fields)."""
+    for index, image_sha256, dhash, data in seen:
+        if image_sha256 == result["image_sha256"]:
+            distance = 0
+        else:
+            distance = dhash_distance(dhash, result["dhash"])
+            if distance > settings.RECEIPT_DUPLICATE_MAX_DISTANCE:
+                continue
+            if not same_receipt_fields(result["data"], data["amount"], data["date"]):
+                continue
+        outcome["duplicate"] = {"index": index, "distance": distance}
+        return
+    seen.append((outcome["index"], result["image_sha256"], result["dhash"], result["data"]))
+
+def _creates_transaction(outcome: Dict) -> bool:
+    # Repeats of a receipt that already has a transaction, or of one earlier in this batch, do not
+    duplicate = outcome["duplicate"]
+    return bool(outcome["data"]["amount"]) and not (duplicate and (duplicate.get("transaction_id") or "index" in duplicate))
+
+def _line(payload: Dict) -> str:
+    return json.dumps(payload) + "\n"
+
+async def process_receipt_batch(
+    user_id: int,
+    sources: List[Tuple[str, BinaryIO]],
+    create_transactions: bool = True,
+    concurrency: int = settings.RECEIPT_BATCH_CONCURRENCY
+) -> AsyncIterator[str]:
+    """
+    OCR every receipt in the uploads, yielding one NDJSON line per receipt as it finishes
+    (not in upload order) and a final summary line. Up to `concurrency` receipts are in the
+    OCR pool at once. Receipts, and optionally their transactions, are saved in one commit
+    at the end; duplicates of receipts already on file are flagged and get no transaction.
+    Closes the source files when done.
+    """
+    entries = iter_batch_entries(sources)
+    in_flight = set()
+    seen = []
+    succeeded = []
+    failed = 0
+    submitted = 0
+    try:
+        while True:
+            while len(in_flight) < concurrency and submitted < settings.RECEIPT_BATCH_MAX_FILES:
+                entry = next(entries, None)
+                if entry is None:
+                    break
+                in_flight.add(asyncio.create_task(_ocr_entry(user_id, submitted, *entry)))
+                submitted += 1
+            if not in_flight:
+                break
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                outcome, result = task.result()
+                if outcome["status"] == "ok":
+                    if not outcome["duplicate"]:
+                        _mark_batch_duplicate(outcome, result, seen)
+                    succeeded.append((outcome, result))
+                else:
+                    failed += 1
+                yield _line(outcome)
+
+        truncated = next(entries, None) is not None
+        transaction_ids = await _save_batch(user_id, succeeded, create_transactions)
+        yield _line({
+            "type": "summary",
+            "receipts": submitted,
+            "processed": len(succeeded),
+            "failed": failed,
+            "truncated": truncated,  # more than RECEIPT_BATCH_MAX_FILES receipts were uploaded
+            "transaction_ids": transaction_ids
+        })
+    finally:
+        for task in in_flight:
+            task.cancel()
+        for _, file in sources:
+            file.close()
+
+async def _save_batch(user_id: int, succeeded: List[Tuple[Dict, Dict]], create_transactions: bool) -> List[Dict]:
+    """Store a Receipt per OCR'd image, plus a transaction for each new one with a total, in one commit."""
+    if not succeeded:
+        return []
+    async with AsyncSessionLocal() as db:
+        receipts = []
+        for outcome, result in succeeded:
+            data = outcome["data"]
+            receipts.append(Receipt(
+                user_id=user_id,
+                merchant_name=data["merchant"],
+                total_amount=data["amount"],
+                receipt_date=parse_receipt_date(data["date"]),
+                ocr_text=data["raw_text"],
+                image_url=result["image_url"],
+                image_sha256=result["image_sha256"],
+                image_dhash=to_signed64(result["dhash"])
+            ))
+        db.add_all(receipts)
+
+        transactions = []
+        billable = [(o, r) for (o, _), r in zip(succeeded, receipts) if _creates_transaction(o)]
+        if create_transactions and billable:
+            items = []
+            for outcome, receipt in billable:
+                description = outcome["data"]["merchant"] or "Unknown Merchant"
+                items.append({
+                    "amount": receipt.total_amount,
+                    "description": description,
+                    "date": receipt.receipt_date,
+                    "category": categorization_queue.initial_category(description, receipt.total_amount)
+                })
+            transactions = await add_transactions(db, user_id, items)
+            for (_, receipt), transaction in zip(billable, transactions):
+                receipt.transaction = transaction
+        await db.commit()
+
+    for transaction in transactions:
+        similarity_indexes.record(transaction)
+        categorization_queue.submit(transaction)
+    return [
+        {"index": outcome["index"], "filename": outcome["filename"], "transaction_id": transaction.id}
+        for (outcome, _), transaction in zip(billable, transactions)
+    ]
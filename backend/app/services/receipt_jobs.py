@@ -0,0 +1,194 @@
+import asyncio
+import uuid
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.crud.transaction import add_transactions
+from app.db.session import AsyncSessionLocal
+from app.models.models import Receipt, ReceiptJob
+from app.services.ai_categorization import local_categorizer
+from app.services.categorization_queue import categorization_queue
+from app.services.job_runner import JobRunner
+from app.services.ocr_pool import ocr_pool, OCRPoolBusy, OCRPoolUnavailable
+from app.services.blob_store import receipt_image_store
+from app.services.receipt_ocr_cache import find_duplicate_receipt, ocr_receipt_file, to_signed64
+from app.services.similarity_index import similarity_indexes
+
+OPERATIONS = ("process", "analyze", "create_transaction")
+
+def parse_receipt_date(date_str: Optional[str]) -> datetime:
+    """Receipt dates come back from OCR as YYYY-MM-DD strings; fall back to now when unreadable."""
+    try:
+        return datetime.fromisoformat(date_str) if date_str else datetime.utcnow()
+    except ValueError:
+        return datetime.utcnow()
+
+async def analyze_receipt_data(db: AsyncSession, user_id: int, receipt_data: Dict) -> Dict:
+    """Suggested category and the user's most similar past transactions for an OCR'd receipt."""
+    merchant_desc = receipt_data["merchant"] or ""
+    amount = receipt_data["amount"] or 0.0
+    prediction = local_categorizer.predict_category(description=merchant_desc, amount=amount)
+    similarity_index = await similarity_indexes.load(db, user_id)
+    return {
+        "suggested_category": prediction["category"],
+        "confidence_score": prediction["confidence"],
+        "similar_transactions": [
+            match["description"] for match in similarity_index.query(merchant_desc, amount, k=3)
+        ],
+        "budget_impact": amount
+    }
+
+async def submit_job(db: AsyncSession, user_id: int, operation: str, image_url: str, filename: Optional[str]) -> ReceiptJob:
+    """
+    Persist a receipt job for an image already committed to the blob store and wake the
+    local workers; the caller returns the id immediately.
+    """
+    now = datetime.utcnow()
+    job = ReceiptJob(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        operation=operation,
+        status="queued",
+        stage="queued",
+        attempts=0,
+        filename=filename,
+        image_url=image_url,
+        created_at=now,
+        updated_at=now
+    )
+    db.add(job)
+    await db.commit()
+    receipt_job_runner.notify()
+    return job
+
+async def get_job(db: AsyncSession, user_id: int, job_id: str) -> Optional[ReceiptJob]:
+    result = await db.execute(
+        select(ReceiptJob).where(ReceiptJob.id == job_id, ReceiptJob.user_id == user_id)
+    )
+    return result.scalars().first()
+
+class ReceiptJobRunner(JobRunner):
+    """Drains the receipt_jobs table; see JobRunner for how jobs are claimed and leased."""
+    model = ReceiptJob
+    claim_values = {"stage": "ocr"}
+
+    def __init__(
+        self,
+        workers: int = settings.RECEIPT_JOB_WORKERS,
+        poll_seconds: float = settings.RECEIPT_JOB_POLL_SECONDS,
+        lease_seconds: int = settings.RECEIPT_JOB_LEASE_SECONDS,
+        max_attempts: int = settings.RECEIPT_JOB_MAX_ATTEMPTS
+    ):
+        super().__init__(workers, poll_seconds, lease_seconds, max_attempts)
+
+    async def _set_stage(self, db: AsyncSession, job: ReceiptJob, stage: str):
+        job.stage = stage
+        job.updated_at = datetime.utcnow()
+        await db.commit()
+
+    async def _finish(self, db: AsyncSession, job: ReceiptJob, status: str, error: Optional[str] = None):
+        job.status = status
+        job.stage = "done" if status == "succeeded" else status
+        job.error = error
+        job.lease_expires_at = None
+        job.updated_at = datetime.utcnow()
+        await db.commit()
+
+    async def _run(self, job_id: str):
+        async with AsyncSessionLocal() as db:
+            job = await db.get(ReceiptJob, job_id)
+            try:
+                if job.attempts > self.max_attempts:
+                    await self._finish(db, job, "failed", f"Gave up after {self.max_attempts} attempts")
+                    return
+                await self._process(db, job)
+            except OCRPoolBusy:
+                # Not the job's fault: hand it back without spending an attempt
+                job.attempts -= 1
+                await self._finish(db, job, "queued")
+                await asyncio.sleep(self.poll_seconds)
+            except OCRPoolUnavailable as e:
+                await self._finish(db, job, "failed" if job.attempts >= self.max_attempts else "queued", str(e))
+            except Exception as e:
+                print(f"Error running receipt job {job_id}: {e}")
+                await db.rollback()
+                await self._finish(db, job, "failed", str(e))
+
+    async def _process(self, db: AsyncSession, job: ReceiptJob):
+        key = receipt_image_store.key(job.image_url)
+        path = await receipt_image_store.local_path(key) if key else None
+        if path is None:
+            await self._finish(db, job, "failed", "Receipt image not found")
+            return
+        # Blobs are keyed by their SHA-256, so the key doubles as the OCR cache key
+        ocr = await ocr_receipt_file(path, key)
+        if not ocr["success"]:
+            await self._finish(db, job, "failed", f"Receipt processing failed: {ocr.get('error', 'Unknown error')}")
+            return
+
+        receipt_data = ocr["data"]
+        duplicate = await find_duplicate_receipt(db, job.user_id, ocr["image_sha256"], ocr["dhash"], receipt_data)
+        result = {"receipt_data": receipt_data, "cached": ocr["cached"], "duplicate": duplicate}
+        if job.operation == "analyze":
+            await self._set_stage(db, job, "categorizing")
+            result.update(await analyze_receipt_data(db, job.user_id, receipt_data))
+
+        await self._set_stage(db, job, "saving")
+        receipt = Receipt(
+            user_id=job.user_id,
+            merchant_name=receipt_data["merchant"],
+            total_amount=receipt_data["amount"],
+            receipt_date=parse_receipt_date(receipt_data["date"]),
+            ocr_text=receipt_data["raw_text"],
+            image_url=job.image_url,
+            image_sha256=ocr["image_sha256"],
+            image_dhash=to_signed64(ocr["dhash"])
+        )
+        # A duplicate receipt is recorded, but never becomes a second transaction
+        transaction = None
+        if (
+            job.operation == "create_transaction"
+            and job.transaction_id is None
+            and not (duplicate and duplicate["transaction_id"])
+        ):
+            description = receipt_data["merchant"] or ""
+            amount = receipt_data["amount"] or 0.0
+            # Staged, not committed: the transaction, receipt and job state commit together in
+            # _finish, so a job re-claimed after a crash cannot create a second transaction
+            [transaction] = await add_transactions(db, job.user_id, [{
+                "amount": amount,
+                "description": description,
+                "date": receipt.receipt_date,
+                "category": categorization_queue.initial_category(description, amount)
+            }])
+            receipt.transaction_id = transaction.id
+            job.transaction_id = transaction.id
+        db.add(receipt)
+        await db.flush()
+        job.receipt_id = receipt.id
+        job.result = result
+        await self._finish(db, job, "succeeded")
+        if transaction is not None:
+            similarity_indexes.record(transaction)
+            categorization_queue.submit(transaction)
+
+receipt_job_runner = ReceiptJobRunner()
+
+async def run_workers(workers: int):
+    """Standalone worker: drains receipt jobs submitted by any API process."""
+    runner = ReceiptJobRunner(workers=workers)
+    await categorization_queue.start()
+    ocr_pool.start()
+    await runner.start()
+    try:
+        await runner.wait()
+    finally:
+        await runner.stop()
+        await categorization_queue.stop()
+        ocr_pool.shutdown()
+
+if __name__ == "__main__":
+    # python -m app.services.receipt_jobs
+    asyncio.run(run_workers(max(settings.RECEIPT_JOB_WORKERS, 1)))
@@ -0,0 +1,210 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Tuple, Union
+import numpy as np
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.models import Receipt, ReceiptOCRCacheEntry
+from app.services.ocr_pool import ocr_pool
+from app.services.receipt_processor import receipt_processor
+
+_UINT64_MASK = (1 << 64) - 1
+
+# Prune the database table after this many writes
+_PRUNE_EVERY = 500
+
+def to_signed64(value: int) -> int:
+    """SQLite INTEGER is signed; store 64-bit hashes in two's complement."""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+# Totals closer than this are the same amount
+_AMOUNT_TOLERANCE = 0.005
+
+def dhash_distance(a: int, b: int) -> int:
+    """Number of differing bits between two 64-bit difference hashes."""
+    return bin((a ^ b) & _UINT64_MASK).count("1")
+
+def _receipt_day(value: Union[str, datetime, None]) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+def same_receipt_fields(data: Dict, total_amount: Optional[float], receipt_date: Union[str, datetime, None]) -> bool:
+    """
+    Whether OCR'd receipt data has another receipt's total and, when both have one, its date.
+    Confirms a dHash match: photos of different receipts from one store hash alike.
+    """
+    amount = data.get("amount")
+    if amount is None or total_amount is None or abs(amount - total_amount) > _AMOUNT_TOLERANCE:
+        return False
+    day, other_day = _receipt_day(data.get("date")), _receipt_day(receipt_date)
+    return day is None or other_day is None or day == other_day
+
+class ReceiptOCRCache:
+    """
+    Two-level cache of OCR results keyed on the SHA-256 of the uploaded image bytes.
+    Level 1 is an in-process LRU, level 2 the receipt_ocr_cache table. Only successful
+    OCR results are stored, together with the image's difference hash.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.RECEIPT_OCR_CACHE_MAX_ENTRIES,
+        db_max_entries: int = settings.RECEIPT_OCR_CACHE_DB_MAX_ENTRIES,
+        ttl_seconds: int = settings.RECEIPT_OCR_CACHE_TTL_SECONDS
+    ):
+        self.max_entries = max_entries
+        self.db_max_entries = db_max_entries
+        self.ttl = timedelta(seconds=ttl_seconds)
+        # image_sha256 -> (data, dhash)
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.counters = {"memory_hits": 0, "db_hits": 0, "misses": 0}
+
+    def _put_local(self, image_sha256: str, data: Dict, dhash: int):
+        with self._lock:
+            self._entries[image_sha256] = (data, dhash)
+            self._entries.move_to_end(image_sha256)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def get(self, image_sha256: str) -> Optional[Tuple[Dict, int]]:
+        """(data, dhash) from an earlier OCR of the same bytes, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(image_sha256)
+            if entry is not None:
+                self._entries.move_to_end(image_sha256)
+        if entry is not None:
+            self.counters["memory_hits"] += 1
+            return entry
+
+        async with AsyncSessionLocal() as db:
+            row = (await db.execute(
+                select(ReceiptOCRCacheEntry).where(
+                    ReceiptOCRCacheEntry.image_sha256 == image_sha256,
+                    ReceiptOCRCacheEntry.expires_at > datetime.utcnow()
+                )
+            )).scalars().first()
+        if row is None:
+            self.counters["misses"] += 1
+            return None
+        self.counters["db_hits"] += 1
+        entry = (row.result, row.image_dhash & _UINT64_MASK)
+        self._put_local(image_sha256, *entry)
+        return entry
+
+    async def set(self, image_sha256: str, data: Dict, dhash: int):
+        now = datetime.utcnow()
+        self._put_local(image_sha256, data, dhash)
+        stmt = insert(ReceiptOCRCacheEntry).values(
+            image_sha256=image_sha256,
+            image_dhash=to_signed64(dhash),
+            result=data,
+            expires_at=now + self.ttl,
+            updated_at=now
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["image_sha256"],
+            set_={"result": stmt.excluded.result, "expires_at": stmt.excluded.expires_at, "updated_at": now}
+        )
+        async with AsyncSessionLocal() as db:
+            await db.execute(stmt)
+            self._writes += 1
+            if self._writes % _PRUNE_EVERY == 0:
+                await db.execute(self._prune_statement(now))
+            await db.commit()
+
+    def _prune_statement(self, now: datetime):
+        # Drop expired rows and everything beyond the newest db_max_entries
+        keep = select(ReceiptOCRCacheEntry.image_sha256).order_by(
+            ReceiptOCRCacheEntry.updated_at.desc()
+        ).limit(self.db_max_entries)
+        return delete(ReceiptOCRCacheEntry).where(
+            (ReceiptOCRCacheEntry.expires_at <= now) |
+            ReceiptOCRCacheEntry.image_sha256.not_in(keep)
+        )
+
+    def stats(self) -> Dict:
+        lookups = sum(self.counters.values())
+        return {
+            **self.counters,
+            "entries": len(self._entries),
+            "hit_rate": (lookups - self.counters["misses"]) / lookups if lookups else 0.0
+        }
+
+receipt_ocr_cache = ReceiptOCRCache()
+
+async def ocr_receipt(image_bytes: bytes) -> Dict:
+    """
+    Enhanced OCR of a receipt through the OCR pool, answered from the cache when the same
+    bytes were processed before. Returns the process_receipt result plus "image_sha256"
+    and "cached". Raises the OCR pool's OCRPoolBusy/OCRPoolUnavailable on a miss.
+    """
+    return await _cached_ocr(hashlib.sha256(image_bytes).hexdigest(), image_bytes)
+
+async def ocr_receipt_file(path: str, image_sha256: str) -> Dict:
+    """ocr_receipt for an upload staged on local disk; the OCR worker reads the file itself."""
+    return await _cached_ocr(image_sha256, path)
+
+async def _cached_ocr(image_sha256: str, source: Union[bytes, str]) -> Dict:
+    cached = await receipt_ocr_cache.get(image_sha256)
+    if cached is not None:
+        data, dhash = cached
+        return {"success": True, "data": data, "dhash": dhash, "image_sha256": image_sha256, "cached": True}
+
+    result = await ocr_pool.run(receipt_processor.process_receipt, source, True, ocr_pool.timeout)
+    if result["success"]:
+        await receipt_ocr_cache.set(image_sha256, result["data"], result["dhash"])
+    return {**result, "image_sha256": image_sha256, "cached": False}
+
+async def find_duplicate_receipt(
+    db: AsyncSession,
+    user_id: int,
+    image_sha256: str,
+    dhash: int,
+    data: Dict,
+    max_distance: int = settings.RECEIPT_DUPLICATE_MAX_DISTANCE
+) -> Optional[Dict]:
+    """
+    The user's earlier receipt for the same image, if any: an exact byte match first, then
+    (for a re-photographed copy) the nearest difference hash within `max_distance` bits among
+    receipts with the same OCR'd total and date. A similar hash alone never counts.
+    """
+    exact = (await db.execute(
+        select(Receipt.id, Receipt.transaction_id).where(
+            Receipt.user_id == user_id,
+            Receipt.image_sha256 == image_sha256
+        ).limit(1)
+    )).first()
+    if exact is not None:
+        return {"receipt_id": exact.id, "transaction_id": exact.transaction_id, "distance": 0}
+
+    amount = data.get("amount")
+    if amount is None:
+        return None
+    rows = (await db.execute(
+        select(Receipt.id, Receipt.transaction_id, Receipt.image_dhash, Receipt.total_amount, Receipt.receipt_date).where(
+            Receipt.user_id == user_id,
+            Receipt.image_dhash.is_not(None),
+            Receipt.total_amount.between(amount - _AMOUNT_TOLERANCE, amount + _AMOUNT_TOLERANCE)
+        )
+    )).all()
+    rows = [row for row in rows if same_receipt_fields(data, row.total_amount, row.receipt_date)]
+    if not rows:
+        return None
+    hashes = np.fromiter((row.image_dhash for row in rows), dtype=np.int64, count=len(rows)).view(np.uint64)
+    differing = hashes ^ np.uint64(dhash & _UINT64_MASK)
+    distances = np.unpackbits(differing.view(np.uint8)).reshape(len(rows), 64).sum(axis=1)
+    best = int(distances.argmin())
+    if distances[best] > max_distance:
+        return None
+    return {"receipt_id": rows[best].id, "transaction_id": rows[best].transaction_id, "distance": int(distances[best])}
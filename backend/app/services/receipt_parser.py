@@ -0,0 +1,98 @@
+import re
+from typing import Dict, List, Optional
+
+class ReceiptParser:
+    """
+    Single-pass parser for receipt OCR text.
+    Every line is classified once with precompiled patterns, collecting merchant, date,
+    total and line items together.
+    """
+
+    def __init__(self):
+        self.amount_pattern = re.compile(r'\$?\d+\.\d{2}')
+        # MM/DD/YYYY, MM-DD-YYYY, YYYY/MM/DD, YYYY-MM-DD (one separator throughout)
+        self.date_pattern = re.compile(
+            r'(?P<mdy>\d{2}(?P<mdy_sep>[/-])\d{2}(?P=mdy_sep)\d{4})'
+            r'|(?P<ymd>\d{4}(?P<ymd_sep>[/-])\d{2}(?P=ymd_sep)\d{2})'
+        )
+        # When a receipt holds several dates, the layout ranked first wins, then the earliest
+        self.date_ranks = {("mdy", "/"): 0, ("mdy", "-"): 1, ("ymd", "/"): 2, ("ymd", "-"): 3}
+        self.total_pattern = re.compile(r'TOTAL|AMOUNT')
+        self.subtotal_pattern = re.compile(r'SUB\s*-?\s*TOTAL')
+        # Lines with these words are never line items
+        self.non_item_pattern = re.compile(r'TOTAL|TAX|DATE|TIME')
+        # Usually the merchant name is in the first few lines
+        self.merchant_lines = 5
+
+    def _parse_date(self, match: re.Match) -> str:
+        """Normalize a date match to YYYY-MM-DD."""
+        if match.group("mdy"):
+            month, day, year = match.group("mdy").split(match.group("mdy_sep"))
+        else:
+            year, month, day = match.group("ymd").split(match.group("ymd_sep"))
+        return f"{year}-{month}-{day}"
+
+    def parse(self, text: str, include_items: bool = True) -> Dict:
+        """
+        {"merchant", "date", "total_amount", "total_labeled", "items"} from OCR text.
+        The total is the amount on the first TOTAL/AMOUNT line (a subtotal only when there is
+        no other), else the largest amount on the receipt; "total_labeled" says whether a
+        labelled line was found. "items" is None unless `include_items`.
+        """
+        merchant = None
+        date_match = None
+        date_rank = len(self.date_ranks)
+        total = subtotal = None
+        amount_lines = []
+        items: Optional[List[Dict]] = [] if include_items else None
+
+        for index, line in enumerate(text.split('\n')):
+            if merchant is None and index < self.merchant_lines:
+                stripped = line.strip()
+                if len(stripped) > 3 and not any(c.isdigit() for c in stripped):
+                    merchant = stripped
+
+            if date_rank and ('/' in line or '-' in line):
+                for match in self.date_pattern.finditer(line):
+                    kind = "mdy" if match.group("mdy") else "ymd"
+                    rank = self.date_ranks[(kind, match.group(kind + "_sep"))]
+                    if rank < date_rank:
+                        date_match, date_rank = match, rank
+
+            # Once the total is known, amounts only matter for items
+            if '.' not in line or (total is not None and not include_items):
+                continue
+            amounts = self.amount_pattern.findall(line)
+            if not amounts:
+                continue
+            amount_lines.append(amounts)
+            upper = line.upper()
+
+            if total is None and self.total_pattern.search(upper):
+                # Take the last amount in the line
+                if self.subtotal_pattern.search(upper):
+                    if subtotal is None:
+                        subtotal = float(amounts[-1].replace('$', ''))
+                else:
+                    total = float(amounts[-1].replace('$', ''))
+
+            if include_items and not self.non_item_pattern.search(upper):
+                # Remove the amount from the line to get the description
+                description = line.replace(amounts[-1], '').strip()
+                if description:
+                    items.append({"description": description, "amount": float(amounts[-1].replace('$', ''))})
+
+        labeled = total if total is not None else subtotal
+        total_amount = labeled
+        if labeled is None and amount_lines:
+            # No total line: take the largest amount
+            total_amount = max(float(a.replace('$', '')) for amounts in amount_lines for a in amounts)
+        return {
+            "merchant": merchant,
+            "date": self._parse_date(date_match) if date_match else None,
+            "total_amount": total_amount,
+            "total_labeled": labeled is not None,
+            "items": items
+        }
+
+receipt_parser = ReceiptParser()
@@ -1,38 +1,115 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+import numpy as np
 import pytesseract
-from PIL import Image
-import io
-import re
-from typing import Dict, List, Optional
-from datetime import datetime
+from typing import Dict, Optional, Tuple, Union
+from app.core.config import settings
+from app.services.image_preprocessing import (
+    decode_grayscale, difference_hash, find_text_lines, preprocess_receipt, stack_bands, to_ocr_image
+)
+from app.services.ocr_pool import ocr_pool
+from app.services.receipt_parser import receipt_parser
+
+class OCREngine(ABC):
+    """Turns a grayscale uint8 array into text. One instance lives for the life of its process."""
+    name = "base"
+
+    @abstractmethod
+    def recognize(self, image: np.ndarray, timeout: float = 0) -> str:
+        """Text of the image; `timeout` (seconds, 0 for none) bounds recognition."""
+
+class TesserocrEngine(OCREngine):
+    """
+    Tesseract's C API through tesserocr. The language model is loaded once and reused,
+    so each receipt costs only recognition, with the pixels passed in place of a temp file.
+    """
+    name = "tesserocr"
+
+    def __init__(self, language: str):
+        import tesserocr
+        self._api = tesserocr.PyTessBaseAPI(lang=language)
+        # The API object keeps per-image state; serialize callers sharing a process
+        self._lock = threading.Lock()
+
+    def recognize(self, image: np.ndarray, timeout: float = 0) -> str:
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        height, width = image.shape
+        with self._lock:
+            self._api.SetImageBytes(image.tobytes(), width, height, 1, width)
+            if not self._api.Recognize(int(timeout * 1000)):
+                raise RuntimeError("Tesseract recognition timed out or failed")
+            return self._api.GetUTF8Text()
+
+class PytesseractEngine(OCREngine):
+    """Runs the tesseract binary per image: process start and model load on every call."""
+    name = "pytesseract"
+
+    def __init__(self, language: str):
+        self.language = language
+        # Otherwise pytesseract looks tesseract up on PATH
+        if os.path.exists(settings.TESSERACT_PATH):
+            pytesseract.pytesseract.tesseract_cmd = settings.TESSERACT_PATH
+
+    def recognize(self, image: np.ndarray, timeout: float = 0) -> str:
+        return pytesseract.image_to_string(to_ocr_image(image), lang=self.language, timeout=timeout)
+
+_engine: Optional[OCREngine] = None
+_engine_lock = threading.Lock()
+
+def get_ocr_engine() -> OCREngine:
+    """The process's OCR engine, created on first use. OCR pool workers create it at startup."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = _create_engine(settings.OCR_ENGINE, settings.OCR_LANGUAGE)
+    return _engine
+
+def _create_engine(kind: str, language: str) -> OCREngine:
+    if kind == "tesserocr":
+        try:
+            return TesserocrEngine(language)
+        except (ImportError, RuntimeError) as e:
+            print(f"tesserocr unavailable ({e}); falling back to pytesseract")
+    return PytesseractEngine(language)
 
 class ReceiptProcessor:
     def __init__(self):
-        self.date_patterns = [
-            r'\d{2}/\d{2}/\d{4}',  # MM/DD/YYYY
-            r'\d{2}-\d{2}-\d{4}',  # MM-DD-YYYY
-            r'\d{4}/\d{2}/\d{2}',  # YYYY/MM/DD
-            r'\d{4}-\d{2}-\d{2}'   # YYYY-MM-DD
-        ]
-        
-        self.amount_pattern = r'\$?\d+\.\d{2}'
+        # Text lines recognized at the top (merchant, date) and bottom (totals) in region mode
+        self.header_lines = 6
+        self.totals_lines = 12
     
-    async def process_image(self, image_bytes: bytes) -> Dict:
+    async def process_image(self, source: Union[bytes, str], include_items: bool = False) -> Dict:
         """
         Process a receipt image and extract relevant information.
+        OCR runs in the shared process pool so the event loop is never blocked.
+        """
+        return await ocr_pool.run(self.extract, source, ocr_pool.timeout, include_items)
+    
+    def extract(self, source: Union[bytes, str], timeout: float = 0, include_items: bool = False) -> Dict:
+        """
+        Blocking OCR and parsing behind process_image; runs in an OCR pool worker.
+        `source` is the image bytes or the path of a staged upload.
+        `timeout` bounds recognition in seconds (0 means no limit). Line items need the
+        whole receipt read, so without `include_items` only its header and totals are
+        (see OCR_REGIONS_ONLY) and "items" is None.
         """
         try:
-            # Convert bytes to PIL Image
-            image = Image.open(io.BytesIO(image_bytes))
-            
-            # Extract text from image
-            text = pytesseract.image_to_string(image)
+            if include_items:
+                # Decode to grayscale, shrinking oversized photos to OCR_TARGET_DPI
+                image = decode_grayscale(source)
+                text = get_ocr_engine().recognize(image, timeout)
+                parsed = receipt_parser.parse(text, include_items=True)
+            else:
+                image, _ = preprocess_receipt(source)
+                text, parsed = self._recognize(image, timeout, settings.OCR_REGIONS_ONLY)
             
             # Process extracted text
             result = {
-                "date": self._extract_date(text),
-                "total_amount": self._extract_total(text),
-                "items": self._extract_items(text),
-                "merchant": self._extract_merchant(text),
+                "date": parsed["date"],
+                "total_amount": parsed["total_amount"],
+                "items": parsed["items"],
+                "merchant": parsed["merchant"],
                 "raw_text": text
             }
             
@@ -45,113 +122,65 @@ class ReceiptProcessor:
                 "details": str(e)
             }
     
-    def _extract_date(self, text: str) -> Optional[str]:
-        """Extract date from receipt text."""
-        for pattern in self.date_patterns:
-            match = re.search(pattern, text)
-            if match:
-                try:
-                    date_str = match.group(0)
-                    # Convert to consistent format (YYYY-MM-DD)
-                    if '/' in date_str:
-                        parts = date_str.split('/')
-                    else:
-                        parts = date_str.split('-')
-                    
-                    if len(parts[0]) == 4:  # YYYY-MM-DD
-                        return date_str
-                    else:  # MM-DD-YYYY
-                        return f"{parts[2]}-{parts[0]}-{parts[1]}"
-                except:
-                    continue
-        return None
-    
-    def _extract_total(self, text: str) -> Optional[float]:
-        """Extract total amount from receipt text."""
-        # Look for common total indicators
-        total_indicators = ['TOTAL', 'Total:', 'Amount Due:', 'AMOUNT']
-        lines = text.split('\n')
-        
-        for line in lines:
-            if any(indicator in line.upper() for indicator in total_indicators):
-                matches = re.findall(self.amount_pattern, line)
-                if matches:
-                    try:
-                        # Take the last amount in the line
-                        amount = float(matches[-1].replace('$', ''))
-                        return amount
-                    except:
-                        continue
-        
-        # If no total found with indicators, take the largest amount
-        amounts = []
-        for line in lines:
-            matches = re.findall(self.amount_pattern, line)
-            for match in matches:
-                try:
-                    amounts.append(float(match.replace('$', '')))
-                except:
-                    continue
-        
-        return max(amounts) if amounts else None
-    
-    def _extract_items(self, text: str) -> List[Dict]:
-        """Extract individual items from receipt text."""
-        items = []
-        lines = text.split('\n')
-        
-        for line in lines:
-            # Skip empty lines and common headers
-            if not line.strip() or any(h in line.upper() for h in ['TOTAL', 'SUBTOTAL', 'TAX', 'DATE', 'TIME']):
-                continue
-            
-            # Look for lines with amounts
-            matches = re.findall(self.amount_pattern, line)
-            if matches:
-                try:
-                    amount = float(matches[-1].replace('$', ''))
-                    # Remove the amount from the line to get the description
-                    description = line.replace(matches[-1], '').strip()
-                    if description:
-                        items.append({
-                            "description": description,
-                            "amount": amount
-                        })
-                except:
-                    continue
-        
-        return items
-    
-    def _extract_merchant(self, text: str) -> Optional[str]:
-        """Extract merchant name from receipt text."""
-        lines = text.split('\n')
-        # Usually the merchant name is in the first few lines
-        for line in lines[:5]:
-            line = line.strip()
-            if line and len(line) > 3 and not any(c.isdigit() for c in line):
-                return line
-        return None
+    def _recognize_regions(self, image: np.ndarray, timeout: float) -> Optional[str]:
+        """
+        Text of the header and totals bands of a binarized receipt, recognized as one stacked
+        image. None when the receipt is too short for the bands to save anything.
+        """
+        lines = find_text_lines(image)
+        if len(lines) <= self.header_lines + self.totals_lines:
+            return None
+        # Half a line of margin so ascenders and descenders are not clipped
+        pad = int(np.median([bottom - top for top, bottom in lines])) // 2 + 1
+        height = image.shape[0]
+        bands = [
+            (max(0, lines[0][0] - pad), lines[self.header_lines - 1][1] + pad),
+            (lines[-self.totals_lines][0] - pad, min(height, lines[-1][1] + pad))
+        ]
+        return get_ocr_engine().recognize(stack_bands(image, bands, gap=4 * pad), timeout)
 
-    def enhance_image(self, image_bytes: bytes) -> bytes:
+    def _recognize(self, image: np.ndarray, timeout: float, regions: bool) -> Tuple[str, Dict]:
+        """(OCR text, parsed text without items) of a binarized receipt."""
+        if regions:
+            text = self._recognize_regions(image, timeout)
+            if text is not None:
+                parsed = receipt_parser.parse(text, include_items=False)
+                # The totals band is positional; read the whole receipt when it holds no total line
+                if parsed["total_labeled"]:
+                    return text, parsed
+        text = get_ocr_engine().recognize(image, timeout)
+        return text, receipt_parser.parse(text, include_items=False)
+
+    def process_receipt(self, source: Union[bytes, str], enhance: bool = False, timeout: float = 0) -> Dict:
         """
-        Enhance receipt image for better OCR results
+        OCR a receipt into {"success", "data", "dhash", "error"}, optionally enhancing the image first
+        (downscale, adaptive threshold, deskew). Images are always downscaled to OCR_TARGET_DPI.
+        Enhanced long receipts are recognized by region when OCR_REGIONS_ONLY is set.
+        Blocking; call it through the OCR pool from request handlers.
         """
         try:
-            # Open image
-            image = Image.open(io.BytesIO(image_bytes))
-            
-            # Convert to grayscale
-            image = image.convert('L')
-            
-            # Increase contrast
-            from PIL import ImageEnhance
-            enhancer = ImageEnhance.Contrast(image)
-            image = enhancer.enhance(2.0)
-            
-            # Save enhanced image to bytes
-            output = io.BytesIO()
-            image.save(output, format='PNG')
-            return output.getvalue()
-            
+            if enhance:
+                # Decoded once; the binarized array goes to tesseract without a PNG round trip
+                image, dhash = preprocess_receipt(source)
+                text, parsed = self._recognize(image, timeout, settings.OCR_REGIONS_ONLY)
+            else:
+                image = decode_grayscale(source)
+                dhash = difference_hash(image)
+                text = get_ocr_engine().recognize(image, timeout)
+                parsed = receipt_parser.parse(text, include_items=False)
         except Exception as e:
-            raise Exception(f"Image enhancement failed: {str(e)}") 
\ No newline at end of file
+            print(f"Error processing receipt: {e}")
+            return {"success": False, "error": str(e)}
+        
+        return {
+            "success": True,
+            "dhash": dhash,
+            "data": {
+                "amount": parsed["total_amount"],
+                "date": parsed["date"],
+                "merchant": parsed["merchant"],
+                "raw_text": text
+            }
+        }
+
+receipt_processor = ReceiptProcessor()
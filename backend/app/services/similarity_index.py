@@ -0,0 +1,248 @@
+import asyncio
+import bisect
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.models import Transaction
+from app.services.categorization_cache import normalize_description
+from app.services.local_model import hashed_ngrams
+
+# IDF is recomputed over the whole matrix once this many merchants were added since the last
+# time (or this fraction of all merchants, if more); until then only touched rows are reweighted
+_IDF_REFRESH_MIN_ROWS = 64
+_IDF_REFRESH_RATIO = 0.1
+
+def _log_amount(amount: Optional[float]) -> float:
+    return math.log1p(abs(amount or 0.0))
+
+class SimilarityIndex:
+    """
+    Nearest-transaction index over TF-IDF weighted, hashed character n-grams.
+    One matrix row per distinct normalized description (merchant), so repeat charges share
+    a vector. Queries rank merchants by cosine similarity, then transactions by amount;
+    each merchant keeps its transactions sorted by log-amount so that step is a bisect.
+    Writes only reweight the rows they touch; IDF itself is refreshed in bulk as merchants accrue.
+    """
+
+    def __init__(self, n_features: int = settings.SIMILARITY_INDEX_FEATURES):
+        self.n_features = n_features
+        self._rows: Dict[str, int] = {}  # merchant key -> matrix row
+        self._tf = np.zeros((16, n_features), dtype=np.float32)
+        self._df = np.zeros(n_features, dtype=np.float64)
+        self._members: List[Dict[int, Tuple[str, float]]] = []  # row -> {transaction id: (description, amount)}
+        self._by_amount: List[List[Tuple[float, int]]] = []  # row -> sorted (log amount, transaction id)
+        self._row_of_transaction: Dict[int, int] = {}
+        self._weighted: Optional[np.ndarray] = None  # normalized TF-IDF rows, same capacity as _tf
+        self._idf: Optional[np.ndarray] = None
+        self._dirty_rows: set = set()  # rows to reweight before the next query
+        self._rows_since_idf = 0  # merchants added since IDF was computed
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._row_of_transaction)
+
+    def _term_frequencies(self, descriptions: List[str]) -> np.ndarray:
+        indices, rows = hashed_ngrams(descriptions, self.n_features)
+        tf = np.zeros((len(descriptions), self.n_features), dtype=np.float32)
+        np.add.at(tf, (rows, indices), 1.0)
+        return np.log1p(tf, out=tf)  # sublinear term frequency
+
+    def add_many(self, transactions: List[Tuple[int, str, float]]):
+        """Index (id, description, amount) tuples. Re-adding an id moves it."""
+        with self._lock:
+            for transaction_id, _, _ in transactions:
+                self._remove_locked(transaction_id)
+
+            new_keys = []
+            for transaction_id, description, amount in transactions:
+                key = normalize_description(description or "") or (description or "")
+                row = self._rows.get(key)
+                if row is None and key not in new_keys:
+                    new_keys.append(key)
+
+            if new_keys:
+                first_row = len(self._members)
+                needed = first_row + len(new_keys)
+                if needed > len(self._tf):
+                    grown = np.zeros((max(needed, 2 * len(self._tf)), self.n_features), dtype=np.float32)
+                    grown[:first_row] = self._tf[:first_row]
+                    self._tf = grown
+                tf = self._term_frequencies(new_keys)
+                self._tf[first_row:needed] = tf
+                self._df += (tf > 0).sum(axis=0)
+                for offset, key in enumerate(new_keys):
+                    self._rows[key] = first_row + offset
+                    self._members.append({})
+                    self._by_amount.append([])
+                self._rows_since_idf += len(new_keys)
+
+            for transaction_id, description, amount in transactions:
+                key = normalize_description(description or "") or (description or "")
+                row = self._rows[key]
+                self._members[row][transaction_id] = (description, amount or 0.0)
+                bisect.insort(self._by_amount[row], (_log_amount(amount), transaction_id))
+                self._row_of_transaction[transaction_id] = row
+                if len(self._members[row]) == 1:
+                    self._dirty_rows.add(row)  # new, or an emptied merchant matching again
+
+    def add(self, transaction_id: int, description: str, amount: float):
+        self.add_many([(transaction_id, description, amount)])
+
+    def _remove_locked(self, transaction_id: int):
+        row = self._row_of_transaction.pop(transaction_id, None)
+        if row is not None:
+            _, amount = self._members[row].pop(transaction_id)
+            by_amount = self._by_amount[row]
+            del by_amount[bisect.bisect_left(by_amount, (_log_amount(amount), transaction_id))]
+            if not self._members[row]:
+                self._dirty_rows.add(row)
+
+    def remove(self, transaction_id: int):
+        with self._lock:
+            self._remove_locked(transaction_id)
+
+    def _nearest_amounts(self, row: int, target: float, k: int, exclude_id: Optional[int]) -> List[Tuple[float, int]]:
+        """Up to k of the row's transactions closest to `target` in log-amount, walking out from a bisect."""
+        by_amount = self._by_amount[row]
+        right = bisect.bisect_left(by_amount, (target, -1))
+        left = right - 1
+        nearest = []
+        while len(nearest) < k and (left >= 0 or right < len(by_amount)):
+            if right >= len(by_amount) or (left >= 0 and target - by_amount[left][0] <= by_amount[right][0] - target):
+                entry, left = by_amount[left], left - 1
+            else:
+                entry, right = by_amount[right], right + 1
+            if entry[1] != exclude_id:
+                nearest.append(entry)
+        return nearest
+
+    def _weigh_rows(self, rows) -> np.ndarray:
+        """Normalized TF-IDF vectors for matrix rows under the current IDF."""
+        weighted = self._tf[rows] * self._idf
+        norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        weighted /= norms
+        return weighted
+
+    def _weighted_matrix(self) -> np.ndarray:
+        size = len(self._members)
+        refresh_after = max(_IDF_REFRESH_MIN_ROWS, _IDF_REFRESH_RATIO * size)
+        if self._weighted is None or self._rows_since_idf > refresh_after:
+            documents = max(size, 1)
+            self._idf = (np.log((1 + documents) / (1 + self._df)) + 1).astype(np.float32)
+            self._weighted = np.zeros_like(self._tf)
+            self._weighted[:size] = self._weigh_rows(slice(0, size))
+            dirty = range(size)
+            self._rows_since_idf = 0
+        else:
+            if len(self._weighted) < len(self._tf):
+                grown = np.zeros_like(self._tf)
+                grown[:len(self._weighted)] = self._weighted
+                self._weighted = grown
+            dirty = sorted(self._dirty_rows)
+            if dirty:
+                self._weighted[dirty] = self._weigh_rows(dirty)
+        # Merchants whose transactions were all removed never match
+        for row in dirty:
+            if not self._members[row]:
+                self._weighted[row] = 0.0
+        self._dirty_rows.clear()
+        return self._weighted[:size]
+
+    def query(
+        self,
+        description: str,
+        amount: float,
+        k: int = 3,
+        exclude_id: Optional[int] = None
+    ) -> List[Dict]:
+        """Top-k transactions by description similarity, tie-broken by closeness of amount."""
+        with self._lock:
+            if not self._row_of_transaction:
+                return []
+            weighted = self._weighted_matrix()
+            query = self._term_frequencies([description or ""])[0] * self._idf
+            norm = np.linalg.norm(query)
+            if norm == 0:
+                return []
+            similarities = weighted @ (query / norm)
+
+            # Only the best few merchants can contain the top-k transactions
+            candidates = min(k + (exclude_id is not None), len(similarities))
+            top_rows = np.argpartition(-similarities, candidates - 1)[:candidates]
+            target = _log_amount(amount)
+            scored = []
+            for row in top_rows:
+                similarity = float(similarities[row])
+                if similarity <= 0:
+                    continue
+                members = self._members[row]
+                for log_amount, transaction_id in self._nearest_amounts(row, target, k, exclude_id):
+                    amount_similarity = 1 / (1 + abs(target - log_amount))
+                    text, other_amount = members[transaction_id]
+                    scored.append((similarity * (0.8 + 0.2 * amount_similarity), transaction_id, text, other_amount))
+
+        scored.sort(key=lambda s: s[0], reverse=True)
+        return [
+            {"id": transaction_id, "description": text, "amount": other_amount, "score": score}
+            for score, transaction_id, text, other_amount in scored[:k]
+        ]
+
+class SimilarityIndexRegistry:
+    """Per-user indexes, built from the database on first use and kept current by the write paths."""
+
+    def __init__(self, max_users: int = settings.SIMILARITY_INDEX_MAX_USERS):
+        self.max_users = max_users
+        self._indexes: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[SimilarityIndex]:
+        """The user's index if it is loaded; writes for unloaded users need no bookkeeping."""
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                self._indexes.move_to_end(user_id)
+            return index
+
+    def put(self, user_id: int, index: SimilarityIndex):
+        with self._lock:
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+
+    def discard(self, user_id: int):
+        """Drop a user's index so it is rebuilt on next use (e.g. after a bulk import)."""
+        with self._lock:
+            self._indexes.pop(user_id, None)
+
+    def record(self, transaction: Transaction):
+        index = self.get(transaction.user_id)
+        if index is not None:
+            index.add(transaction.id, transaction.description, transaction.amount)
+
+    def forget(self, transaction: Transaction):
+        index = self.get(transaction.user_id)
+        if index is not None:
+            index.remove(transaction.id)
+
+    async def load(self, db: AsyncSession, user_id: int) -> SimilarityIndex:
+        index = self.get(user_id)
+        if index is None:
+            result = await db.execute(
+                select(Transaction.id, Transaction.description, Transaction.amount).where(
+                    Transaction.user_id == user_id
+                )
+            )
+            index = SimilarityIndex()
+            # Hashing and vectorizing a long history is CPU work; keep it off the event loop
+            await asyncio.to_thread(index.add_many, [tuple(row) for row in result.all()])
+            self.put(user_id, index)
+        return index
+
+similarity_indexes = SimilarityIndexRegistry()
@@ -0,0 +1,204 @@
+import csv
+import hashlib
+import io
+import re
+from collections import defaultdict
+from datetime import datetime
+from itertools import islice
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional
+from dateutil import parser as date_parser
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.crud.category import get_or_create_category
+from app.crud.rollup import rollup_delta, rollup_period
+from app.models.models import Transaction
+from app.services.similarity_index import similarity_indexes
+from app.services.ai_categorization import TransactionCategorizer
+
+DATE_COLUMNS = ["date", "transaction date", "posted date", "posting date", "booking date"]
+DESCRIPTION_COLUMNS = ["description", "memo", "name", "payee", "details", "merchant"]
+AMOUNT_COLUMNS = ["amount", "transaction amount", "value"]
+
+OFX_FIELD_PATTERN = re.compile(r'<(DTPOSTED|TRNAMT|NAME|MEMO)>([^<\r\n]*)', re.IGNORECASE)
+
+categorizer = TransactionCategorizer()
+
+class StatementParseError(ValueError):
+    pass
+
+def statement_row_hash(date: datetime, amount: float, description: str) -> str:
+    """Stable identity of a statement line, used to skip rows that were already imported."""
+    key = f"{date.isoformat()}|{amount:.2f}|{description.strip().lower()}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+def _parse_amount(value: str) -> float:
+    value = value.strip().replace('$', '').replace(',', '')
+    if value.startswith('(') and value.endswith(')'):
+        value = '-' + value[1:-1]
+    return float(value)
+
+def _parse_date(value: str) -> datetime:
+    value = value.strip()
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return date_parser.parse(value)
+
+def _find_column(header: List[str], candidates: List[str]) -> Optional[int]:
+    normalized = [h.strip().lower() for h in header]
+    for candidate in candidates:
+        if candidate in normalized:
+            return normalized.index(candidate)
+    return None
+
+def parse_csv(stream: io.TextIOBase) -> Iterator[Dict]:
+    """Yield rows from a bank CSV export one line at a time."""
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if not header:
+        raise StatementParseError("Empty statement")
+
+    date_col = _find_column(header, DATE_COLUMNS)
+    description_col = _find_column(header, DESCRIPTION_COLUMNS)
+    amount_col = _find_column(header, AMOUNT_COLUMNS)
+    debit_col = _find_column(header, ["debit"])
+    credit_col = _find_column(header, ["credit"])
+    if date_col is None or description_col is None or (amount_col is None and debit_col is None):
+        raise StatementParseError(f"Unrecognized CSV header: {header}")
+
+    for line in reader:
+        if not line or not any(cell.strip() for cell in line):
+            continue
+        try:
+            if amount_col is not None:
+                amount = _parse_amount(line[amount_col])
+            else:
+                # Separate debit/credit columns: spending is positive, money in is negative
+                debit = line[debit_col].strip()
+                credit = line[credit_col].strip() if credit_col is not None else ''
+                amount = _parse_amount(debit) if debit else -_parse_amount(credit)
+            yield {
+                "date": _parse_date(line[date_col]),
+                "amount": amount,
+                "description": line[description_col].strip()
+            }
+        except (ValueError, IndexError, OverflowError):
+            yield None
+
+def _parse_ofx_date(value: str) -> datetime:
+    # OFX dates look like 20240105120000.000[-5:EST]; the first 8 or 14 digits are enough
+    digits = re.match(r'\d+', value.strip()).group(0)
+    return datetime.strptime(digits[:14], "%Y%m%d%H%M%S") if len(digits) >= 14 else datetime.strptime(digits[:8], "%Y%m%d")
+
+def parse_ofx(stream: io.TextIOBase) -> Iterator[Dict]:
+    """Yield STMTTRN entries from an OFX/QFX statement, reading it line by line."""
+    fields = None
+    for line in stream:
+        upper = line.upper()
+        if '<STMTTRN>' in upper:
+            fields = {}
+        if fields is not None:
+            for tag, value in OFX_FIELD_PATTERN.findall(line):
+                fields.setdefault(tag.upper(), value.strip())
+        if '</STMTTRN>' in upper and fields is not None:
+            try:
+                yield {
+                    "date": _parse_ofx_date(fields["DTPOSTED"]),
+                    "amount": _parse_amount(fields["TRNAMT"]),
+                    "description": fields.get("NAME") or fields.get("MEMO") or ""
+                }
+            except (KeyError, ValueError, AttributeError):
+                yield None
+            fields = None
+
+def iter_statement_rows(file: BinaryIO, filename: str) -> Iterator[Optional[Dict]]:
+    """
+    Stream rows out of an uploaded statement. Unparseable lines come through as None.
+    """
+    stream = io.TextIOWrapper(file, encoding='utf-8-sig', errors='replace', newline='')
+    if filename.lower().endswith(('.ofx', '.qfx')):
+        return parse_ofx(stream)
+    return parse_csv(stream)
+
+def _batches(rows: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def import_statement(db: Session, user_id: int, rows: Iterable[Optional[Dict]], batch_size: Optional[int] = None) -> Dict:
+    """
+    Insert statement rows in batches, one commit per batch.
+    Rows whose (date, amount, description) hash was already imported are skipped.
+    Categorization runs locally once per batch, never as a per-row LLM call.
+    """
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    category_ids: Dict[str, int] = {}
+    result = {"imported": 0, "duplicates": 0, "skipped": 0}
+
+    for batch in _batches(rows, batch_size):
+        # Hash and de-duplicate within the batch
+        pending = {}
+        for row in batch:
+            if row is None:
+                result["skipped"] += 1
+                continue
+            row_hash = statement_row_hash(row["date"], row["amount"], row["description"])
+            if row_hash in pending:
+                result["duplicates"] += 1
+                continue
+            pending[row_hash] = row
+
+        # Drop rows imported by an earlier statement
+        existing = set(db.execute(
+            select(Transaction.import_hash).where(
+                Transaction.user_id == user_id,
+                Transaction.import_hash.in_(list(pending))
+            )
+        ).scalars())
+        result["duplicates"] += len(existing)
+        new_rows = [(h, row) for h, row in pending.items() if h not in existing]
+        if not new_rows:
+            continue
+
+        # Categorization pass over the whole batch
+        categories = categorizer.categorize_batch(
+            [row["description"] for _, row in new_rows],
+            [row["amount"] for _, row in new_rows]
+        )
+        for name in set(categories) - category_ids.keys():
+            category_ids[name] = get_or_create_category(db, user_id, name).id
+
+        # Core executemany; skips ORM unit-of-work bookkeeping for bulk rows
+        now = datetime.utcnow()
+        db.execute(Transaction.__table__.insert(), [
+            {
+                "user_id": user_id,
+                "amount": row["amount"],
+                "description": row["description"],
+                "date": row["date"],
+                "category_id": category_ids[category],
+                "import_hash": row_hash,
+                "created_at": now
+            }
+            for (row_hash, row), category in zip(new_rows, categories)
+        ])
+
+        deltas = defaultdict(lambda: [0.0, 0])
+        for (_, row), category in zip(new_rows, categories):
+            delta = deltas[(rollup_period(row["date"], now), category)]
+            delta[0] += row["amount"]
+            delta[1] += 1
+        for (period, category), (amount, count) in deltas.items():
+            db.execute(rollup_delta(user_id, period, category, amount, count))
+
+        db.commit()
+        result["imported"] += len(new_rows)
+
+    if result["imported"]:
+        # Rebuilt from the database on next use rather than updated row by row
+        similarity_indexes.discard(user_id)
+    return result
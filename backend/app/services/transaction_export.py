@@ -0,0 +1,259 @@
+import asyncio
+import csv
+import importlib.util
+import io
+import tempfile
+from datetime import datetime
+from functools import lru_cache
+from typing import AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Sequence
+import orjson
+import xlsxwriter
+from sqlalchemy.engine import Row
+from app.core.config import settings
+from app.crud.category import UNCATEGORIZED
+from app.crud.transaction import user_transaction_rows_query
+from app.db.session import AsyncSessionLocal
+
+EXPORT_COLUMNS = ["Date", "Description", "Amount", "Category"]
+
+# Bytes per chunk when sending a finished export file
+FILE_CHUNK_SIZE = 1 << 16
+
+class ExportFormatUnavailable(Exception):
+    """Raised for an export format whose optional dependency is not installed."""
+    pass
+
+async def iter_export_rows(
+    user_id: int,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    categories: Optional[List[str]] = None,
+    batch_rows: int = settings.EXPORT_BATCH_ROWS
+) -> AsyncIterator[Sequence[Row]]:
+    """
+    Yield a user's transactions as batches of (date, description, amount, category) rows,
+    in (date, id) order, read from a streaming cursor `batch_rows` at a time.
+    Opens its own session: a streamed response outlives the request's.
+    """
+    query = user_transaction_rows_query(user_id, start_date, end_date, categories)
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=batch_rows))
+        async for batch in result.partitions():
+            yield batch
+
+async def csv_export(user_id: int, **filters) -> AsyncIterator[bytes]:
+    """UTF-8 CSV of a user's transactions: the header at once, then one block per row batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue().encode()
+
+    async for batch in iter_export_rows(user_id, **filters):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            (date, description, amount, category or UNCATEGORIZED)
+            for date, description, amount, category in batch
+        )
+        yield buffer.getvalue().encode()
+
+def _json_lines(batch: Sequence[Row]) -> List[bytes]:
+    # orjson writes datetimes as isoformat() does
+    return [
+        orjson.dumps({"date": date, "description": description, "amount": amount, "category": category or UNCATEGORIZED})
+        for date, description, amount, category in batch
+    ]
+
+async def json_export(user_id: int, **filters) -> AsyncIterator[bytes]:
+    """A JSON array of a user's transactions, one object per line, sent a row batch at a time."""
+    yield b"["
+    separator = b"\n"
+    async for batch in iter_export_rows(user_id, **filters):
+        yield separator + b",\n".join(_json_lines(batch))
+        separator = b",\n"
+    yield b"\n]\n"
+
+async def ndjson_export(user_id: int, **filters) -> AsyncIterator[bytes]:
+    """Newline-delimited JSON of a user's transactions, one object per line."""
+    async for batch in iter_export_rows(user_id, **filters):
+        yield b"\n".join(_json_lines(batch)) + b"\n"
+
+class _XlsxSheet:
+    """A constant-memory xlsxwriter worksheet of transactions, filled batch by batch. Blocking."""
+
+    def __init__(self, output):
+        # constant_memory flushes each row to a temp file once the next one starts
+        self.workbook = xlsxwriter.Workbook(output, {"constant_memory": True, "remove_timezone": True})
+        self.worksheet = self.workbook.add_worksheet("Transactions")
+        self.date_fmt = self.workbook.add_format({"num_format": "yyyy-mm-dd"})
+        self.money_fmt = self.workbook.add_format({"num_format": "$#,##0.00"})
+        header_fmt = self.workbook.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+
+        self.worksheet.set_column("A:A", 12, self.date_fmt)  # Date
+        self.worksheet.set_column("B:B", 30)  # Description
+        self.worksheet.set_column("C:C", 12, self.money_fmt)  # Amount
+        self.worksheet.set_column("D:D", 15)  # Category
+        self.worksheet.write_row(0, 0, EXPORT_COLUMNS, header_fmt)
+        self.row = 1
+
+    def write(self, batch: Sequence[Row]):
+        worksheet = self.worksheet
+        for date, description, amount, category in batch:
+            if date is not None:
+                worksheet.write_datetime(self.row, 0, date, self.date_fmt)
+            if description is not None:
+                worksheet.write_string(self.row, 1, description)
+            if amount is not None:
+                worksheet.write_number(self.row, 2, amount, self.money_fmt)
+            worksheet.write_string(self.row, 3, category or UNCATEGORIZED)
+            self.row += 1
+
+    def close(self):
+        self.workbook.close()
+
+async def xlsx_export(user_id: int, **filters) -> AsyncIterator[bytes]:
+    """
+    An Excel workbook of a user's transactions. Rows go from the database cursor straight to
+    xlsxwriter in constant-memory mode, in worker threads; the zipped workbook is spooled to
+    a temporary file and sent once complete, as xlsx cannot be sent before it is closed.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=settings.EXPORT_SPOOL_MAX_BYTES) as output:
+        sheet = await asyncio.to_thread(_XlsxSheet, output)
+        async for batch in iter_export_rows(user_id, **filters):
+            await asyncio.to_thread(sheet.write, batch)
+        await asyncio.to_thread(sheet.close)
+
+        output.seek(0)
+        while chunk := await asyncio.to_thread(output.read, FILE_CHUNK_SIZE):
+            yield chunk
+
+def _pyarrow():
+    """pyarrow, imported by the first Parquet or Arrow export so the API runs without it."""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ExportFormatUnavailable(f"Parquet and Arrow exports need pyarrow: {e}")
+    return pyarrow
+
+@lru_cache(maxsize=None)
+def arrow_schema():
+    """Typed columns for Parquet and Arrow: amounts are exact cents, categories dictionary-encoded."""
+    pa = _pyarrow()
+    return pa.schema([
+        pa.field("date", pa.timestamp("us")),
+        pa.field("description", pa.string()),
+        pa.field("amount", pa.decimal128(18, 2)),
+        pa.field("category", pa.dictionary(pa.int32(), pa.string()))
+    ])
+
+def _record_batch(batch: Sequence[Row]):
+    pa = _pyarrow()
+    dates, descriptions, amounts, categories = zip(*batch)
+    return pa.record_batch([
+        pa.array(dates, pa.timestamp("us")),
+        pa.array(descriptions, pa.string()),
+        # Rounds each float to the nearest cent
+        pa.array(amounts, pa.float64()).cast(pa.decimal128(18, 2)),
+        pa.array([category or UNCATEGORIZED for category in categories], pa.string()).dictionary_encode()
+    ], schema=arrow_schema())
+
+async def _columnar_batches(user_id: int, **filters) -> AsyncIterator[List[Row]]:
+    """
+    Rows in batches of EXPORT_COLUMNAR_BATCH_ROWS, gathered from the usual smaller fetches
+    so the event loop is never held for long by one large fetch.
+    """
+    rows: List[Row] = []
+    async for batch in iter_export_rows(user_id, **filters):
+        rows.extend(batch)
+        if len(rows) >= settings.EXPORT_COLUMNAR_BATCH_ROWS:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+def _write_record_batch(writer, batch: Sequence[Row]):
+    writer.write_batch(_record_batch(batch))
+
+async def parquet_export(user_id: int, **filters) -> AsyncIterator[bytes]:
+    """
+    A zstd-compressed Parquet file of a user's transactions, one row group per columnar
+    batch, built in worker threads. Like xlsx, it is spooled and sent once the footer is written.
+    """
+    pa = _pyarrow()
+    with tempfile.SpooledTemporaryFile(max_size=settings.EXPORT_SPOOL_MAX_BYTES) as output:
+        writer = await asyncio.to_thread(pa.parquet.ParquetWriter, output, arrow_schema(), compression="zstd")
+        try:
+            async for batch in _columnar_batches(user_id, **filters):
+                await asyncio.to_thread(_write_record_batch, writer, batch)
+        finally:
+            await asyncio.to_thread(writer.close)
+
+        output.seek(0)
+        while chunk := await asyncio.to_thread(output.read, FILE_CHUNK_SIZE):
+            yield chunk
+
+async def arrow_export(user_id: int, **filters) -> AsyncIterator[bytes]:
+    """
+    An Arrow IPC stream of a user's transactions, sent a record batch at a time as rows are
+    read. Each batch carries its own category dictionary.
+    """
+    pa = _pyarrow()
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, arrow_schema())
+    try:
+        async for batch in _columnar_batches(user_id, **filters):
+            await asyncio.to_thread(_write_record_batch, writer, batch)
+            # Hand over what the writer produced; the stream format needs no seeking
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    finally:
+        writer.close()
+    yield sink.getvalue()
+
+class ExportFormat(NamedTuple):
+    render: Callable[..., AsyncIterator[bytes]]  # (user_id, start_date=, end_date=, categories=)
+    media_type: str
+    extension: str
+    # False when the first byte only comes once the whole file is written. Streamed formats
+    # are also reproducible: the same rows always render to the same bytes
+    streams: bool
+    requires: Optional[str] = None  # optional package the exporter imports when it runs
+
+EXPORT_FORMATS: Dict[str, ExportFormat] = {
+    "csv": ExportFormat(csv_export, "text/csv", "csv", True),
+    "json": ExportFormat(json_export, "application/json", "json", True),
+    "ndjson": ExportFormat(ndjson_export, "application/x-ndjson", "ndjson", True),
+    "excel": ExportFormat(xlsx_export, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx", False),
+    "parquet": ExportFormat(parquet_export, "application/vnd.apache.parquet", "parquet", False, "pyarrow"),
+    "arrow": ExportFormat(arrow_export, "application/vnd.apache.arrow.stream", "arrows", True, "pyarrow"),
+}
+
+def require_format(fmt: str) -> ExportFormat:
+    """The export format, raising ExportFormatUnavailable when its optional package is missing."""
+    export_format = EXPORT_FORMATS[fmt]
+    if export_format.requires and importlib.util.find_spec(export_format.requires) is None:
+        raise ExportFormatUnavailable(f"{fmt} export needs {export_format.requires}, which is not installed")
+    return export_format
+
+def export_filters(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    categories: Optional[List[str]] = None
+) -> Dict:
+    """Export filters as JSON, normalized so equal filters give equal cache keys."""
+    return {
+        "start_date": start_date.isoformat() if start_date else None,
+        "end_date": end_date.isoformat() if end_date else None,
+        "categories": sorted(set(categories)) if categories else None
+    }
+
+def filter_kwargs(filters: Dict) -> Dict:
+    """Keyword arguments for an exporter from export_filters output."""
+    return {
+        "start_date": datetime.fromisoformat(filters["start_date"]) if filters["start_date"] else None,
+        "end_date": datetime.fromisoformat(filters["end_date"]) if filters["end_date"] else None,
+        "categories": filters["categories"]
+    }
@@ -0,0 +1,41 @@
+"""
+Micro-benchmark: persistent tesserocr engine vs. a tesseract process per image (pytesseract).
+
+OCRs the same preprocessed synthetic receipts with every engine that is installed. The
+difference per image is the process start and language-model load the persistent engine skips.
+
+Run from the backend directory:
+    python -m benchmarks.bench_ocr_engine
+"""
+import random
+import time
+from app.core.config import settings
+from app.services.image_preprocessing import preprocess_receipt
+from app.services.receipt_processor import PytesseractEngine, TesserocrEngine
+from benchmarks.bench_preprocessing import synthetic_receipt
+
+def main(images: int = 10, seed: int = 0):
+    rng = random.Random(seed)
+    corpus = [preprocess_receipt(synthetic_receipt(rng)[0])[0] for _ in range(images)]
+
+    timings = {}
+    for engine_class in (PytesseractEngine, TesserocrEngine):
+        try:
+            start = time.perf_counter()
+            engine = engine_class(settings.OCR_LANGUAGE)
+            engine.recognize(corpus[0])  # first call includes the model load
+            warmup = time.perf_counter() - start
+        except Exception as e:
+            print(f"{engine_class.name:<12} unavailable: {e}")
+            continue
+        start = time.perf_counter()
+        for image in corpus:
+            engine.recognize(image)
+        timings[engine_class.name] = (time.perf_counter() - start) / images
+        print(f"{engine_class.name:<12} {timings[engine_class.name] * 1000:.1f} ms/image (first image {warmup * 1000:.1f} ms)")
+
+    if len(timings) == 2:
+        print(f"speedup:     {timings['pytesseract'] / timings['tesserocr']:.1f}x")
+
+if __name__ == "__main__":
+    main()
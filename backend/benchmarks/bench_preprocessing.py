@@ -0,0 +1,120 @@
+"""
+Micro-benchmark: in-memory NumPy receipt preprocessing vs. the original PIL enhance/PNG round trip.
+
+Builds a synthetic corpus of phone-sized JPEG receipt photos (skewed, unevenly lit, noisy)
+and times everything that happens to an upload before tesseract runs, including writing
+the temp file pytesseract hands to the tesseract binary.
+
+Run from the backend directory:
+    python -m benchmarks.bench_preprocessing
+"""
+import io
+import random
+import time
+import numpy as np
+from PIL import Image, ImageDraw, ImageEnhance, ImageFont
+from app.services.image_preprocessing import (
+    adaptive_threshold, decode_grayscale, estimate_skew, preprocess_receipt, to_ocr_image
+)
+
+ITEMS = [
+    "BANANAS", "WHOLE MILK 1GAL", "SOURDOUGH LOAF", "FREE RANGE EGGS", "COFFEE BEANS",
+    "BABY SPINACH", "CHEDDAR CHEESE", "OLIVE OIL", "GREEK YOGURT", "PAPER TOWELS",
+]
+
+def receipt_lines(rng: random.Random, items: tuple = (8, 25)) -> (list, str, float):
+    """Text lines of a grocery receipt, with the date (YYYY-MM-DD) and total printed on it."""
+    month, day = rng.randint(1, 12), rng.randint(1, 28)
+    lines = ["TRADER JOES #552", "123 MAIN ST", f"{month:02d}/{day:02d}/2024", ""]
+    total = 0.0
+    for _ in range(rng.randint(*items)):
+        price = rng.uniform(0.5, 20)
+        total += price
+        lines.append(f"{rng.choice(ITEMS):<24}{price:>8.2f}")
+    lines += ["", f"{'TOTAL':<24}${total:>7.2f}", "VISA ************1234"]
+    return lines, f"2024-{month:02d}-{day:02d}", round(total, 2)
+
+def photograph_receipt(lines: list, rng: random.Random, width: int = 3024) -> (bytes, float):
+    """A JPEG phone photo of receipt text, and the skew (degrees) it was photographed at."""
+    font = ImageFont.load_default(size=28)
+    paper = Image.new("L", (576, 60 + 40 * len(lines)), 245)
+    draw = ImageDraw.Draw(paper)
+    for i, line in enumerate(lines):
+        draw.text((30, 30 + 40 * i), line, fill=20, font=font)
+
+    skew = rng.uniform(-4, 4)
+    receipt = paper.rotate(skew, resample=Image.BICUBIC, expand=True, fillcolor=90)
+    photo = Image.new("L", (900, max(1200, receipt.height + 60)), 90)
+    photo.paste(receipt, ((900 - receipt.width) // 2, (photo.height - receipt.height) // 2))
+    size = (width, photo.height * width // 900)
+    photo = photo.resize(size, Image.BICUBIC)
+
+    # Uneven lighting and sensor noise
+    pixels = np.asarray(photo, dtype=np.float32)
+    shade = np.linspace(1.0, 0.6, size[0], dtype=np.float32)[None, :]
+    noise = np.random.default_rng(rng.randint(0, 2 ** 32)).normal(0, 6, pixels.shape).astype(np.float32)
+    pixels = np.clip(pixels * shade + noise, 0, 255).astype(np.uint8)
+
+    output = io.BytesIO()
+    Image.fromarray(pixels).convert("RGB").save(output, format="JPEG", quality=90)
+    # The photo's text lines slope opposite to the rotation angle
+    return output.getvalue(), -skew
+
+def synthetic_receipt(rng: random.Random, width: int = 3024, items: tuple = (8, 25)) -> (bytes, float):
+    """A JPEG phone photo of a receipt, and the skew (degrees) it was photographed at."""
+    lines, _, _ = receipt_lines(rng, items)
+    return photograph_receipt(lines, rng, width)
+
+def legacy_preprocess(image_bytes: bytes) -> Image.Image:
+    """The pre-optimization path: dHash, enhance_image to PNG bytes, then decode those again."""
+    thumbnail = Image.open(io.BytesIO(image_bytes)).convert("L").resize((9, 8), Image.LANCZOS)
+    np.asarray(thumbnail, dtype=np.int16)
+    image = Image.open(io.BytesIO(image_bytes)).convert("L")
+    image = ImageEnhance.Contrast(image).enhance(2.0)
+    enhanced = io.BytesIO()
+    image.save(enhanced, format="PNG")
+    image = Image.open(io.BytesIO(enhanced.getvalue()))
+    image.load()
+    return image
+
+def write_ocr_input(image: Image.Image) -> int:
+    """What pytesseract does before invoking tesseract: save the image in its format (default PNG)."""
+    output = io.BytesIO()
+    image.save(output, format=image.format or "PNG")
+    return output.tell()
+
+def main(images: int = 10, seed: int = 0):
+    rng = random.Random(seed)
+    corpus = [synthetic_receipt(rng) for _ in range(images)]
+
+    legacy_seconds = 0.0
+    legacy_pixels = legacy_bytes = 0
+    for image_bytes, _ in corpus:
+        start = time.perf_counter()
+        image = legacy_preprocess(image_bytes)
+        image.format = None  # pytesseract sees a decoded image and writes PNG
+        legacy_bytes += write_ocr_input(image)
+        legacy_seconds += time.perf_counter() - start
+        legacy_pixels += image.width * image.height
+
+    numpy_seconds = 0.0
+    numpy_pixels = numpy_bytes = 0
+    skew_errors = []
+    for image_bytes, skew in corpus:
+        start = time.perf_counter()
+        binary, _ = preprocess_receipt(image_bytes)
+        numpy_bytes += write_ocr_input(to_ocr_image(binary))
+        numpy_seconds += time.perf_counter() - start
+        numpy_pixels += binary.size
+        skew_errors.append(abs(estimate_skew(adaptive_threshold(decode_grayscale(image_bytes))) - skew))
+
+    print(f"images:               {images} (3024x4032 JPEG, {sum(len(b) for b, _ in corpus) / images / 1024:.0f} KB avg)")
+    print(f"PIL enhance + PNG:    {legacy_seconds / images * 1000:.1f} ms/image, "
+          f"{legacy_pixels / images / 1e6:.1f} MP and {legacy_bytes / images / 1024:.0f} KB to tesseract")
+    print(f"NumPy pipeline:       {numpy_seconds / images * 1000:.1f} ms/image, "
+          f"{numpy_pixels / images / 1e6:.1f} MP and {numpy_bytes / images / 1024:.0f} KB to tesseract")
+    print(f"speedup:              {legacy_seconds / numpy_seconds:.1f}x")
+    print(f"skew error:           mean {np.mean(skew_errors):.2f}, max {np.max(skew_errors):.2f} degrees")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Receipt text parser: accuracy on the OCR fixture corpus and parsing throughput.
+
+Compares the single-pass ReceiptParser with the original per-field extractors (one split
+and uncompiled regex scan per field), field by field against benchmarks.receipt_corpus.
+
+Run from the backend directory:
+    python -m benchmarks.bench_receipt_parser
+"""
+import re
+import time
+from typing import Dict, List, Optional
+from app.services.receipt_parser import ReceiptParser
+from benchmarks.receipt_corpus import CORPUS
+
+FIELDS = ("merchant", "date", "total_amount", "items")
+
+class LegacyExtractors:
+    """The pre-optimization ReceiptProcessor._extract_* methods."""
+
+    def __init__(self):
+        self.date_patterns = [r'\d{2}/\d{2}/\d{4}', r'\d{2}-\d{2}-\d{4}', r'\d{4}/\d{2}/\d{2}', r'\d{4}-\d{2}-\d{2}']
+        self.amount_pattern = r'\$?\d+\.\d{2}'
+
+    def parse(self, text: str, include_items: bool = True) -> Dict:
+        return {
+            "merchant": self._extract_merchant(text),
+            "date": self._extract_date(text),
+            "total_amount": self._extract_total(text),
+            "items": self._extract_items(text) if include_items else None
+        }
+
+    def _extract_date(self, text: str) -> Optional[str]:
+        for pattern in self.date_patterns:
+            match = re.search(pattern, text)
+            if match:
+                date_str = match.group(0)
+                parts = date_str.split('/') if '/' in date_str else date_str.split('-')
+                if len(parts[0]) == 4:
+                    return date_str
+                return f"{parts[2]}-{parts[0]}-{parts[1]}"
+        return None
+
+    def _extract_total(self, text: str) -> Optional[float]:
+        total_indicators = ['TOTAL', 'Total:', 'Amount Due:', 'AMOUNT']
+        lines = text.split('\n')
+        for line in lines:
+            if any(indicator in line.upper() for indicator in total_indicators):
+                matches = re.findall(self.amount_pattern, line)
+                if matches:
+                    return float(matches[-1].replace('$', ''))
+        amounts = []
+        for line in lines:
+            for match in re.findall(self.amount_pattern, line):
+                amounts.append(float(match.replace('$', '')))
+        return max(amounts) if amounts else None
+
+    def _extract_items(self, text: str) -> List[Dict]:
+        items = []
+        for line in text.split('\n'):
+            if not line.strip() or any(h in line.upper() for h in ['TOTAL', 'SUBTOTAL', 'TAX', 'DATE', 'TIME']):
+                continue
+            matches = re.findall(self.amount_pattern, line)
+            if matches:
+                description = line.replace(matches[-1], '').strip()
+                if description:
+                    items.append({"description": description, "amount": float(matches[-1].replace('$', ''))})
+        return items
+
+    def _extract_merchant(self, text: str) -> Optional[str]:
+        for line in text.split('\n')[:5]:
+            line = line.strip()
+            if line and len(line) > 3 and not any(c.isdigit() for c in line):
+                return line
+        return None
+
+def accuracy(parser) -> Dict[str, int]:
+    """Fixtures each field is parsed correctly on; prints the misses."""
+    correct = dict.fromkeys(FIELDS, 0)
+    for fixture in CORPUS:
+        parsed = parser.parse(fixture["text"])
+        for field in FIELDS:
+            if parsed[field] == fixture["expected"][field]:
+                correct[field] += 1
+            else:
+                print(f"  {type(parser).__name__} {fixture['name']}.{field}: "
+                      f"got {parsed[field]!r}, expected {fixture['expected'][field]!r}")
+    return correct
+
+def throughput(parser, texts: List[str], include_items: bool) -> float:
+    start = time.perf_counter()
+    for text in texts:
+        parser.parse(text, include_items)
+    return len(texts) / (time.perf_counter() - start)
+
+def main(receipts: int = 20_000):
+    legacy, parser = LegacyExtractors(), ReceiptParser()
+    print("misses:")
+    legacy_correct, parser_correct = accuracy(legacy), accuracy(parser)
+
+    texts = [CORPUS[i % len(CORPUS)]["text"] for i in range(receipts)]
+    print(f"\nfixtures: {len(CORPUS)}")
+    for field in FIELDS:
+        print(f"{field + ':':<14} legacy {legacy_correct[field]:>2}, single-pass {parser_correct[field]:>2}")
+    for include_items in (False, True):
+        legacy_rate = throughput(legacy, texts, include_items)
+        parser_rate = throughput(parser, texts, include_items)
+        label = "with items" if include_items else "no items"
+        print(f"{label + ':':<14} legacy {legacy_rate:,.0f}/s, single-pass {parser_rate:,.0f}/s "
+              f"({parser_rate / legacy_rate:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Micro-benchmark: region OCR (header and totals bands only) vs. OCR of the whole receipt.
+
+Uses long synthetic grocery receipts. Reports the share of the image that region mode
+hands to tesseract and, with the configured OCR engine, the recognition time of each mode.
+
+Run from the backend directory:
+    python -m benchmarks.bench_region_ocr
+"""
+import random
+import time
+from app.services.image_preprocessing import find_text_lines, preprocess_receipt
+from app.services.receipt_processor import get_ocr_engine, receipt_processor
+from benchmarks.bench_preprocessing import synthetic_receipt
+
+def main(images: int = 5, seed: int = 0):
+    rng = random.Random(seed)
+    corpus = [preprocess_receipt(synthetic_receipt(rng, items=(40, 80))[0])[0] for _ in range(images)]
+    engine = get_ocr_engine()
+
+    start = time.perf_counter()
+    lines = [find_text_lines(image) for image in corpus]
+    layout_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for image in corpus:
+        engine.recognize(image)
+    full_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for image in corpus:
+        receipt_processor._recognize(image, 0, regions=True)
+    region_seconds = time.perf_counter() - start
+
+    height = sum(image.shape[0] for image in corpus) / images
+    band_rows = receipt_processor.header_lines + receipt_processor.totals_lines
+    print(f"images:        {images} ({sum(map(len, lines)) / images:.0f} text lines, {height:.0f} rows avg)")
+    print(f"layout pass:   {layout_seconds / images * 1000:.1f} ms/image")
+    print(f"recognized:    {band_rows} of {sum(map(len, lines)) / images:.0f} lines per image")
+    print(f"{engine.name} full:    {full_seconds / images * 1000:.1f} ms/image")
+    print(f"{engine.name} regions: {region_seconds / images * 1000:.1f} ms/image")
+    print(f"speedup:       {full_seconds / region_seconds:.1f}x")
+
+if __name__ == "__main__":
+    main()
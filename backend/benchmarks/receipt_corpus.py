@@ -0,0 +1,243 @@
+"""
+OCR text fixtures for the receipt parser, with the values a person reads off each receipt.
+Texts are shaped like tesseract output: ragged spacing, blank lines, the odd misread glyph.
+Used by benchmarks.bench_receipt_parser to track parse accuracy alongside speed.
+"""
+
+CORPUS = [
+    {
+        "name": "grocery",
+        "text": """TRADER JOES
+123 Main St 555
+01/15/2024
+BANANAS 1.29
+MILK 3.49
+TOTAL $4.78
+""",
+        "expected": {
+            "merchant": "TRADER JOES", "date": "2024-01-15", "total_amount": 4.78,
+            "items": [{"description": "BANANAS", "amount": 1.29}, {"description": "MILK", "amount": 3.49}],
+        },
+    },
+    {
+        "name": "grocery_subtotal_tax",
+        "text": """
+WHOLE FOODS MARKET
+1440 P STREET NW
+WASHINGTON DC 20005
+(202) 621-9700
+
+ORGANIC AVOCADO        2.50
+SPARKLING WATER        5.99
+SOURDOUGH BREAD        4.49
+SUBTOTAL              12.98
+TAX                    0.78
+TOTAL                 13.76
+VISA ************4821 13.76
+03/02/2024 14:22
+""",
+        "expected": {
+            "merchant": "WHOLE FOODS MARKET", "date": "2024-03-02", "total_amount": 13.76,
+            "items": [
+                {"description": "ORGANIC AVOCADO", "amount": 2.50},
+                {"description": "SPARKLING WATER", "amount": 5.99},
+                {"description": "SOURDOUGH BREAD", "amount": 4.49},
+            ],
+        },
+    },
+    {
+        "name": "restaurant_tip",
+        "text": """Joe's Coffee & Food
+Table 12   Server: Maria
+2024-02-10
+
+2 Latte              $9.00
+1 Croissant          $3.75
+Subtotal            $12.75
+Tax                  $1.02
+Tip                  $2.55
+Total               $16.32
+Thank you!
+""",
+        "expected": {
+            "merchant": "Joe's Coffee & Food", "date": "2024-02-10", "total_amount": 16.32,
+            "items": [
+                {"description": "2 Latte", "amount": 9.00},
+                {"description": "1 Croissant", "amount": 3.75},
+            ],
+        },
+    },
+    {
+        "name": "gas_station",
+        "text": """SHELL
+SHELL OIL 57442
+04-22-2024  07:41
+PUMP 06
+UNLEADED  12.004 GAL @ $3.459
+FUEL SALE           $41.52
+AMOUNT DUE          $41.52
+""",
+        "expected": {
+            "merchant": "SHELL", "date": "2024-04-22", "total_amount": 41.52,
+            "items": [{"description": "FUEL SALE", "amount": 41.52}],
+        },
+    },
+    {
+        "name": "pharmacy",
+        "text": """CVS/pharmacy
+STORE 0042
+2024/05/03
+ACETAMINOPHEN 500MG     8.99
+BANDAGES                4.29
+ExtraCare savings      -1.00
+SUBTOTAL               12.28
+TAX                     0.74
+TOTAL                  13.02
+""",
+        "expected": {
+            "merchant": "CVS/pharmacy", "date": "2024-05-03", "total_amount": 13.02,
+            "items": [
+                {"description": "ACETAMINOPHEN 500MG", "amount": 8.99},
+                {"description": "BANDAGES", "amount": 4.29},
+            ],
+        },
+    },
+    {
+        "name": "no_total_label",
+        "text": """FARMERS MARKET STAND
+Sat 06/08/2024
+Tomatoes 4.00
+Peaches 6.50
+Honey 12.00
+""",
+        "expected": {
+            "merchant": "FARMERS MARKET STAND", "date": "2024-06-08", "total_amount": 12.00,
+            "items": [
+                {"description": "Tomatoes", "amount": 4.00},
+                {"description": "Peaches", "amount": 6.50},
+                {"description": "Honey", "amount": 12.00},
+            ],
+        },
+    },
+    {
+        "name": "subtotal_before_total",
+        "text": """TARGET
+T-1923 SEATTLE
+SUBTOTAL                  54.10
+8.9% TAX                   4.81
+TOTAL                     58.91
+07/19/2024 18:03
+""",
+        "expected": {"merchant": "TARGET", "date": "2024-07-19", "total_amount": 58.91, "items": []},
+    },
+    {
+        "name": "hotel_folio",
+        "text": """MARRIOTT DOWNTOWN
+Guest Folio
+Arrival 08/12/2024  Departure 08/14/2024
+Room Charge 08/12 189.00
+Room Charge 08/13 189.00
+Occupancy Tax 45.36
+Balance Due $423.36
+""",
+        "expected": {
+            "merchant": "MARRIOTT DOWNTOWN", "date": "2024-08-12", "total_amount": 423.36,
+            "items": [
+                {"description": "Room Charge 08/12", "amount": 189.00},
+                {"description": "Room Charge 08/13", "amount": 189.00},
+            ],
+        },
+    },
+    {
+        "name": "ocr_noise_total",
+        "text": """STARBUCKS
+Store #1234
+09/01/2024
+Grande Latte 5.45
+Blueberry Muffin 3.25
+T0TAL 8.70
+""",
+        "expected": {
+            "merchant": "STARBUCKS", "date": "2024-09-01", "total_amount": 8.70,
+            "items": [
+                {"description": "Grande Latte", "amount": 5.45},
+                {"description": "Blueberry Muffin", "amount": 3.25},
+            ],
+        },
+    },
+    {
+        "name": "merchant_after_address",
+        "text": """1600 AMPHITHEATRE PKWY
+MOUNTAIN VIEW CA
+BLUE BOTTLE COFFEE
+10/05/2024
+COLD BREW 5.00
+TOTAL 5.00
+""",
+        "expected": {
+            "merchant": "BLUE BOTTLE COFFEE", "date": "2024-10-05", "total_amount": 5.00,
+            "items": [{"description": "COLD BREW", "amount": 5.00}],
+        },
+    },
+    {
+        "name": "no_date",
+        "text": """CORNER DELI
+TURKEY SANDWICH 8.50
+CHIPS 1.75
+TOTAL 10.25
+""",
+        "expected": {
+            "merchant": "CORNER DELI", "date": None, "total_amount": 10.25,
+            "items": [{"description": "TURKEY SANDWICH", "amount": 8.50}, {"description": "CHIPS", "amount": 1.75}],
+        },
+    },
+    {
+        "name": "multiple_dates",
+        "text": """BEST BUY
+2024-11-29 10:02
+USB-C CABLE 19.99
+RETURN BY 12/29/2024
+TOTAL 21.79
+""",
+        "expected": {
+            "merchant": "BEST BUY", "date": "2024-11-29", "total_amount": 21.79,
+            "items": [{"description": "USB-C CABLE", "amount": 19.99}],
+        },
+    },
+    {
+        "name": "empty",
+        "text": "",
+        "expected": {"merchant": None, "date": None, "total_amount": None, "items": []},
+    },
+    {
+        "name": "unreadable",
+        "text": """~~ ,. '' |
+ll1 :: ..
+""",
+        "expected": {"merchant": None, "date": None, "total_amount": None, "items": []},
+    },
+    {
+        "name": "airline",
+        "text": """DELTA AIR LINES
+E-TICKET RECEIPT
+Issued 01-05-2025
+Base Fare USD 312.56
+Taxes and Fees 48.24
+Total Amount USD 360.80
+""",
+        "expected": {
+            "merchant": "DELTA AIR LINES", "date": "2025-01-05", "total_amount": 360.80,
+            "items": [{"description": "Base Fare USD", "amount": 312.56}, {"description": "Taxes and Fees", "amount": 48.24}],
+        },
+    },
+    {
+        "name": "long_grocery",
+        "text": "SAFEWAY\nSTORE 1711\n02/14/2025\n"
+                + "".join(f"ITEM {i:03d} {1 + i % 9}.{i % 100:02d}\n" for i in range(60))
+                + "SUBTOTAL 352.90\nTAX 0.00\nTOTAL 352.90\n",
+        "expected": {
+            "merchant": "SAFEWAY", "date": "2025-02-14", "total_amount": 352.90,
+            "items": [{"description": f"ITEM {i:03d}", "amount": float(f"{1 + i % 9}.{i % 100:02d}")} for i in range(60)],
+        },
+    },
+]
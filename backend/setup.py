@@ -8,6 +8,7 @@ setup(
         "fastapi",
         "uvicorn",
         "sqlalchemy",
+        "aiosqlite",
         "pydantic",
         "python-jose[cryptography]",
         "passlib[bcrypt]",
@@ -0,0 +1,114 @@
+"""
+Duplicate receipt detection on a synthetic corpus of photos from one store.
+
+Run from the backend directory:
+    python -m pytest -q tests
+"""
+import asyncio
+import hashlib
+import random
+from datetime import datetime
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.core.config import settings
+from app.models.models import Base, Receipt
+from app.services.image_preprocessing import decode_grayscale, difference_hash
+from app.services.receipt_ocr_cache import dhash_distance, find_duplicate_receipt, same_receipt_fields, to_signed64
+from benchmarks.bench_preprocessing import photograph_receipt, receipt_lines
+
+RECEIPTS = 20
+
+def _photo(lines, rng):
+    image, _ = photograph_receipt(lines, rng, width=900)
+    return {
+        "sha256": hashlib.sha256(image).hexdigest(),
+        "dhash": difference_hash(decode_grayscale(image))
+    }
+
+@pytest.fixture(scope="module")
+def corpus():
+    """Distinct receipts (different items, dates and totals) from the same store, plus a re-photo of each."""
+    rng = random.Random(0)
+    receipts = []
+    for i in range(RECEIPTS):
+        lines, day, total = receipt_lines(rng)
+        receipts.append({
+            "data": {"amount": total, "date": day},
+            "photo": _photo(lines, rng),
+            "rephoto": _photo(lines, random.Random(1000 + i))
+        })
+    return receipts
+
+async def _with_receipts(tmp_path, check):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'receipts.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            return await check(db)
+    finally:
+        await engine.dispose()
+
+def _receipt(receipt):
+    return Receipt(
+        user_id=1,
+        transaction_id=None,
+        total_amount=receipt["data"]["amount"],
+        receipt_date=datetime.fromisoformat(receipt["data"]["date"]),
+        image_sha256=receipt["photo"]["sha256"],
+        image_dhash=to_signed64(receipt["photo"]["dhash"])
+    )
+
+def test_corpus_hashes_alike(corpus):
+    # Without the field check, many distinct receipts would pass for re-photographed copies
+    near = sum(
+        1
+        for i in range(RECEIPTS)
+        for j in range(i)
+        if dhash_distance(corpus[i]["photo"]["dhash"], corpus[j]["photo"]["dhash"]) <= settings.RECEIPT_DUPLICATE_MAX_DISTANCE
+    )
+    assert near > RECEIPTS
+
+def test_distinct_receipts_are_not_duplicates(corpus, tmp_path):
+    async def check(db):
+        flagged = []
+        for receipt in corpus:
+            photo = receipt["photo"]
+            if await find_duplicate_receipt(db, 1, photo["sha256"], photo["dhash"], receipt["data"]):
+                flagged.append(receipt["data"])
+            db.add(_receipt(receipt))
+            await db.commit()
+        return flagged
+
+    assert asyncio.run(_with_receipts(tmp_path, check)) == []
+
+def test_copies_are_duplicates(corpus, tmp_path):
+    async def check(db):
+        saved = []
+        for receipt in corpus:
+            row = _receipt(receipt)
+            db.add(row)
+            saved.append(row)
+        await db.commit()
+
+        found = []
+        for receipt, row in zip(corpus, saved):
+            photo, rephoto = receipt["photo"], receipt["rephoto"]
+            exact = await find_duplicate_receipt(db, 1, photo["sha256"], photo["dhash"], receipt["data"])
+            again = await find_duplicate_receipt(db, 1, rephoto["sha256"], rephoto["dhash"], receipt["data"])
+            other_user = await find_duplicate_receipt(db, 2, photo["sha256"], photo["dhash"], receipt["data"])
+            found.append((row.id, exact, again, other_user))
+        return found
+
+    for receipt_id, exact, again, other_user in asyncio.run(_with_receipts(tmp_path, check)):
+        assert exact == {"receipt_id": receipt_id, "transaction_id": None, "distance": 0}
+        assert again is not None and again["receipt_id"] == receipt_id
+        assert other_user is None
+
+def test_same_receipt_fields():
+    data = {"amount": 13.76, "date": "2024-03-02"}
+    assert same_receipt_fields(data, 13.76, datetime(2024, 3, 2, 14, 22))
+    assert same_receipt_fields({"amount": 13.76, "date": None}, 13.76, datetime(2024, 3, 2))
+    assert not same_receipt_fields(data, 13.77, datetime(2024, 3, 2))
+    assert not same_receipt_fields(data, 13.76, datetime(2024, 3, 3))
+    assert not same_receipt_fields({"amount": None, "date": "2024-03-02"}, 13.76, None)
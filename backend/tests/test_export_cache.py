@@ -0,0 +1,164 @@
+"""
+Export cache files, their ETags, and conditional and ranged sends of them.
+
+Run from the backend directory:
+    python -m pytest -q tests
+"""
+import asyncio
+import os
+from datetime import datetime
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.api.endpoints import export
+from app.models.models import Base, Transaction
+from app.services import transaction_export
+from app.services.export_cache import ExportCache
+from app.services.transaction_export import export_filters
+
+CONTENT = bytes(range(256)) * 4
+
+def _request(**headers) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    })
+
+async def _chunks(data: bytes, fail_after: int = None):
+    for i in range(0, len(data), 100):
+        if fail_after is not None and i >= fail_after:
+            raise ConnectionResetError("client went away")
+        yield data[i:i + 100]
+
+async def _body(response) -> bytes:
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+@pytest.fixture
+def cache(tmp_path):
+    return ExportCache(root=str(tmp_path / "exports"), max_bytes=1 << 20)
+
+def test_only_complete_streams_are_cached(cache):
+    key = cache.key(1, "csv", export_filters(), 3)
+
+    async def interrupted():
+        with pytest.raises(ConnectionResetError):
+            async for _ in cache.store(key, "csv", _chunks(CONTENT, fail_after=500)):
+                pass
+        return await cache.open(key, "csv")
+
+    assert asyncio.run(interrupted()) is None
+    assert os.listdir(cache.root) == []  # no partial file left behind
+
+    artifact = asyncio.run(cache.fill(key, "csv", _chunks(CONTENT)))
+    assert artifact.size == len(CONTENT)
+    with open(artifact.path, "rb") as f:
+        assert f.read() == CONTENT
+
+def test_keys_follow_user_format_filters_and_version(cache):
+    key = cache.key(1, "csv", export_filters(categories=["b", "a"]), 3)
+    assert key == cache.key(1, "csv", export_filters(categories=["a", "b", "a"]), 3)
+    assert key != cache.key(2, "csv", export_filters(categories=["a", "b"]), 3)
+    assert key != cache.key(1, "json", export_filters(categories=["a", "b"]), 3)
+    assert key != cache.key(1, "csv", export_filters(categories=["a"]), 3)
+    assert key != cache.key(1, "csv", export_filters(categories=["a", "b"]), 4)
+
+def test_etags(cache):
+    key = cache.key(1, "excel", export_filters(), 1)
+    first = asyncio.run(cache.fill(key, "xlsx", _chunks(CONTENT)))
+    assert asyncio.run(cache.open(key, "xlsx", reproducible=True)).etag == cache.etag(key) == f'"{key}"'
+    # A copy rendered again (e.g. after eviction) is a different file unless the format is reproducible
+    os.utime(first.path, ns=(0, os.stat(first.path).st_mtime_ns + 1000))
+    assert asyncio.run(cache.open(key, "xlsx")).etag != first.etag
+    assert first.etag.startswith(f'"{key}-')
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-9", (0, 9)),
+    ("bytes=1000-", (1000, 1023)),
+    ("bytes=-24", (1000, 1023)),
+    ("bytes=-5000", (0, 1023)),
+    ("bytes=10-99999", (10, 1023)),
+    ("bytes=9-5", None),
+    ("bytes=0-1,5-9", None),
+    ("lines=0-9", None),
+    ("bytes=a-b", None),
+])
+def test_byte_range(cache, header, expected):
+    artifact = asyncio.run(cache.fill("k" * 64, "csv", _chunks(CONTENT)))
+    assert export._byte_range(_request(range=header), artifact) == expected
+
+def test_unsatisfiable_range(cache):
+    artifact = asyncio.run(cache.fill("k" * 64, "csv", _chunks(CONTENT)))
+    for header in (f"bytes={len(CONTENT)}-", "bytes=-0"):
+        with pytest.raises(HTTPException) as raised:
+            export._byte_range(_request(range=header), artifact)
+        assert raised.value.status_code == 416
+        assert raised.value.headers["Content-Range"] == f"bytes */{len(CONTENT)}"
+
+def test_if_range_must_match(cache):
+    artifact = asyncio.run(cache.fill("k" * 64, "csv", _chunks(CONTENT)))
+    assert export._byte_range(_request(range="bytes=0-9", if_range=artifact.etag), artifact) == (0, 9)
+    assert export._byte_range(_request(range="bytes=0-9", if_range='"stale"'), artifact) is None
+
+def test_send_artifact(cache):
+    artifact = asyncio.run(cache.fill("k" * 64, "csv", _chunks(CONTENT)))
+
+    whole = export._send_artifact(_request(), artifact, "csv")
+    assert whole.status_code == 200
+    assert whole.headers["etag"] == artifact.etag
+    assert whole.headers["accept-ranges"] == "bytes"
+
+    for if_none_match in (artifact.etag, f'"other", {artifact.etag}', "*"):
+        assert export._send_artifact(_request(if_none_match=if_none_match), artifact, "csv").status_code == 304
+
+    part = export._send_artifact(_request(range="bytes=100-299"), artifact, "csv")
+    assert part.status_code == 206
+    assert part.headers["content-range"] == f"bytes 100-299/{len(CONTENT)}"
+    assert part.headers["content-length"] == "200"
+    assert asyncio.run(_body(part)) == CONTENT[100:300]
+
+def test_streamed_miss_carries_the_cached_etag(tmp_path, cache, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'export.db'}")
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(transaction_export, "AsyncSessionLocal", sessions)
+    monkeypatch.setattr(export, "export_cache", cache)
+
+    async def check():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        try:
+            return await respond_all()
+        finally:
+            await engine.dispose()
+
+    async def respond_all():
+        async with sessions() as db:
+            db.add_all([
+                Transaction(user_id=1, amount=float(i), description=f"SHOP {i}", date=datetime(2024, 1, i + 1))
+                for i in range(20)
+            ])
+            await db.commit()
+
+            async def respond(fmt, **headers):
+                return await export._export_response(_request(**headers), db, 1, fmt, export_filters())
+
+            streamed = await respond("csv")
+            streamed_body = await _body(streamed)
+            cached = await respond("csv")
+            resumed = await respond("csv", range="bytes=50-", if_range=streamed.headers["etag"])
+            resumed_body = await _body(resumed)
+            for name in os.listdir(cache.root):
+                os.remove(os.path.join(cache.root, name))
+            evicted = await respond("csv", if_none_match=streamed.headers["etag"])
+            return streamed, streamed_body, cached, resumed_body, resumed.status_code, evicted.status_code
+
+    streamed, streamed_body, cached, resumed_body, resumed_status, evicted_status = asyncio.run(check())
+
+    assert b"SHOP 19" in streamed_body
+    assert streamed.headers["etag"] == cached.headers["etag"]
+    assert resumed_status == 206
+    assert resumed_body == streamed_body[50:]
+    # The key identifies the bytes, so revalidation needs no re-render
+    assert evicted_status == 304
@@ -0,0 +1,124 @@
+"""
+Claiming and leasing of jobs by JobRunner workers, against a throwaway SQLite database.
+
+Run from the backend directory:
+    python -m pytest -q tests
+"""
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.models.models import Base, ReceiptJob
+from app.services import job_runner
+from app.services.job_runner import JobRunner
+
+class RecordingRunner(JobRunner):
+    """Runs jobs by noting their ids; ids in `failing` raise instead."""
+    model = ReceiptJob
+    claim_values = {"stage": "ocr"}
+
+    def __init__(self, failing=()):
+        super().__init__(workers=1, poll_seconds=0.05, lease_seconds=60, max_attempts=3)
+        self.failing = set(failing)
+        self.ran = []
+
+    async def _run(self, job_id: str):
+        self.ran.append(job_id)
+        if job_id in self.failing:
+            raise RuntimeError(f"job {job_id} exploded")
+
+def _job(job_id: str, minutes_ago: int, status: str = "queued", lease_expires_at=None) -> ReceiptJob:
+    created_at = datetime.utcnow() - timedelta(minutes=minutes_ago)
+    return ReceiptJob(
+        id=job_id,
+        user_id=1,
+        operation="process",
+        status=status,
+        stage="queued",
+        attempts=1 if status == "running" else 0,
+        lease_expires_at=lease_expires_at,
+        created_at=created_at,
+        updated_at=created_at
+    )
+
+async def _with_jobs(tmp_path, monkeypatch, jobs, check):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'jobs.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(job_runner, "AsyncSessionLocal", sessions)
+    try:
+        async with sessions() as db:
+            db.add_all(jobs)
+            await db.commit()
+        result = await check()
+        async with sessions() as db:
+            return result, {job.id: job for job in await db.run_sync(lambda s: s.query(ReceiptJob).all())}
+    finally:
+        await engine.dispose()
+
+def test_claims_oldest_queued_job_first(tmp_path, monkeypatch):
+    runner = RecordingRunner()
+    jobs = [_job("newest", 1), _job("oldest", 30), _job("middle", 10)]
+
+    async def check():
+        return [await runner._claim() for _ in range(4)]
+
+    claimed, rows = asyncio.run(_with_jobs(tmp_path, monkeypatch, jobs, check))
+    assert claimed == ["oldest", "middle", "newest", None]
+    for job in rows.values():
+        assert job.status == "running"
+        assert job.attempts == 1
+        assert job.stage == "ocr"
+        assert job.lease_expires_at > datetime.utcnow() + timedelta(seconds=30)
+
+def test_lapsed_lease_is_claimed_again(tmp_path, monkeypatch):
+    runner = RecordingRunner()
+    now = datetime.utcnow()
+    jobs = [
+        _job("leased", 20, "running", lease_expires_at=now + timedelta(minutes=1)),
+        _job("lapsed", 10, "running", lease_expires_at=now - timedelta(seconds=1)),
+        _job("done", 30, "succeeded"),
+        _job("gave-up", 40, "failed"),
+    ]
+
+    async def check():
+        return [await runner._claim() for _ in range(2)]
+
+    claimed, rows = asyncio.run(_with_jobs(tmp_path, monkeypatch, jobs, check))
+    assert claimed == ["lapsed", None]
+    assert rows["lapsed"].attempts == 2
+    assert rows["lapsed"].lease_expires_at > now
+    assert rows["leased"].attempts == 1
+
+def test_concurrent_claims_hand_out_each_job_once(tmp_path, monkeypatch):
+    runners = [RecordingRunner() for _ in range(8)]
+    jobs = [_job(f"job-{i}", 10 - i) for i in range(3)]
+
+    async def check():
+        return await asyncio.gather(*(runner._claim() for runner in runners))
+
+    claimed, rows = asyncio.run(_with_jobs(tmp_path, monkeypatch, jobs, check))
+    claimed = [job_id for job_id in claimed if job_id is not None]
+    assert len(claimed) == len(set(claimed))
+    assert all(rows[job_id].attempts == 1 for job_id in claimed)
+
+def test_worker_survives_a_failing_job(tmp_path, monkeypatch):
+    runner = RecordingRunner(failing={"first"})
+    jobs = [_job("first", 10), _job("second", 5)]
+
+    async def check():
+        await runner.start()
+        try:
+            for _ in range(100):
+                if len(runner.ran) == 2:
+                    break
+                await asyncio.sleep(0.02)
+            return list(runner.ran), all(not task.done() for task in runner._tasks)
+        finally:
+            await runner.stop()
+
+    (ran, alive), rows = asyncio.run(_with_jobs(tmp_path, monkeypatch, jobs, check))
+    assert ran == ["first", "second"]
+    assert alive
+    # Left running; the lease hands it to a worker again once it lapses
+    assert rows["first"].status == "running"
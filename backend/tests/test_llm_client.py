@@ -0,0 +1,155 @@
+"""
+LLM client against an in-process fake of the OpenAI completions API.
+
+Run from the backend directory:
+    python -m pytest -q tests
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from app.core.config import settings
+from app.services import ai_categorization
+from app.services.categorization_cache import categorization_cache
+from app.services.llm_client import LLMClient, LLMUnavailable, llm_client
+
+class FakeOpenAI(ThreadingHTTPServer):
+    """Answers every completion with `reply` after `delay` seconds and counts calls in flight."""
+    daemon_threads = True
+    block_on_close = False
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _FakeOpenAIHandler)
+        self.delay = 0.0
+        self.reply = "travel"
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+class _FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(server.delay)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+        # The batched prompt numbers its items; answer each one
+        lines = [line.split(".")[0].strip() for line in body.get("prompt", "").splitlines()]
+        numbers = [n for n in lines if n.isdigit()]
+        text = "\n".join(f"{n}. {server.reply}" for n in numbers) or server.reply
+        if self.path.endswith("/chat/completions"):
+            choice = {"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}
+            kind = "chat.completion"
+        else:
+            choice = {"index": 0, "text": text, "logprobs": None, "finish_reason": "stop"}
+            kind = "text_completion"
+        payload = json.dumps({
+            "id": "cmpl-test", "object": kind, "created": 0, "model": body["model"], "choices": [choice]
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+@pytest.fixture
+def fake_openai():
+    server = FakeOpenAI()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def shared_client(fake_openai, monkeypatch):
+    """Point the shared client at the fake server, with the categorization cache out of the way."""
+    async def cache_miss(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(llm_client, "api_key", "test-key")
+    monkeypatch.setattr(llm_client, "base_url", fake_openai.base_url)
+    monkeypatch.setattr(llm_client, "_client", None)
+    monkeypatch.setattr(categorization_cache, "get", cache_miss)
+    monkeypatch.setattr(categorization_cache, "set", cache_miss)
+    return fake_openai
+
+def _categorize(description: str, amount: float) -> str:
+    async def run():
+        try:
+            return await ai_categorization.categorize_transaction(description, amount)
+        finally:
+            await llm_client.close()
+    return asyncio.run(run())
+
+def test_categorize_uses_llm_reply(shared_client):
+    assert _categorize("STARBUCKS COFFEE #1234", 4.5) == "travel"
+    assert shared_client.requests == 1
+
+def test_missed_deadline_falls_back_to_local_categorizer(shared_client, monkeypatch):
+    shared_client.delay = 1.0
+    monkeypatch.setattr(settings, "OPENAI_CATEGORIZE_TIMEOUT", 0.2)
+
+    started = time.monotonic()
+    category = _categorize("STARBUCKS COFFEE #1234", 4.5)
+
+    # The keyword categorizer's answer, without waiting for the slow reply
+    assert category == "food"
+    assert shared_client.requests == 1
+    assert time.monotonic() - started < shared_client.delay
+
+def test_complete_raises_llm_unavailable_on_timeout(fake_openai):
+    fake_openai.delay = 1.0
+    client = LLMClient(api_key="test-key", base_url=fake_openai.base_url, model="test", max_concurrency=2)
+
+    async def run():
+        try:
+            with pytest.raises(LLMUnavailable):
+                await client.complete("hello", max_tokens=5, temperature=0, timeout=0.2)
+        finally:
+            await client.close()
+    asyncio.run(run())
+
+def test_semaphore_caps_calls_in_flight(fake_openai):
+    fake_openai.delay = 0.1
+    client = LLMClient(api_key="test-key", base_url=fake_openai.base_url, model="test", max_concurrency=2)
+
+    async def run():
+        try:
+            return await asyncio.gather(*(
+                client.complete(f"prompt {i}", max_tokens=5, temperature=0, timeout=5.0) for i in range(6)
+            ))
+        finally:
+            await client.close()
+    replies = asyncio.run(run())
+
+    assert replies == ["travel"] * 6
+    assert fake_openai.requests == 6
+    assert fake_openai.max_in_flight == 2
+
+def test_disabled_without_api_key():
+    client = LLMClient(api_key=None)
+
+    async def run():
+        with pytest.raises(LLMUnavailable):
+            await client.complete("hello", max_tokens=5, temperature=0, timeout=1.0)
+    asyncio.run(run())
@@ -0,0 +1,74 @@
+"""
+Statement imports skip lines that were already imported, within and across statements.
+
+Run from the backend directory:
+    python -m pytest -q tests
+"""
+import io
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+from app.models.models import Base, SpendingRollup, Transaction
+from app.services.statement_import import import_statement, iter_statement_rows, statement_row_hash
+
+STATEMENT = b"""Date,Description,Amount
+2024-01-03,COFFEE SHOP,4.50
+2024-01-04,GROCERY MART,52.10
+2024-01-04,GROCERY MART,52.10
+2024-01-05,Coffee Shop ,4.50
+not a date,BROKEN,1.00
+2024-01-06,FUEL STATION,"1,040.00"
+"""
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'import.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+def _rows(data: bytes = STATEMENT):
+    return iter_statement_rows(io.BytesIO(data), "statement.csv")
+
+def _count(db, user_id):
+    return db.execute(select(func.count(Transaction.id)).where(Transaction.user_id == user_id)).scalar()
+
+def test_row_hash_ignores_case_and_padding():
+    date = datetime(2024, 1, 3)
+    assert statement_row_hash(date, 4.5, "COFFEE SHOP") == statement_row_hash(date, 4.50, "  coffee shop ")
+    assert statement_row_hash(date, 4.5, "COFFEE SHOP") != statement_row_hash(date, 4.51, "COFFEE SHOP")
+    assert statement_row_hash(date, 4.5, "COFFEE SHOP") != statement_row_hash(datetime(2024, 1, 4), 4.5, "COFFEE SHOP")
+
+@pytest.mark.parametrize("batch_size", [1, 2, 100])
+def test_repeated_lines_are_imported_once(db, batch_size):
+    result = import_statement(db, 1, _rows(), batch_size=batch_size)
+    # The repeated grocery line is a duplicate whether it lands in the same batch or the next
+    assert result == {"imported": 4, "duplicates": 1, "skipped": 1}
+    assert _count(db, 1) == 4
+    hashes = db.execute(select(Transaction.import_hash).where(Transaction.user_id == 1)).scalars().all()
+    assert len(set(hashes)) == 4
+
+def test_reimport_is_idempotent(db):
+    import_statement(db, 1, _rows())
+    rollups = db.execute(select(func.sum(SpendingRollup.transaction_count))).scalar()
+
+    again = import_statement(db, 1, _rows())
+    assert again == {"imported": 0, "duplicates": 5, "skipped": 1}
+    assert _count(db, 1) == 4
+    assert db.execute(select(func.sum(SpendingRollup.transaction_count))).scalar() == rollups
+
+def test_overlapping_statement_imports_only_new_lines(db):
+    import_statement(db, 1, _rows())
+    overlap = b"""Date,Description,Amount
+2024-01-06,FUEL STATION,1040.00
+2024-01-07,BOOK STORE,18.00
+"""
+    assert import_statement(db, 1, _rows(overlap)) == {"imported": 1, "duplicates": 1, "skipped": 0}
+    assert _count(db, 1) == 5
+
+def test_duplicates_are_per_user(db):
+    import_statement(db, 1, _rows())
+    assert import_statement(db, 2, _rows())["imported"] == 4
+    assert _count(db, 2) == 4
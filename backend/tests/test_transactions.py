@@ -0,0 +1,151 @@
+"""
+Keyset paging over transactions and the spending rollups kept by the write paths.
+
+Run from the backend directory:
+    python -m pytest -q tests
+"""
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from app.api.endpoints.transactions import delete_transaction, update_transaction
+from app.crud.category import category_name
+from app.crud.rollup import rollup_period, transaction_rollup_delta
+from app.crud.transaction import decode_cursor, encode_cursor, get_user_transactions
+from app.models.models import Base, SpendingRollup, Transaction, User
+from app.schemas.transaction import TransactionUpdate
+
+# Several undated rows and repeated dates, so the cursor has to break ties on id
+DATES = [
+    None, datetime(2024, 1, 5), None, datetime(2024, 1, 5), datetime(2023, 12, 31),
+    datetime(2024, 1, 5), None, datetime(2024, 2, 1), datetime(2023, 12, 31), None
+]
+
+async def _with_transactions(tmp_path, check):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'transactions.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            for i, date in enumerate(DATES):
+                db.add(Transaction(user_id=1, amount=float(i), description=f"T{i}", date=date))
+            db.add(Transaction(user_id=2, amount=1.0, description="other user", date=None))
+            await db.commit()
+            return await check(db)
+    finally:
+        await engine.dispose()
+
+def test_cursor_round_trip():
+    transaction = Transaction(id=42, date=datetime(2024, 1, 5, 12, 30))
+    assert decode_cursor(encode_cursor(transaction)) == (datetime(2024, 1, 5, 12, 30), 42)
+    assert decode_cursor(encode_cursor(Transaction(id=7, date=None))) == (None, 7)
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor")
+
+@pytest.mark.parametrize("limit", [1, 2, 3, len(DATES)])
+def test_keyset_pages_cover_offset_order(tmp_path, limit):
+    async def check(db):
+        everything = await get_user_transactions(db, 1, limit=None)
+        paged = []
+        after = None
+        while True:
+            page = await get_user_transactions(db, 1, limit=limit, after=after)
+            if not page:
+                break
+            paged.extend(page)
+            after = decode_cursor(encode_cursor(page[-1]))
+        return [t.id for t in everything], [t.id for t in paged], [t.date for t in everything]
+
+    everything, paged, dates = asyncio.run(_with_transactions(tmp_path, check))
+    assert paged == everything
+    assert len(everything) == len(DATES)
+    # NULL dates sort first, then by date, ties by id
+    undated = DATES.count(None)
+    assert dates[:undated] == [None] * undated
+    assert dates[undated:] == sorted(dates[undated:])
+
+def test_keyset_after_last_undated_row(tmp_path):
+    async def check(db):
+        everything = await get_user_transactions(db, 1, limit=None)
+        last_undated = [t for t in everything if t.date is None][-1]
+        rest = await get_user_transactions(db, 1, limit=None, after=(None, last_undated.id))
+        return [t.id for t in everything if t.date is not None], [t.id for t in rest]
+
+    dated, rest = asyncio.run(_with_transactions(tmp_path, check))
+    assert rest == dated
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rollups.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(User(id=1, email="a@example.com", hashed_password="x"))
+        session.commit()
+        yield session
+    engine.dispose()
+
+def _recorded(db, user_id):
+    return {
+        (r.period, r.category): (round(r.total_amount, 2), r.transaction_count)
+        for r in db.execute(select(SpendingRollup).where(SpendingRollup.user_id == user_id)).scalars()
+        if r.transaction_count
+    }
+
+def _recomputed(db, user_id):
+    """The rollups as a full aggregation over the transactions would give them."""
+    totals = defaultdict(lambda: [0.0, 0])
+    for t in db.execute(select(Transaction).where(Transaction.user_id == user_id)).scalars():
+        total = totals[(rollup_period(t.date, t.created_at), category_name(t.category))]
+        total[0] += t.amount
+        total[1] += 1
+    return {key: (round(amount, 2), count) for key, (amount, count) in totals.items()}
+
+def _create(db, amount, date, category=None):
+    transaction = Transaction(user_id=1, amount=amount, description="COFFEE SHOP", date=date, created_at=datetime(2024, 3, 9))
+    db.add(transaction)
+    db.flush()
+    db.execute(transaction_rollup_delta(transaction))
+    db.commit()
+    return transaction
+
+def test_rollups_follow_updates_and_deletes(db):
+    user = db.get(User, 1)
+    first = _create(db, 4.5, datetime(2024, 1, 3))
+    second = _create(db, 12.0, datetime(2024, 1, 20))
+    undated = _create(db, 7.25, None)
+    assert _recorded(db, 1) == _recomputed(db, 1)
+
+    # Amount, month and category change: the old bucket loses the row, the new one gains it
+    update_transaction(
+        db=db,
+        transaction_id=first.id,
+        transaction_in=TransactionUpdate(amount=5.0, date=datetime(2024, 2, 1), category="food"),
+        current_user=user
+    )
+    assert _recorded(db, 1) == _recomputed(db, 1)
+    # An undated row is bucketed by when it was recorded, before and after
+    update_transaction(
+        db=db, transaction_id=undated.id, transaction_in=TransactionUpdate(amount=8.0), current_user=user
+    )
+    assert _recorded(db, 1) == _recomputed(db, 1)
+
+    delete_transaction(db=db, transaction_id=second.id, current_user=user)
+    assert _recorded(db, 1) == _recomputed(db, 1)
+    delete_transaction(db=db, transaction_id=first.id, current_user=user)
+    delete_transaction(db=db, transaction_id=undated.id, current_user=user)
+    assert _recorded(db, 1) == {}
+
+def test_rollup_version_grows_with_every_write(db):
+    user = db.get(User, 1)
+    transaction = _create(db, 3.0, datetime(2024, 1, 3))
+    versions = [sum(r.version for r in db.execute(select(SpendingRollup)).scalars())]
+    update_transaction(
+        db=db, transaction_id=transaction.id, transaction_in=TransactionUpdate(amount=4.0), current_user=user
+    )
+    versions.append(sum(r.version for r in db.execute(select(SpendingRollup)).scalars()))
+    delete_transaction(db=db, transaction_id=transaction.id, current_user=user)
+    versions.append(sum(r.version for r in db.execute(select(SpendingRollup)).scalars()))
+    assert versions == sorted(set(versions))
@@ -14,40 +14,38 @@ import {
   ResponsiveContainer,
 } from 'recharts';
 
-interface Transaction {
-  id: number;
+interface MonthlySpending {
+  period: string;
   amount: number;
-  description: string;
+  transaction_count: number;
+}
+
+interface CategorySpending {
   category: string;
-  date: string;
+  amount: number;
+  transaction_count: number;
 }
 
-interface DashboardChartsProps {
-  transactions: Transaction[];
+interface SpendingSummary {
+  months: MonthlySpending[];
+  categories: CategorySpending[];
 }
 
-const DashboardCharts: React.FC<DashboardChartsProps> = ({ transactions }) => {
-  // Process data for monthly spending trend
-  const monthlySpending = transactions.reduce((acc: any, transaction) => {
-    const month = new Date(transaction.date).toLocaleString('default', { month: 'short' });
-    acc[month] = (acc[month] || 0) + transaction.amount;
-    return acc;
-  }, {});
+interface DashboardChartsProps {
+  summary: SpendingSummary;
+}
 
-  const monthlyData = Object.entries(monthlySpending).map(([month, amount]) => ({
-    month,
+const DashboardCharts: React.FC<DashboardChartsProps> = ({ summary }) => {
+  // Monthly spending trend, from the server-side rollups
+  const monthlyData = summary.months.map(({ period, amount }) => ({
+    month: new Date(`${period}-01T00:00:00`).toLocaleString('default', { month: 'short', year: 'numeric' }),
     amount,
   }));
 
-  // Process data for category breakdown
-  const categorySpending = transactions.reduce((acc: any, transaction) => {
-    acc[transaction.category] = (acc[transaction.category] || 0) + transaction.amount;
-    return acc;
-  }, {});
-
-  const categoryData = Object.entries(categorySpending).map(([name, value]) => ({
-    name,
-    value,
+  // Category breakdown
+  const categoryData = summary.categories.map(({ category, amount }) => ({
+    name: category,
+    value: amount,
   }));
 
   return (
@@ -19,56 +19,47 @@ import {
 } from 'recharts'
 import axios from 'axios'
 
-interface Transaction {
-  id: number
+interface MonthlySpending {
+  period: string
   amount: number
-  description: string
-  date: string
-  category: string
+  transaction_count: number
+}
+
+interface SpendingSummary {
+  total_spent: number
+  transaction_count: number
+  monthly_average: number
+  months: MonthlySpending[]
 }
 
 const Dashboard = () => {
-  const [transactions, setTransactions] = useState<Transaction[]>([])
-  const [totalSpent, setTotalSpent] = useState(0)
-  const [monthlyAverage, setMonthlyAverage] = useState(0)
+  const [summary, setSummary] = useState<SpendingSummary | null>(null)
 
   useEffect(() => {
-    const fetchTransactions = async () => {
+    const fetchSummary = async () => {
       try {
         const token = localStorage.getItem('token')
-        const response = await axios.get('http://localhost:8000/api/v1/transactions/', {
+        // Totals are pre-aggregated server side, so this stays small however long the history is
+        const response = await axios.get('http://localhost:8000/api/v1/transactions/summary', {
           headers: { Authorization: `Bearer ${token}` },
         })
-        setTransactions(response.data)
-        
-        // Calculate total spent
-        const total = response.data.reduce((acc: number, curr: Transaction) => acc + curr.amount, 0)
-        setTotalSpent(total)
-        
-        // Calculate monthly average
-        const months = new Set(response.data.map((t: Transaction) => t.date.substring(0, 7))).size
-        setMonthlyAverage(total / (months || 1))
+        setSummary(response.data)
       } catch (error) {
-        console.error('Error fetching transactions:', error)
+        console.error('Error fetching spending summary:', error)
       }
     }
 
-    fetchTransactions()
+    fetchSummary()
   }, [])
 
-  // Prepare data for the chart
-  const chartData = transactions.reduce((acc: any[], transaction: Transaction) => {
-    const date = transaction.date.substring(0, 7) // Get YYYY-MM
-    const existingEntry = acc.find(entry => entry.date === date)
-    
-    if (existingEntry) {
-      existingEntry.amount += transaction.amount
-    } else {
-      acc.push({ date, amount: transaction.amount })
-    }
-    
-    return acc
-  }, []).sort((a, b) => a.date.localeCompare(b.date))
+  const totalSpent = summary?.total_spent ?? 0
+  const monthlyAverage = summary?.monthly_average ?? 0
+
+  // Prepare data for the chart (months arrive sorted by period)
+  const chartData = (summary?.months ?? []).map((month) => ({
+    date: month.period,
+    amount: month.amount,
+  }))
 
   return (
     <Box>
@@ -89,7 +80,7 @@ const Dashboard = () => {
         
         <Stat p={4} shadow="md" border="1px" borderColor="gray.200" borderRadius="md">
           <StatLabel>Total Transactions</StatLabel>
-          <StatNumber>{transactions.length}</StatNumber>
+          <StatNumber>{summary?.transaction_count ?? 0}</StatNumber>
           <StatHelpText>All time</StatHelpText>
         </Stat>
       </SimpleGrid>